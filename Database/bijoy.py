@@ -0,0 +1,161 @@
+"""
+Bijoy → Unicode conversion compiled once.
+
+Produces the same output as ``unicodeconverter.convert_bijoy_to_unicode``
+(whose maps it reuses) but replaces its ~550 sequential ``str.replace``
+passes with a handful of regex passes and a translate table, and its
+quadratic segment clean-up with a linear one.
+
+Like the library, it converts one paragraph at a time: on several
+paragraphs joined into one string, pre-kars and refs at a paragraph's end
+are moved across the line break, so a page must be converted paragraph
+by paragraph (``convert_batch``), as markdown.py does.
+"""
+import re
+from unicodeconverter import lists
+from unicodeconverter.maps import bijoy_pre_map, bijoy_to_unicode
+
+_PUNCTUATION = re.compile('([.,!?();:-])')
+_SPACES = re.compile('[\r\t\f\v ]{2,}')
+
+
+def _conflicts(a, b):
+    """True when replacing ``a`` and ``b`` in one pass could differ from doing it in order."""
+    if a in b or b in a:
+        return True
+    for n in range(1, min(len(a), len(b))):
+        if a[-n:] == b[:n] or b[-n:] == a[:n]:
+            return True
+    return bool(set(bijoy_pre_map[a]) & set(b) or set(bijoy_pre_map[b]) & set(a))
+
+
+def _compile_pre_map():
+    """
+    Split the multi-character map into consecutive groups with no
+    conflicting keys; one alternation per group then matches the
+    library's key-by-key replacement exactly.
+    """
+    groups = [[]]
+    for key in bijoy_pre_map:
+        if any(_conflicts(key, other) for other in groups[-1]):
+            groups.append([])
+        groups[-1].append(key)
+
+    return [re.compile("|".join(re.escape(key) for key in group)) for group in groups]
+
+
+def _segment(text):
+    # every mapped character starts a new segment; "‡v" gets the extra
+    # (empty) segment the library produces by inserting a tab for it twice
+    return text.translate(_SEGMENT).replace("\t‡\tv", "\t\t‡\tv")
+
+
+_PRE_MAP = _compile_pre_map()
+_SEGMENT = str.maketrans({key: "\t" + key for key in bijoy_to_unicode if len(key) == 1})
+# segments the rearrangement acts on; everything else is left in place
+_REARRANGED = {'‡', "†", '©', *lists.bijoy_pre_kars}
+_MULTI = {key: value for key, value in bijoy_to_unicode.items() if len(key) > 1}
+_TRANSLATE = str.maketrans({key: value for key, value in bijoy_to_unicode.items() if len(key) == 1})
+
+
+def _pre_map_value(match):
+    return bijoy_pre_map[match.group(0)]
+
+
+def _rearrange(text):
+    """``unicodeconverter.utils.rearrange.rearrange_bijoy_text`` without the quadratic deletes."""
+    raw = text.split("\t")
+    if "›" not in text:
+        segments = [segment for segment in raw if segment]
+    else:
+        segments = []
+        i = 0
+        while i < len(raw):
+            segment = raw[i]
+            if segment == "":
+                i += 1
+                continue
+            if segment == "›" and i + 1 < len(raw):
+                segment += raw[i + 1]
+                i += 1
+            segments.append(segment)
+            i += 1
+
+    i = 0
+    n = len(segments)
+    while i < n:
+        if segments[i] not in _REARRANGED:
+            i += 1
+            continue
+        if segments[i] == '‡' or segments[i] == "†":
+            # handle o-kar and ou-kar
+            if i < len(segments) - 2 and segments[i + 2] == 'v':
+                segments[i], segments[i + 1] = segments[i + 1], segments[i]
+                i += 2
+            elif i < len(segments) - 2 and segments[i + 2] == 'Š':
+                segments[i], segments[i + 1] = segments[i + 1], segments[i]
+                i += 2
+            else:
+                # Handle e-kar
+                j = 1
+                if i + 2 < len(segments):
+                    # Handle ref
+                    if segments[i + 2] == '©':
+                        segments[i], segments[i + 2] = segments[i + 2], segments[i]
+                        i += 3
+                        continue
+                    # handle fola
+                    if segments[i + j + 1] in lists.bijoy_fola:
+                        j += 1
+
+                for k in range(j):
+                    if i + k + 1 < len(segments):
+                        segments[i + k], segments[i + k + 1] = segments[i + k + 1], segments[i + k]
+                i += j
+        # handle all kars
+        elif segments[i] in lists.bijoy_pre_kars and i < len(segments) - 1:
+            j = 1
+            if i + 2 < len(segments):
+                # check if next character is a ref
+                if segments[i + 2] == '©':
+                    segments[i], segments[i + 2] = segments[i + 2], segments[i]
+                    i += 3
+                    continue
+
+                # check if the next character is a fola
+                if segments[i + j + 1] in lists.bijoy_fola:
+                    j += 1
+
+            for k in range(j):
+                segments[i + k], segments[i + k + 1] = segments[i + k + 1], segments[i + k]
+            i += j
+        # Handle ref
+        elif segments[i] == '©':
+            if segments[i - 1] in lists.bijoy_fola:
+                segments[i], segments[i - 2] = segments[i - 2], segments[i]
+            segments[i], segments[i - 1] = segments[i - 1], segments[i]
+
+        i += 1
+
+    return ''.join(segments)
+
+
+def convert(text: str) -> str:
+    """Convert Bijoy-encoded ``text`` (a word or a paragraph) to Unicode."""
+    text = _PUNCTUATION.sub(r'\t\1', text)
+    text = _SPACES.sub(' ', text)
+    text = text.replace('\n', '\t\n')
+
+    for pattern in _PRE_MAP:
+        text = pattern.sub(_pre_map_value, text)
+
+    text = _rearrange(_segment(text).strip())
+
+    for key, value in _MULTI.items():
+        text = text.replace(key, value)
+    return text.translate(_TRANSLATE).strip()
+
+
+def convert_batch(texts):
+    """Convert many independent strings (table cells, a page's paragraphs), each exactly as ``convert`` would."""
+    return [convert(text) for text in texts]
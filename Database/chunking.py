@@ -0,0 +1,258 @@
+"""
+Structure-aware chunking of the livestock bible.
+
+markdown.py writes the document twice: as typed chunks in
+``output/<name>.json`` / ``.jsonl`` (paragraphs, tables with their
+``rows``, images) and as Markdown in which every block is separated by a
+blank line (the hand-cleaned ``livestock_bible_clean.md`` keeps that
+layout). ``structured_blocks`` reads either back into the same block
+stream, and ``chunk_blocks`` packs it into chunks:
+
+* module (``মডিউল -৩``) and numbered section (``৩.১ ...``) headings start a
+  new chunk, and every chunk carries its heading breadcrumb as
+  ``metadata["headings"]``; the document has no Markdown ``#`` headings, so
+  they are recognised by that numbering;
+* paragraphs are packed up to ``chunk_size`` characters without overlap;
+  only a paragraph longer than that is split, at line breaks, then at the
+  ``।`` sentence end;
+* a table goes whole into a chunk when it fits, otherwise in row groups
+  that each repeat the header row;
+* a short one-line block (a sub-heading or a table caption) stays with the
+  block after it, and images are listed in the chunk's metadata instead of
+  adding "figure" text.
+
+    python Database/ingest.py --chunker structure --chunk-size 1000 --source Database/output/livestock_bible_clean.md
+"""
+import os
+import re
+import json
+from typing import Iterator, List, Tuple
+
+MODULE_HEADING = re.compile(r"^\s*মডিউল\s*-?\s*[০-৯0-9]+\s*[ঃ:]?\s*")
+SECTION_HEADING = re.compile(r"^\s*[০-৯0-9]+\.[০-৯0-9]+(?:\.[০-৯0-9]+)*\s*[।ঃ:]?\s*[অ-হড়-য়]")
+IMAGE_LINE = re.compile(r"^!\[[^\]]*\]\(([^)]*)\)$")
+# one-line blocks up to this length are sub-headings or captions of the block below them
+LEAD_MAX_CHARS = 80
+# captions, not headings
+CAPTION_PREFIXES = ("চিত্র", "সারণী", "সারনী", "উৎস")
+SECTION_MAX_CHARS = 120
+
+
+def markdown_blocks(path: str) -> Iterator[Tuple[str, object]]:
+    """("paragraph", text), ("table", rows) and ("image", path) blocks of a markdown.py Markdown file."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    for block in re.split(r"\n\s*\n", text):
+        lines = [line for line in block.split("\n") if line.strip()]
+        if not lines:
+            continue
+        paragraph = []
+        table = []
+        for line in lines + [None]:
+            is_table = line is not None and line.lstrip().startswith("|")
+            if table and not is_table:
+                yield "table", table
+                table = []
+            if line is None:
+                break
+            image = IMAGE_LINE.match(line.strip())
+            if is_table or image:
+                if paragraph:
+                    yield "paragraph", "\n".join(paragraph).strip()
+                    paragraph = []
+            if is_table:
+                cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+                # the header separator row
+                if not all(re.fullmatch(r":?-{3,}:?", cell) for cell in cells):
+                    table.append(cells)
+            elif image:
+                yield "image", image.group(1).replace("\\", "/")
+            else:
+                paragraph.append(line)
+        if paragraph:
+            yield "paragraph", "\n".join(paragraph).strip()
+
+
+def json_blocks(path: str) -> Iterator[Tuple[str, object]]:
+    """The same blocks from markdown.py's ``.json`` list or ``.jsonl`` chunks."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            chunks = (json.loads(line) for line in f if line.strip())
+        else:
+            chunks = json.load(f)
+        for chunk in chunks:
+            if chunk["type"] == "paragraph":
+                yield "paragraph", chunk["text"].strip()
+            elif chunk["type"] == "table":
+                yield "table", chunk["rows"]
+            elif chunk["type"] == "image":
+                yield "image", chunk["image_path"]
+
+
+def structured_blocks(path: str) -> Iterator[Tuple[str, object]]:
+    if path.endswith((".json", ".jsonl")):
+        return json_blocks(path)
+    return markdown_blocks(path)
+
+
+def table_lines(rows: List[List[str]]) -> List[str]:
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    header = "| " + " | ".join(rows[0]) + " |"
+    separator = "| " + " | ".join(["---"] * width) + " |"
+    return [header, separator] + ["| " + " | ".join(row) + " |" for row in rows[1:]]
+
+
+def split_table(rows: List[List[str]], chunk_size: int) -> List[str]:
+    """The table as Markdown, whole if it fits in ``chunk_size`` or in row groups each starting with the header."""
+    if not rows:
+        return []
+    lines = table_lines(rows)
+    if len(rows) == 1 or len("\n".join(lines)) <= chunk_size:
+        return ["\n".join(lines)]
+    head = lines[:2]
+    groups = []
+    group = []
+    for line in lines[2:]:
+        if group and len("\n".join(head + group + [line])) > chunk_size:
+            groups.append("\n".join(head + group))
+            group = []
+        group.append(line)
+    if group:
+        groups.append("\n".join(head + group))
+    return groups
+
+
+def split_paragraph(text: str, chunk_size: int, separators=("\n", "। ")) -> List[str]:
+    """``text`` in pieces of at most ``chunk_size`` characters, cut at line breaks, then sentence ends."""
+    if len(text) <= chunk_size:
+        return [text]
+    if not separators:
+        return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+    separator, finer = separators[0], separators[1:]
+    parts = text.split(separator)
+    pieces = []
+    current = ""
+    for i, part in enumerate(parts):
+        if i < len(parts) - 1:
+            part += separator
+        if current and len(current) + len(part) > chunk_size:
+            pieces.append(current)
+            current = ""
+        current += part
+    pieces.append(current)
+    return [small.strip() for piece in pieces for small in split_paragraph(piece, chunk_size, finer) if small.strip()]
+
+
+def is_heading(line: str):
+    """1 for a module heading, 2 for a numbered section, None otherwise (cross references end in ``।``)."""
+    if len(line) > SECTION_MAX_CHARS or (MODULE_HEADING.match(line) and line.endswith("।")):
+        return None
+    if MODULE_HEADING.match(line):
+        return 1
+    if SECTION_HEADING.match(line):
+        return 2
+    return None
+
+
+def heading_units(text: str) -> Iterator[Tuple[str, object]]:
+    """A paragraph block as ("heading", (level, title)) and ("paragraph", text) units."""
+    lines = text.split("\n")
+    body = []
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        level = is_heading(line)
+        if level:
+            if body:
+                yield "paragraph", "\n".join(body)
+                body = []
+            title = line
+            # "মডিউল -২" with its title on the next line
+            untitled = level == 1 and not line[MODULE_HEADING.match(line).end():].strip()
+            following = lines[i + 1].strip() if i + 1 < len(lines) else ""
+            if untitled and following and not is_heading(following):
+                i += 1
+                title = f"{line} {following}"
+            yield "heading", (level, title)
+        else:
+            body.append(lines[i])
+        i += 1
+    if body and "\n".join(body).strip():
+        yield "paragraph", "\n".join(body).strip()
+
+
+def chunk_blocks(blocks, source: str, chunk_size: int = 1000, headings_in_text: bool = False) -> List[dict]:
+    """
+    Pack ``blocks`` (see ``structured_blocks``) into {"text", "metadata"}
+    chunks of about ``chunk_size`` characters (a block's sub-heading or
+    caption can take it over). With ``headings_in_text`` the breadcrumb is
+    also the first line of a chunk that does not start with its heading.
+    """
+    chunks = []
+    path = []  # (level, title) of the enclosing headings
+    parts = []
+    kinds = set()
+    images = []
+    lead = []  # sub-heading or caption waiting for the block it belongs to
+    chunk_path = []
+
+    def flush():
+        nonlocal parts, kinds, images
+        if parts:
+            text = "\n".join(parts)
+            headings = [title for _, title in chunk_path]
+            if headings_in_text and headings and not text.startswith(headings[-1]):
+                text = " > ".join(headings) + "\n" + text
+            metadata = {"source": source, "headings": headings, "blocks": sorted(kinds)}
+            if images:
+                metadata["images"] = images
+            chunks.append({"text": text, "metadata": metadata})
+        parts, kinds, images = [], set(), []
+
+    def add(text, kind):
+        nonlocal lead, chunk_path
+        text = "\n".join(lead + [text])
+        lead = []
+        if parts and len("\n".join(parts)) + 1 + len(text) > chunk_size:
+            flush()
+        if not parts:
+            chunk_path = list(path)
+        parts.append(text)
+        kinds.add(kind)
+
+    for kind, value in blocks:
+        if kind == "image":
+            images.append(value)
+            continue
+        if kind == "table":
+            for group in split_table(value, chunk_size):
+                add(group, "table")
+            continue
+
+        for unit, content in heading_units(value):
+            if unit == "heading":
+                level, title = content
+                flush()
+                path[:] = [entry for entry in path if entry[0] < level] + [(level, title)]
+                lead.append(title)
+                continue
+            if "\n" not in content and len(content) <= LEAD_MAX_CHARS:
+                if not content.startswith(CAPTION_PREFIXES):
+                    # a sub-heading: the breadcrumb's third level until the next one
+                    path[:] = [entry for entry in path if entry[0] < 3] + [(3, content)]
+                lead.append(content)
+                continue
+            for piece in split_paragraph(content, chunk_size):
+                add(piece, "paragraph")
+
+    if lead:
+        text, lead = "\n".join(lead), []
+        add(text, "paragraph")
+    flush()
+    return chunks
+
+
+def chunk_document(path: str, chunk_size: int = 1000, headings_in_text: bool = False) -> List[dict]:
+    return chunk_blocks(structured_blocks(path), os.path.basename(path), chunk_size, headings_in_text)
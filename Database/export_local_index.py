@@ -0,0 +1,64 @@
+"""
+Export a PGVector collection to a local index for the in-process backend.
+
+    python Database/export_local_index.py --collection livestock --output Database/output/livestock
+
+writes Database/output/livestock.npy and .jsonl (and .hnsw with --hnsw,
+.f16.npy / .i8.npy with --quantize float16,int8).
+Point LOCAL_INDEX_PATH at the prefix and set KB_BACKEND=local to serve the
+knowledgebase tool from it.
+"""
+import os
+import sys
+import json
+import argparse
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vector_store import KnowledgebaseStore
+from utils.local_vector_store import write_local_index
+
+EXPORT_QUERY = text(
+    """
+    SELECT id, document, cmetadata, embedding::text AS embedding
+    FROM langchain_pg_embedding
+    WHERE collection_id = :collection_id
+    ORDER BY id
+    """
+)
+
+
+def export_rows(store):
+    with store.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=500).execute(
+            EXPORT_QUERY, {"collection_id": store.collection_id}
+        )
+        for row in result:
+            yield str(row.id), row.document, row.cmetadata or {}, json.loads(row.embedding)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a PGVector collection to a local vector index")
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME"))
+    parser.add_argument("--output", default=os.getenv("LOCAL_INDEX_PATH"), help="path prefix of the index files")
+    parser.add_argument("--hnsw", action="store_true", help="also build an HNSW graph (needs hnswlib)")
+    parser.add_argument(
+        "--quantize", default="", help="comma separated quantised copies to write: float16, int8"
+    )
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("--output (or LOCAL_INDEX_PATH) is required")
+
+    # embeddings are only needed for queries, not for reading stored vectors
+    store = KnowledgebaseStore(embeddings=None, connection=os.getenv("DB_URI"), collection_name=args.collection)
+    try:
+        stats = write_local_index(
+            export_rows(store), args.output, hnsw=args.hnsw, quantize=[q for q in args.quantize.split(",") if q]
+        )
+    finally:
+        store.close()
+    print(f"[INFO] Exported {args.collection} to {args.output}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Incremental ingestion of the livestock bible into the PGVector collection.
+
+    python Database/ingest.py --source Database/output/livestock_bible_clean.md
+
+Chunks follow the document's structure (Database/chunking.py): headings
+start a chunk and are kept as metadata, tables stay whole or are split in
+row groups under their header. ``--chunker lines`` is the plain newline
+splitter used before. Every chunk is tagged with species and topics from
+a keyword lexicon (utils/metadata_tags.py), and the GIN indexes the
+knowledgebase tool's filters use are created if missing.
+
+Chunks are identified by a hash of their content, so re-running only embeds
+chunks that are new or changed (``--prune`` also deletes rows whose chunk is
+gone). Embedding batches run concurrently under a rate limiter (the
+embedding client retries failed requests, utils/http_clients.py), and
+every batch is written with COPY in its own transaction: an interrupted
+run keeps what it already wrote and the next run resumes from there.
+
+With ``--bm25-index`` (or BM25_INDEX_PATH) the keyword index used by the
+hybrid knowledgebase search is rebuilt from the same chunks afterwards.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from psycopg import AsyncConnection
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.bm25 import build_bm25_index
+from utils.rate_limit import TokenBucket
+from utils.metadata_tags import tag_chunk
+from utils.vector_store import METADATA_INDEXES, KnowledgebaseStore, to_vector_literal
+from chunking import chunk_document
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "livestock_bible_clean.md")
+EMBED_RPM = float(os.getenv("EMBED_RPM", "100"))
+# "structure" packs markdown.py's blocks under their headings (Database/chunking.py);
+# "lines" is the newline splitter with overlap the collection was first built with
+INGEST_CHUNKER = os.getenv("INGEST_CHUNKER", "structure")
+# characters per chunk for the "structure" chunker
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+# also start each structure chunk's text with its heading breadcrumb, so it is embedded and keyword-indexed
+INGEST_HEADINGS_IN_TEXT = os.getenv("INGEST_HEADINGS_IN_TEXT", "true").lower() == "true"
+
+
+def split_markdown(path, chunk_size=800, chunk_overlap=300):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n"]
+    )
+    source = os.path.basename(path)
+    return [{"text": split, "metadata": {"source": source}} for split in text_splitter.split_text(text)]
+
+
+def load_chunks(path, chunker=INGEST_CHUNKER, chunk_size=INGEST_CHUNK_SIZE, headings_in_text=INGEST_HEADINGS_IN_TEXT):
+    """
+    Chunks of ``path`` (Markdown, or markdown.py's .json/.jsonl for
+    "structure"), tagged with species and topics (utils/metadata_tags.py).
+    """
+    if chunker == "lines":
+        chunks = split_markdown(path)
+    elif chunker == "structure":
+        chunks = chunk_document(path, chunk_size, headings_in_text)
+    else:
+        raise ValueError(f"Unknown chunker: {chunker}")
+    return [tag_chunk(chunk) for chunk in chunks]
+
+
+def chunk_id(collection_name, chunk):
+    payload = json.dumps(
+        [collection_name, chunk["text"], chunk["metadata"]], ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PGVectorWriter:
+    """Bulk writer for one langchain_pg_embedding collection."""
+
+    def __init__(self, embeddings, connection, collection_name):
+        self.connection = connection
+        self.collection_name = collection_name
+        self.store = KnowledgebaseStore(embeddings, connection, collection_name)
+        self.collection_id = None
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        # PGVector creates the tables and the collection if they don't exist yet
+        await asyncio.to_thread(lambda: self.store.vector_store)
+        self.collection_id = await asyncio.to_thread(lambda: self.store.collection_id)
+        # autocommit: every transaction() block below commits on its own, so the batches written
+        # before an interrupted run stay stored and the next run resumes after them
+        self._conn = await AsyncConnection.connect(self.connection, autocommit=True)
+        async with self._conn.transaction():
+            async with self._conn.cursor() as cur:
+                for statement in METADATA_INDEXES:
+                    await cur.execute(statement)
+
+    async def existing_ids(self):
+        async with self._conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id FROM langchain_pg_embedding WHERE collection_id = %s", (self.collection_id,)
+            )
+            return {row[0] for row in await cur.fetchall()}
+
+    async def write(self, rows):
+        """rows: (id, text, metadata, vector) tuples, written in one transaction."""
+        async with self._lock:
+            async with self._conn.transaction():
+                async with self._conn.cursor() as cur:
+                    async with cur.copy(
+                        "COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) FROM STDIN"
+                    ) as copy:
+                        for id_, text, metadata, vector in rows:
+                            await copy.write_row(
+                                (
+                                    id_,
+                                    self.collection_id,
+                                    to_vector_literal(vector),
+                                    text,
+                                    json.dumps(metadata, ensure_ascii=False),
+                                )
+                            )
+
+    async def delete(self, ids):
+        async with self._lock:
+            async with self._conn.transaction():
+                async with self._conn.cursor() as cur:
+                    await cur.execute(
+                        "DELETE FROM langchain_pg_embedding WHERE collection_id = %s AND id = ANY(%s)",
+                        (self.collection_id, list(ids)),
+                    )
+
+    async def analyze(self):
+        """Refresh the planner statistics, so filtered lookups pick the tag indexes when they are selective."""
+        await self._conn.execute("ANALYZE langchain_pg_embedding")
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+        self.store.close()
+
+
+async def ingest(chunks, embeddings, writer, collection_name, batch_size=50, concurrency=4,
+                 requests_per_minute=EMBED_RPM, prune=False):
+    started = time.perf_counter()
+    pending = {}
+    for chunk in chunks:
+        pending.setdefault(chunk_id(collection_name, chunk), chunk)
+
+    existing = await writer.existing_ids()
+    todo = [(id_, chunk) for id_, chunk in pending.items() if id_ not in existing]
+    stale = existing - pending.keys()
+    print(f"[INFO] {len(pending)} chunks, {len(pending) - len(todo)} already stored, {len(todo)} to embed")
+
+    if prune and stale:
+        await writer.delete(stale)
+        print(f"[INFO] Deleted {len(stale)} stale chunks")
+
+    limiter = TokenBucket(requests_per_minute / 60.0, capacity=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [todo[i : i + batch_size] for i in range(0, len(todo), batch_size)]
+    done = 0
+
+    async def run(batch):
+        nonlocal done
+        async with semaphore:
+            texts = [chunk["text"] for _, chunk in batch]
+            # one token per batch; the client's own retries (EMBED_RETRIES) are not retried again here
+            await limiter.acquire()
+            vectors = await embeddings.aembed_documents(texts)
+            await writer.write(
+                [(id_, chunk["text"], chunk["metadata"], vector) for (id_, chunk), vector in zip(batch, vectors)]
+            )
+            done += len(batch)
+            print(f"[INFO] {done}/{len(todo)} chunks written")
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "chunks": len(pending),
+        "embedded": len(todo),
+        "deleted": len(stale) if prune else 0,
+        "seconds": elapsed,
+        "chunks_per_sec": len(todo) / elapsed if elapsed else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Embed the knowledgebase into PGVector")
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME"))
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=EMBED_RPM, help="embedding requests per minute")
+    parser.add_argument("--prune", action="store_true", help="delete rows whose chunk no longer exists")
+    parser.add_argument("--chunker", default=INGEST_CHUNKER, choices=["structure", "lines"])
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="characters per structure chunk")
+    parser.add_argument("--bm25-index", default=os.getenv("BM25_INDEX_PATH"), help="where to write the keyword index")
+    args = parser.parse_args()
+
+    from utils.embedding_engine import embedding_engine
+
+    chunks = load_chunks(args.source, args.chunker, args.chunk_size)
+    writer = PGVectorWriter(embedding_engine, os.getenv("DB_URI"), args.collection)
+    await writer.open()
+    try:
+        stats = await ingest(
+            chunks,
+            embedding_engine,
+            writer,
+            args.collection,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            prune=args.prune,
+        )
+        await writer.analyze()
+    finally:
+        await writer.close()
+    print(stats)
+
+    if args.bm25_index:
+        # same chunk ids as the rows written above
+        unique = {chunk_id(args.collection, chunk): chunk for chunk in chunks}
+        index_stats = build_bm25_index(
+            ((id_, chunk["text"], chunk["metadata"]) for id_, chunk in unique.items()), args.bm25_index
+        )
+        print(f"[INFO] BM25 index written to {args.bm25_index}: {index_stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,15 @@
 import os
 import json
+import shutil
+import argparse
+import tempfile
+import multiprocessing
 from pdf2docx import Converter
 from docx import Document
 from docx.text.paragraph import Paragraph
 from docx.table import Table
-import unicodeconverter as uc
 import re
+import bijoy
 
 def is_english(token):
     return re.fullmatch(r"[A-Za-z0-9]+", token) is not None
@@ -26,7 +30,7 @@ def bijoy_to_unicode(text):
     #         pass
 
     # return " ".join(tokens)
-    return uc.convert_bijoy_to_unicode(text)
+    return bijoy.convert(text)
 
 def clean_text(text):
     return "".join(c for c in text if c == "\n" or ord(c) >= 32)
@@ -84,8 +88,7 @@ def table_to_rows(table):
     rows = []
 
     for row in table.rows:
-        cells = [process_text(c.text) for c in row.cells]
-        rows.append(cells)
+        rows.append(bijoy.convert_batch([c.text for c in row.cells]))
 
     return rows
 
@@ -108,28 +111,95 @@ def rows_to_markdown(rows):
     return md
 
 
-def pdf_to_rag(pdf_path, output_dir):
+class RagWriter:
+    """
+    Turns document blocks into Markdown and RAG chunks as they arrive.
 
-    md_output = f"{output_dir}/{pdf_path.replace('.pdf', '.md')}"
-    json_output = f"{output_dir}/{pdf_path.replace('.pdf', '.json')}"
-    images_dir = f"{output_dir}/images"
+    Chunk ids and image numbers are assigned here, in the order blocks are
+    added, so they are the same however the document was split into parts.
+    Images arrive as temporary files and are moved to ``images/image_N.png``.
+    With ``jsonl=True`` chunks are written one per line immediately,
+    otherwise they are collected and written as one JSON list on close.
+    """
 
-    os.makedirs(images_dir, exist_ok=True)
+    def __init__(self, md_output, json_output, output_dir, jsonl=False):
+        self.output_dir = output_dir
+        self.images_dir = os.path.join(output_dir, "images")
+        os.makedirs(self.images_dir, exist_ok=True)
+
+        self.json_output = json_output
+        self.jsonl = jsonl
+        self.md = open(md_output, "w", encoding="utf-8")
+        self.chunks_file = open(json_output, "w", encoding="utf-8") if jsonl else None
+        self.rag_chunks = []
+        self.chunk_id = 0
+        self.img_counter = 1
+        self._first_md = True
+
+    def _write_markdown(self, *lines):
+        for line in lines:
+            if not self._first_md:
+                self.md.write("\n")
+            self.md.write(line)
+            self._first_md = False
+
+    def _write_chunk(self, chunk):
+        chunk = {"id": self.chunk_id, **chunk}
+        self.chunk_id += 1
+        if self.jsonl:
+            self.chunks_file.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        else:
+            self.rag_chunks.append(chunk)
+
+    def add(self, kind, value):
+        if kind == "paragraph":
+            self._write_markdown(value + "\n\n")
+            self._write_chunk({"type": "paragraph", "text": value})
+
+        elif kind == "image":
+            img_name = f"image_{self.img_counter}.png"
+            self.img_counter += 1
+            os.replace(value, os.path.join(self.images_dir, img_name))
+            img_path = f"images/{img_name}"
+
+            self._write_markdown(f"![figure]({img_path})")
+            self._write_chunk({
+                "type": "image",
+                "image_path": img_path,
+                "text": "figure related to livestock"
+            })
 
-    tmp_docx = pdf_path.replace(".pdf", "_temp.docx")
+        elif kind == "table":
+            self._write_markdown(*rows_to_markdown(value))
+            self._write_chunk({
+                "type": "table",
+                "rows": value,
+                "text": "\n".join([" | ".join(r) for r in value])
+            })
 
-    print("Converting PDF → DOCX")
+        else:
+            raise Exception(f"Found unhandled block kind: {kind}")
 
-    cv = Converter(pdf_path)
-    cv.convert(tmp_docx)
-    cv.close()
+    def flush(self):
+        self.md.flush()
+        if self.chunks_file is not None:
+            self.chunks_file.flush()
 
-    doc = Document(tmp_docx)
+    def close(self):
+        self.md.close()
+        if self.jsonl:
+            self.chunks_file.close()
+        else:
+            with open(self.json_output, "w", encoding="utf-8") as f:
+                json.dump(self.rag_chunks, f, ensure_ascii=False, indent=2)
 
-    markdown = []
-    rag_chunks = []
 
-    chunk_id = 0
+def docx_blocks(docx_path, images_dir):
+    """
+    Yield ("paragraph", text), ("image", path) and ("table", rows) in
+    document order; images are saved into ``images_dir``.
+    """
+    doc = Document(docx_path)
     img_counter = 1
 
     for block in iter_block_items(doc):
@@ -140,69 +210,117 @@ def pdf_to_rag(pdf_path, output_dir):
             text = process_text(block.text)
 
             if text:
-
-                markdown.append(text + "\n\n")
-
-                rag_chunks.append({
-                    "id": chunk_id,
-                    "type": "paragraph",
-                    "text": text
-                })
-
-                chunk_id += 1
+                yield "paragraph", text
 
             images, img_counter = extract_images_from_paragraph(
                 block, doc, images_dir, img_counter
             )
 
             for img_name, img_path in images:
+                yield "image", img_path
 
-                img_path = img_path.replace(f"{output_dir}/", "")
+        # -------- TABLE --------
+        elif isinstance(block, Table):
+            yield "table", table_to_rows(block)
 
-                markdown.append(f"![figure]({img_path})")
+        else:
+            raise Exception(f"Found unhandled block type: {type(block)}")
 
-                rag_chunks.append({
-                    "id": chunk_id,
-                    "type": "image",
-                    "image_path": img_path,
-                    "text": "figure related to livestock"
-                })
 
-                chunk_id += 1
+def output_paths(pdf_path, output_dir, chunks_ext):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return (
+        os.path.join(output_dir, f"{stem}.md"),
+        os.path.join(output_dir, f"{stem}{chunks_ext}"),
+    )
 
-        # -------- TABLE --------
-        elif isinstance(block, Table):
 
-            rows = table_to_rows(block)
+def pdf_to_rag(pdf_path, output_dir):
 
-            md_table = rows_to_markdown(rows)
+    md_output, json_output = output_paths(pdf_path, output_dir, ".json")
+    writer = RagWriter(md_output, json_output, output_dir)
+    tmp_dir = tempfile.mkdtemp(dir=output_dir)
+    tmp_docx = os.path.join(tmp_dir, "document.docx")
 
-            markdown.extend(md_table)
+    print("Converting PDF → DOCX")
 
-            rag_chunks.append({
-                "id": chunk_id,
-                "type": "table",
-                "rows": rows,
-                "text": "\n".join([" | ".join(r) for r in rows])
-            })
+    cv = Converter(pdf_path)
+    cv.convert(tmp_docx)
+    cv.close()
 
-            chunk_id += 1
-        else:
-            raise Exception(f"Found unhandled block type: {type(block)}")
+    for kind, value in docx_blocks(tmp_docx, tmp_dir):
+        writer.add(kind, value)
 
-    with open(md_output, "w", encoding="utf-8") as f:
-        f.write("\n".join(markdown))
+    writer.close()
+    shutil.rmtree(tmp_dir)
 
-    with open(json_output, "w", encoding="utf-8") as f:
-        json.dump(rag_chunks, f, ensure_ascii=False, indent=2)
+    print("Done.")
+    print("Markdown:", md_output)
+    print("JSON:", json_output)
 
+
+def convert_page_range(args):
+    """Worker: convert pages [start, end) and return their blocks in order."""
+    pdf_path, start, end, part_dir = args
+    os.makedirs(part_dir, exist_ok=True)
+    tmp_docx = os.path.join(part_dir, "part.docx")
+
+    cv = Converter(pdf_path)
+    cv.convert(tmp_docx, start=start, end=end)
+    cv.close()
+
+    blocks = list(docx_blocks(tmp_docx, part_dir))
     os.remove(tmp_docx)
+    return blocks
+
+
+def pdf_to_rag_streaming(pdf_path, output_dir, workers=None, pages_per_part=10):
+    """
+    Convert ``pdf_path`` in page ranges on a process pool and write the
+    Markdown and JSON Lines chunks part by part, in page order, so memory
+    holds at most a few parts rather than the whole document.
+    """
+    md_output, jsonl_output = output_paths(pdf_path, output_dir, ".jsonl")
+    os.makedirs(output_dir, exist_ok=True)
+
+    cv = Converter(pdf_path)
+    page_count = cv.fitz_doc.page_count
+    cv.close()
+
+    tmp_dir = tempfile.mkdtemp(dir=output_dir)
+    parts = [
+        (pdf_path, start, min(start + pages_per_part, page_count), os.path.join(tmp_dir, f"part_{i}"))
+        for i, start in enumerate(range(0, page_count, pages_per_part))
+    ]
+    print(f"Converting {page_count} pages in {len(parts)} parts")
+
+    writer = RagWriter(md_output, jsonl_output, output_dir, jsonl=True)
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for i, blocks in enumerate(pool.imap(convert_page_range, parts)):
+                for kind, value in blocks:
+                    writer.add(kind, value)
+                writer.flush()
+                print(f"Part {i + 1}/{len(parts)} written")
+    finally:
+        writer.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
     print("Done.")
     print("Markdown:", md_output)
-    print("JSON:", json_output)
-
-pdf_to_rag(
-    "livestock_bible.pdf",
-    "output"
-)
\ No newline at end of file
+    print("JSON Lines:", jsonl_output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a Bijoy-encoded PDF to Markdown and RAG chunks")
+    parser.add_argument("pdf", help="input PDF, e.g. livestock_bible.pdf")
+    parser.add_argument("--output", default="output", help="output directory")
+    parser.add_argument("--stream", action="store_true", help="page-parallel conversion writing JSON Lines")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--pages-per-part", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.stream:
+        pdf_to_rag_streaming(args.pdf, args.output, args.workers, args.pages_per_part)
+    else:
+        pdf_to_rag(args.pdf, args.output)
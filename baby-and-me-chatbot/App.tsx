@@ -118,6 +118,23 @@ const App: React.FC = () => {
             }
             return updatedHistory;
           });
+        } else if (chunk.type === 'error') {
+          // the server stopped the run (e.g. it hit the request deadline)
+          fullResponse = fullResponse ? `${fullResponse}\n\n${chunk.content}` : chunk.content;
+          setError(chunk.content);
+          setChatHistory(prev => {
+            const updatedHistory = [...prev];
+            const lastMessage = updatedHistory[updatedHistory.length - 1];
+            if (lastMessage && lastMessage.author === Author.BOT) {
+              updatedHistory[updatedHistory.length - 1] = {
+                ...lastMessage,
+                content: fullResponse,
+                type: 'stream',
+                toolOutputs: currentToolOutputs
+              };
+            }
+            return updatedHistory;
+          });
         }
       });
 
@@ -1,7 +1,7 @@
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
 
 export interface ChatResponse {
-  type: 'thinking' | 'tool_start' | 'tool_end' | 'stream';
+  type: 'thinking' | 'tool_start' | 'tool_end' | 'stream' | 'error';
   content: string;
   toolOutput?: any;
 }
@@ -0,0 +1,159 @@
+"""
+Admission control of /stream under a market-day burst.
+
+The real api.py app is served in this process with the fake agent of
+benchmarks/stream_disconnect.py (one knowledgebase call, then ``--tokens``
+words 10 ms apart), and:
+
+    burst     --burst requests from distinct clients at once; at most
+              STREAM_MAX_ACTIVE run together, STREAM_MAX_QUEUED wait and
+              the rest get 503 before any answer has finished
+    thread    two messages of one conversation sent together; the second
+              must start after the first has finished. A third sent with
+              them gets 429 at once
+    rate      one client sending twice its burst; the excess gets 429
+
+/admission/stats is sampled throughout and the peak gauges are reported.
+
+    python benchmarks/admission_control.py --burst 40
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+os.environ.setdefault("STREAM_MAX_ACTIVE", "4")
+os.environ.setdefault("STREAM_MAX_QUEUED", "8")
+os.environ.setdefault("STREAM_QUEUE_TIMEOUT", "5")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "6")
+os.environ.setdefault("RATE_LIMIT_BURST", "5")
+os.environ.setdefault("RATE_LIMIT_TRUST_FORWARDED", "true")
+os.environ.setdefault("STREAM_DEADLINE", "60")
+
+import httpx
+import uvicorn
+
+from stream_disconnect import build_fake_agent, check, connection
+import api
+from utils.mcp_manager import MCPSessionPool
+
+
+async def post(client, url, client_id, thread_id):
+    """Status, seconds until the first frame and until the end of the response."""
+    started = time.monotonic()
+    first = None
+    headers = {"X-Forwarded-For": client_id}
+    body = {"messages": "q"} if thread_id is None else {"messages": "q", "thread_id": thread_id}
+    async with client.stream("POST", url, json=body, headers=headers) as response:
+        async for _ in response.aiter_bytes():
+            if first is None:
+                first = time.monotonic() - started
+    return response.status_code, first, time.monotonic() - started, response.headers.get("retry-after")
+
+
+async def sample(client, url, peaks, stop):
+    while not stop.is_set():
+        stats = (await client.get(url)).json()
+        for key in ("active", "queued", "oldest_wait_ms"):
+            peaks[key] = max(peaks.get(key, 0), stats[key])
+        await asyncio.sleep(0.01)
+
+
+async def main(args):
+    pool = MCPSessionPool("fast", connection(0.01, os.devnull), size=2)
+    await pool.start()
+    api.registry.agent, _ = build_fake_agent(pool, tokens=args.tokens)
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base = f"http://127.0.0.1:{args.port}"
+    limits = api.admission
+    results = []
+
+    try:
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.burst + 10)) as client:
+            # burst from distinct clients
+            peaks = {}
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample(client, f"{base}/admission/stats", peaks, stop))
+            started = time.monotonic()
+            responses = await asyncio.gather(
+                *(post(client, f"{base}/stream", f"10.0.0.{i}", f"burst-{i}") for i in range(args.burst))
+            )
+            elapsed = time.monotonic() - started
+            stop.set()
+            await sampler
+
+            served = [r for r in responses if r[0] == 200]
+            rejected = [r for r in responses if r[0] == 503]
+            slowest_reject = max((r[2] for r in rejected), default=0)
+            fastest_run = min((r[2] for r in served), default=0)
+            print(
+                f"burst of {args.burst}: {len(served)} served, {len(rejected)} rejected in {elapsed:.2f}s; "
+                f"peak active {peaks['active']}, peak queued {peaks['queued']}, "
+                f"longest wait {peaks['oldest_wait_ms']:.0f} ms"
+            )
+            results.append(check(
+                "burst: active and queue stay within limits",
+                peaks["active"] <= limits.max_active and peaks["queued"] <= limits.max_queued,
+            ))
+            results.append(check(
+                "burst: overflow rejected at once with 503",
+                len(served) == limits.max_active + limits.max_queued and slowest_reject < fastest_run,
+                f"slowest rejection {slowest_reject * 1000:.0f} ms, fastest answer {fastest_run * 1000:.0f} ms",
+            ))
+
+            # two messages of one conversation, then a third while both are taken
+            first = asyncio.create_task(post(client, f"{base}/stream", "10.0.1.1", "same-thread"))
+            await asyncio.sleep(0.1)
+            second = asyncio.create_task(post(client, f"{base}/stream", "10.0.1.2", "same-thread"))
+            await asyncio.sleep(0.1)
+            third = await post(client, f"{base}/stream", "10.0.1.3", "same-thread")
+            first, second = await first, await second
+            # both from the first's start
+            second_starts = 0.1 + second[1]
+            results.append(check(
+                "thread: second message waits for the first",
+                first[0] == second[0] == 200 and second_starts >= first[2] - 0.05,
+                f"first ends {first[2]:.2f}s, second starts {second_starts:.2f}s",
+            ))
+            results.append(check(
+                "thread: a third message gets 429 at once",
+                third[0] == 429 and third[3] and third[2] < first[2],
+                f"{third[0]} after {third[2] * 1000:.0f} ms",
+            ))
+
+            # one client over its rate
+            responses = []
+            for _ in range(int(limits.burst) * 2):
+                responses.append(await post(client, f"{base}/stream", "10.0.2.1", None))
+            statuses = [r[0] for r in responses]
+            results.append(check(
+                "rate: requests beyond the burst get 429",
+                statuses.count(429) >= limits.burst - 1 and all(r[3] for r in responses if r[0] == 429),
+                f"{statuses}",
+            ))
+
+            stats = (await client.get(f"{base}/admission/stats")).json()
+            print(f"/admission/stats: {stats}")
+            results.append(check("gauges: nothing left active or queued", stats["active"] == 0 and stats["queued"] == 0))
+    finally:
+        server.should_exit = True
+        await serving
+        await pool.close()
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,81 @@
+"""
+Time-to-first-byte of /stream with per-request agent construction
+(the old ``initialize_chat`` path) vs. the shared ``AgentRegistry``.
+
+    python benchmarks/agent_ttfb.py --requests 10
+
+TTFB is measured up to the first SSE frame produced by ``event_generator``,
+which is emitted before the LLM starts answering, so it isolates setup cost.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+from main import initialize_chat
+from agent_registry import AgentRegistry
+from stream_generator import event_generator
+
+QUESTION = "গরুর খুরা রোগের লক্ষণ কী?"
+
+
+async def first_frame(agent):
+    frames = event_generator(agent, QUESTION, str(uuid.uuid4()))
+    await frames.__anext__()
+    await frames.aclose()
+
+
+async def per_request(n):
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        agent = await initialize_chat({"messages": [], "thread_id": ""})
+        await first_frame(agent)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def shared(n):
+    registry = AgentRegistry()
+    await registry.start()
+    timings = []
+    try:
+        for _ in range(n):
+            started = time.perf_counter()
+            agent = await registry.get_agent()
+            await first_frame(agent)
+            timings.append(time.perf_counter() - started)
+    finally:
+        await registry.close()
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"{label:<12} n={len(timings):<4} "
+        f"mean={statistics.mean(timings) * 1000:8.1f}ms "
+        f"p50={statistics.median(timings) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    report("per-request", await per_request(args.requests))
+    report("registry", await shared(args.requests))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Golden-output check and throughput of Database/bijoy.py against
+unicodeconverter.convert_bijoy_to_unicode.
+
+The check converts random Bijoy token sequences with both and fails on the
+first difference (inputs on which the library itself raises are skipped).
+Throughput is measured on synthetic Bijoy text as long as
+Database/output/livestock_bible.md, per paragraph (how markdown.py converts
+it) and in batches of a page's paragraphs (``convert_batch``).
+
+    python benchmarks/bijoy_converter.py --cases 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "Database"))
+
+import bijoy
+from unicodeconverter import convert_bijoy_to_unicode
+from unicodeconverter.maps import bijoy_pre_map, bijoy_to_unicode
+
+TOKENS = list(bijoy_pre_map) + list(bijoy_to_unicode) + [" ", " ", " ", "\n", ".", ",", "?", "-", "  ", "Av", "‡v"]
+
+
+def random_text(rng, length):
+    return "".join(rng.choice(TOKENS) for _ in range(length))
+
+
+def golden_check(cases, seed):
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(cases):
+        text = random_text(rng, rng.randint(0, 60))
+        try:
+            expected = convert_bijoy_to_unicode(text)
+        except Exception:
+            continue
+        actual = bijoy.convert(text)
+        if actual != expected:
+            raise SystemExit(f"MISMATCH for {text!r}:\n  library {expected!r}\n  bijoy   {actual!r}")
+        checked += 1
+    print(f"golden check: {checked} inputs identical")
+
+
+def throughput(label, fn, items):
+    size = sum(len("".join(item).encode("utf-8")) for item in items)
+    started = time.perf_counter()
+    for item in items:
+        try:
+            fn(item)
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {size / elapsed / 1e6:8.3f} MB/s ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--size", type=int, default=None, help="characters of input (default: livestock_bible.md)")
+    args = parser.parse_args()
+
+    golden_check(args.cases, args.seed)
+
+    size = args.size
+    if size is None:
+        with open(os.path.join(ROOT, "Database", "output", "livestock_bible.md"), encoding="utf-8") as f:
+            size = len(f.read())
+
+    rng = random.Random(args.seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = random_text(rng, rng.randint(20, 150))
+        paragraphs.append(paragraph)
+        total += len(paragraph)
+    pages = [paragraphs[i : i + 30] for i in range(0, len(paragraphs), 30)]
+
+    throughput("library, per paragraph", convert_bijoy_to_unicode, paragraphs)
+    throughput("bijoy, per paragraph", bijoy.convert, paragraphs)
+    throughput("bijoy, per page batch", bijoy.convert_batch, pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Index size, retrieval latency and retrieved context of the newline
+splitter (``split_markdown``, 800 characters with 300 overlap) against the
+structure-aware chunker of Database/chunking.py, on the same source.
+
+For each chunking, offline and without embedding credentials:
+
+    chunks      rows the collection would hold
+    text MB     stored chunk text and metadata
+    vector MB   float32 embeddings at ``--dims`` (pgvector stores the same
+                4 bytes per dimension per row)
+    bm25 MB     keyword index file
+    bm25 ms     BM25 query p50 over the labelled queries
+    vector ms   exact search p50 over the rows (random unit vectors, as in
+                benchmarks/local_kb.py; the query embedding is excluded)
+    answered    queries with a relevant phrase in the top 5
+    coverage    relevant phrases found in the top 5, over all labelled ones
+    tokens      approximate context tokens of the top 5, and of
+                select_context over the top 20 (utils/context_selection.py)
+
+Chunks differ in size between the chunkings, so quality is compared on
+phrases found in the returned context rather than on recall of chunks.
+
+    python benchmarks/chunking_compare.py --sizes 800 1000 1200 --headings-in-text true
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Database"))
+
+from ingest import DEFAULT_SOURCE, INGEST_HEADINGS_IN_TEXT, chunk_id, split_markdown
+from chunking import chunk_document
+from utils.bm25 import BM25Index, build_bm25_index
+from utils.context_selection import RERANK_CANDIDATES, estimate_tokens, select_context
+from utils.local_vector_store import LocalVectorStore, write_local_index
+from retrieval_eval import QUERIES, load_queries, nfc, percentile
+
+TOP_K = 5
+
+
+def lookup_ms(search, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 0.5)
+
+
+def compare(label, chunks, queries, args, tmp):
+    rows = [(chunk_id("kb", chunk), chunk["text"], chunk["metadata"]) for chunk in chunks]
+    text_bytes = sum(len(text.encode("utf-8")) + len(json.dumps(metadata, ensure_ascii=False).encode("utf-8")) for _, text, metadata in rows)
+
+    name = label.replace(" ", "-").replace("/", "-")
+    path = os.path.join(tmp, f"{name}.bm25")
+    build_bm25_index(rows, path)
+    index = BM25Index(path)
+    bm25_ms = lookup_ms(lambda query: index.search(query["query"], TOP_K), queries)
+
+    rng = np.random.default_rng(5)
+    prefix = os.path.join(tmp, name)
+    write_local_index(((*row, rng.standard_normal(args.dims, dtype=np.float32)) for row in rows), prefix)
+    store = LocalVectorStore(embeddings=None, path=prefix)
+    vectors = rng.standard_normal((len(queries), args.dims), dtype=np.float32)
+    vector_ms = lookup_ms(lambda i: store.similarity_search_with_score_by_vector(vectors[i], TOP_K), range(len(queries)))
+    store.close()
+
+    answered = coverage = labels = top_tokens = selected_tokens = 0
+    for query in queries:
+        scored = index.search_with_score(query["query"], RERANK_CANDIDATES)
+        best = scored[0][1] if scored else 1.0
+        texts = [nfc(doc.page_content) for doc, _ in scored[:TOP_K]]
+        found = [label for label in query["relevant"] if any(nfc(label) in text for text in texts)]
+        answered += bool(found)
+        coverage += len(found)
+        labels += len(query["relevant"])
+        top_tokens += sum(estimate_tokens(text) for text in texts)
+        selected = select_context([(doc, score / best) for doc, score in scored])
+        selected_tokens += sum(estimate_tokens(doc.page_content) for doc in selected)
+    index.close()
+
+    n = len(queries)
+    print(
+        f"{label:<16} {len(chunks):>6} {text_bytes / 1e6:8.2f} {len(chunks) * args.dims * 4 / 1e6:9.2f} "
+        f"{os.path.getsize(path) / 1e6:7.2f} {bm25_ms:7.2f} {vector_ms:9.2f} {answered / n:8.2f} "
+        f"{coverage / labels:8.2f} {top_tokens / n:7.0f} {selected_tokens / n:8.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Markdown, or markdown.py's .json/.jsonl")
+    parser.add_argument("--markdown", default=DEFAULT_SOURCE, help="what the newline splitter reads")
+    parser.add_argument("--queries", default=QUERIES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[800, 1000, 1200], help="structure chunk sizes")
+    parser.add_argument("--headings-in-text", choices=["true", "false"], default=str(INGEST_HEADINGS_IN_TEXT).lower())
+    parser.add_argument("--dims", type=int, default=3072)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    chunkings = [("lines 800/300", split_markdown(args.markdown))]
+    for size in args.sizes:
+        chunkings.append((f"structure {size}", chunk_document(args.source, size, args.headings_in_text == "true")))
+
+    print(f"{len(queries)} queries, top {TOP_K}, {args.dims}-dim vectors, source {os.path.basename(args.source)}")
+    print(
+        f"{'chunking':<16} {'chunks':>6} {'text MB':>8} {'vector MB':>9} {'bm25 MB':>7} {'bm25 ms':>7} "
+        f"{'vector ms':>9} {'answered':>8} {'coverage':>8} {'tokens':>7} {'selected':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, chunks in chunkings:
+            compare(label, chunks, queries, args, tmp)
+
+
+if __name__ == "__main__":
+    main()
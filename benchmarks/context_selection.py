@@ -0,0 +1,116 @@
+"""
+Context the knowledgebase tool returns with and without the selection of
+utils/context_selection.py, over the labelled queries of
+benchmarks/data/retrieval_queries.jsonl.
+
+Candidates come from BM25 over the source markdown, built offline as in
+benchmarks/retrieval_eval.py, with scores divided by the best one so the
+relative cut-off sees the same (0, 1] range as cosine similarity. The
+baseline is the fixed top 5 the tool returned before. Reported per
+configuration, averaged over the queries:
+
+    tokens     approximate context tokens returned (RERANK_CHARS_PER_TOKEN)
+    saved      tokens saved against the baseline
+    answered   queries whose context contains a relevant phrase
+    coverage   relevant phrases present in the context / those present in
+               the baseline top 5
+    relevant   share of the context tokens in passages with a relevant phrase
+    ms         selection time per query (retrieval excluded)
+
+    python benchmarks/context_selection.py --budgets 600 1200 0
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Database"))
+
+from ingest import DEFAULT_SOURCE, chunk_id, split_markdown
+from utils.bm25 import BM25Index, build_bm25_index
+from utils.context_selection import RERANK_CANDIDATES, estimate_tokens, select_context
+from retrieval_eval import QUERIES, is_relevant, load_queries, nfc
+
+BASELINE_K = 5
+
+
+def normalised(scored):
+    best = scored[0][1] if scored else 1.0
+    return [(doc, score / best) for doc, score in scored]
+
+
+def measure(docs, labels, baseline_labels):
+    texts = [nfc(doc.page_content) for doc in docs]
+    tokens = sum(estimate_tokens(text) for text in texts)
+    found = {label for label in labels if any(nfc(label) in text for text in texts)}
+    relevant = sum(estimate_tokens(text) for text in texts if is_relevant(text, labels))
+    return {
+        "tokens": tokens,
+        "answered": 1.0 if found else 0.0,
+        "coverage": len(found & baseline_labels) / len(baseline_labels) if baseline_labels else 1.0,
+        "relevant": relevant / tokens if tokens else 0.0,
+    }
+
+
+def report(label, rows, baseline_tokens, ms=None):
+    mean = {key: sum(row[key] for row in rows) / len(rows) for key in rows[0]}
+    saved = 1 - mean["tokens"] / baseline_tokens
+    timing = f"{ms:7.3f}" if ms is not None else f"{'-':>7}"
+    print(
+        f"{label:<34} {mean['tokens']:7.0f} {saved:6.0%} {mean['answered']:9.2f} "
+        f"{mean['coverage']:9.2f} {mean['relevant']:9.2f} {timing}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--queries", default=QUERIES)
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[600, 1200, 0], help="RERANK_TOKEN_BUDGET values, 0 for none")
+    parser.add_argument("--relative", type=float, nargs="+", default=[0.6, 0.8], help="RERANK_RELATIVE_SCORE values")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    chunks = split_markdown(args.source)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb.bm25")
+        build_bm25_index(((chunk_id("kb", chunk), chunk["text"], chunk["metadata"]) for chunk in chunks), path)
+        index = BM25Index(path)
+        candidates = [normalised(index.search_with_score(query["query"], args.candidates)) for query in queries]
+        index.close()
+
+    baselines = []
+    baseline_labels = []
+    for query, scored in zip(queries, candidates):
+        docs = [doc for doc, _ in scored[:BASELINE_K]]
+        labels = {label for label in query["relevant"] if any(nfc(label) in nfc(doc.page_content) for doc in docs)}
+        baseline_labels.append(labels)
+        baselines.append(measure(docs, query["relevant"], labels))
+    baseline_tokens = sum(row["tokens"] for row in baselines) / len(baselines)
+
+    print(f"{len(queries)} queries, BM25 top {args.candidates} candidates, baseline top {BASELINE_K}")
+    print(f"{'configuration':<34} {'tokens':>7} {'saved':>6} {'answered':>9} {'coverage':>9} {'relevant':>9} {'ms':>7}")
+    report("baseline top 5", baselines, baseline_tokens)
+
+    configurations = [("merge + dedup only", dict(relative_score=0.0, token_budget=0))]
+    for relative in args.relative:
+        for budget in args.budgets:
+            configurations.append((f"relative {relative} budget {budget or 'none'}", dict(relative_score=relative, token_budget=budget)))
+
+    for label, options in configurations:
+        rows = []
+        started = time.perf_counter()
+        selections = [select_context(scored, **options) for scored in candidates]
+        ms = (time.perf_counter() - started) * 1000 / len(queries)
+        for query, labels, docs in zip(queries, baseline_labels, selections):
+            rows.append(measure(docs, query["relevant"], labels))
+        report(label, rows, baseline_tokens, ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+End-to-end replay of recorded farmer traffic through the real API, on
+local stand-ins for Gemini, the MCP servers and Supabase.
+
+The API is started with langchain_chatbot/gunicorn.conf.py and serves
+``replay_app()`` below: api.py's app, whose AgentRegistry builds the agent
+on startup as in production, from
+
+* ``ReplayChatModel``, a deterministic chat model: for a question of the
+  corpus it calls the recorded tool, then streams the recorded number of
+  words, waiting ``--think-ms`` before each model call's first chunk and
+  ``--gap-ms`` between words;
+* the MCP servers of a generated config (MCP_CONFIG_FILE), both
+  benchmarks/fake_mcp_server.py over stdio: the knowledgebase, answering
+  after ``--kb-delay-ms`` with ``--doc-chars`` per passage, and tavily's
+  search after ``--search-delay-ms``; they go through MCPSessionManager's
+  pools like the real ones;
+* an in-memory checkpointer, or with ``--checkpointer postgres`` the real
+  Postgres checkpointer on a database created for the run (and dropped
+  after it) on the server of DB_URI.
+
+The conversations of benchmarks/data/farmer_questions.jsonl are replayed
+by ``--concurrency`` clients, each sending its conversation's turns in one
+thread, for ``--duration`` seconds per level. Reported per level:
+
+    req/s        completed answers per second
+    TTFT         request to the first answer word, p50/p95/p99
+    total        request to the end of the answer, p50
+    MB           PSS of the server's processes (gunicorn, workers, MCP
+                 servers) idle before the level and at its peak
+    KB/stream    (peak - idle) / concurrency
+    fds          open files of those processes: idle, peak, and after the
+                 level has drained (growth there is a leak, or a pool
+                 such as the Postgres checkpointer's opening connections
+                 on the first level that needs them)
+
+followed by the mean of each stage of /metrics (utils/telemetry.py).
+``--save`` writes the results as JSON; ``--baseline`` compares a run with
+saved results and exits with 1 when throughput, TTFT p95 or memory per
+stream are worse by more than ``--tolerance``, or open files grew more.
+
+    python benchmarks/e2e_replay.py --concurrency 1 8 32 --duration 20 --save replay.json
+    python benchmarks/e2e_replay.py --concurrency 1 8 32 --duration 20 --baseline replay.json
+
+The clients run on the same machine; pin them apart (``taskset``) when
+comparing numbers across machines.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+import httpx
+
+from fake_chat_model import FakeChatModel, history, tool_call, words
+
+CONFIG = os.path.join(ROOT, "langchain_chatbot", "gunicorn.conf.py")
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "farmer_questions.jsonl")
+FAKE_MCP_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mcp_server.py")
+FIRST_TOKEN = b'"type":"stream"'
+ERROR_FRAME = b'"type":"error"'
+# limits lifted so the levels measure the stack rather than admission control; set them to test it
+SERVER_DEFAULTS = {
+    "RATE_LIMIT_PER_MINUTE": "0",
+    "STREAM_MAX_ACTIVE": "1000",
+    "STREAM_MAX_QUEUED": "1000",
+    "STREAM_DEADLINE": "60",
+    "MCP_POOL_SIZE": "2",
+}
+SERVER_ENV = {
+    "ANSWER_CACHE_ENABLED": "false",
+    # the summary model is Gemini
+    "HISTORY_SUMMARY": "false",
+    "CHECKPOINT_COMPACT_INTERVAL": "0",
+    "LANGSMITH_TRACING": "false",
+    "APP_VERSION": "replay",
+    "GOOGLE_API_KEY": "replay",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def conversations(turns):
+    """The corpus as lists of turns, one per conversation, in corpus order."""
+    grouped = {}
+    for turn in turns:
+        grouped.setdefault(turn["conversation"], []).append(turn)
+    return list(grouped.values())
+
+
+class ReplayChatModel(FakeChatModel):
+    """Calls the corpus question's recorded tool, then streams its recorded number of words."""
+
+    turns: dict = {}
+    think: float = 0.3
+    # words answering a question that is not in the corpus
+    tokens: int = 100
+
+    def question(self, messages):
+        # the corpus question asked last is the current turn's
+        text = history(messages)
+        question = max(self.turns, key=text.rfind, default="")
+        return question if question and text.rfind(question) >= 0 else ""
+
+    def tool_call(self, question):
+        tool = self.turns.get(question, (None, None))[0]
+        return tool_call(tool, question) if tool else None
+
+    def answer(self, question):
+        return words(self.turns.get(question, (None, self.tokens))[1])
+
+
+def replay_app():
+    """api.py's app on the stand-ins, built in each gunicorn worker after the fork."""
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    import api
+    from agent_registry import AgentRegistry
+
+    turns = {turn["question"]: (turn["tool"], turn["answer_tokens"]) for turn in load_corpus(os.environ["REPLAY_CORPUS"])}
+    model = ReplayChatModel(
+        turns=turns, think=float(os.environ["REPLAY_THINK"]), gap=float(os.environ["REPLAY_GAP"])
+    )
+    # None: main.create_checkpointer() on DB_URI, as in production
+    checkpointer = InMemorySaver() if os.environ["REPLAY_CHECKPOINTER"] == "memory" else None
+    # the lifespan starts whichever registry the module holds
+    api.registry = AgentRegistry(model=model, checkpointer=checkpointer)
+    return api.app
+
+
+def mcp_config(args):
+    def server(role, delay_ms):
+        return {
+            "command": sys.executable,
+            "args": [FAKE_MCP_SERVER],
+            "env": {"FAKE_MCP_ROLE": role, "FAKE_MCP_DELAY": str(delay_ms / 1000), "FAKE_MCP_DOC_CHARS": str(args.doc_chars)},
+        }
+
+    return {
+        "mcpServers": {
+            "tavily-mcp": server("search", args.search_delay_ms),
+            "livestock_mcp_agent": server("knowledgebase", args.kb_delay_ms),
+        }
+    }
+
+
+def create_database(admin_uri, name):
+    import psycopg
+
+    with psycopg.connect(admin_uri, autocommit=True) as conn:
+        conn.execute(f'CREATE DATABASE "{name}"')
+    return psycopg.conninfo.make_conninfo(admin_uri, dbname=name)
+
+
+def drop_database(admin_uri, name):
+    import psycopg
+
+    with psycopg.connect(admin_uri, autocommit=True) as conn:
+        conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+
+def start_server(args, tmp, db_uri):
+    config = os.path.join(tmp, "mcp_config.json")
+    with open(config, "w") as f:
+        json.dump(mcp_config(args), f)
+    env = {
+        **SERVER_DEFAULTS,
+        **os.environ,
+        **SERVER_ENV,
+        "MCP_CONFIG_FILE": config,
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(tmp, "metrics"),
+        "DB_URI": db_uri,
+        "REPLAY_CORPUS": args.corpus,
+        "REPLAY_CHECKPOINTER": args.checkpointer,
+        "REPLAY_THINK": str(args.think_ms / 1000),
+        "REPLAY_GAP": str(args.gap_ms / 1000),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "-c", CONFIG,
+            "--workers", str(args.workers),
+            "--bind", f"127.0.0.1:{args.port}",
+            "--pythonpath", os.path.join(ROOT, "benchmarks"),
+            "--log-level", "warning",
+            "e2e_replay:replay_app()",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, base, timeout=120):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        try:
+            if (await client.get(f"{base}/stream/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def process_tree(pid):
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f"/proc/{parent}/task"):
+                with open(f"/proc/{parent}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return pids
+
+
+def snapshot(pid):
+    """(PSS in KB, open files, processes) of ``pid`` and its descendants."""
+    pss = fds = count = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/smaps_rollup") as f:
+                pss += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+            fds += len(os.listdir(f"/proc/{member}/fd"))
+            count += 1
+        except (FileNotFoundError, ProcessLookupError, StopIteration):
+            continue
+    return pss, fds, count
+
+
+async def sample(pid, peaks, stop, interval=0.2):
+    while not stop.is_set():
+        pss, fds, _ = await asyncio.to_thread(snapshot, pid)
+        peaks["pss"] = max(peaks["pss"], pss)
+        peaks["fds"] = max(peaks["fds"], fds)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except TimeoutError:
+            pass
+
+
+async def ask(client, url, question, thread_id):
+    """Seconds to the first answer word and to the end; None when the request failed."""
+    started = time.perf_counter()
+    first = None
+    tail = b""
+    async with client.stream("POST", url, json={"messages": question, "thread_id": thread_id}) as response:
+        if response.status_code != 200:
+            return None
+        async for data in response.aiter_bytes():
+            window = tail + data
+            if ERROR_FRAME in window:
+                return None
+            if first is None and FIRST_TOKEN in window:
+                first = time.perf_counter() - started
+            tail = data[-len(ERROR_FRAME):]
+    if first is None:
+        return None
+    return first, time.perf_counter() - started
+
+
+async def level(client, url, dialogues, concurrency, duration, label):
+    """Closed-loop replay; the answers and failures of the turns sent before ``duration`` ran out."""
+    results = []
+    failed = 0
+    queue = itertools.cycle(enumerate(dialogues))
+    passes = itertools.count()
+    stop = time.perf_counter() + duration
+
+    async def client_loop(c):
+        nonlocal failed
+        while time.perf_counter() < stop:
+            index, dialogue = next(queue)
+            thread_id = f"{label}-{c}-{index}-{next(passes)}"
+            for turn in dialogue:
+                if time.perf_counter() >= stop:
+                    break
+                try:
+                    result = await ask(client, url, turn["question"], thread_id)
+                except httpx.HTTPError:
+                    result = None
+                if result is None:
+                    failed += 1
+                else:
+                    results.append(result)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(c) for c in range(concurrency)))
+    return results, failed, time.perf_counter() - started
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def stage_means(text):
+    """{(stage, target): (mean ms, count)} from a /metrics body."""
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for suffix, into in (("_sum{", sums), ("_count{", counts)):
+            prefix = "livestock_stage_seconds" + suffix
+            if line.startswith(prefix):
+                labels, value = line[len(prefix):].rsplit("} ", 1)
+                fields = dict(part.split("=", 1) for part in labels.split(","))
+                into[fields["stage"].strip('"'), fields["target"].strip('"')] = float(value)
+    return {key: (sums[key] / counts[key] * 1000, int(counts[key])) for key in counts if counts[key]}
+
+
+async def run(args):
+    dialogues = conversations(load_corpus(args.corpus))
+    rows = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10)
+    base = f"http://127.0.0.1:{args.port}"
+    database = None
+    db_uri = ""
+    admin_uri = os.getenv("DB_URI")
+    if args.checkpointer == "postgres":
+        if not admin_uri:
+            sys.exit("--checkpointer postgres needs DB_URI; the run creates and drops its own database there")
+        database = f"replay_{os.getpid()}"
+        db_uri = create_database(admin_uri, database)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(args, tmp, db_uri)
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                await wait_ready(client, base)
+            async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+                await level(client, f"{base}/stream", dialogues, min(args.concurrency), args.warmup, "warmup")
+            for concurrency in args.concurrency:
+                await asyncio.sleep(1)
+                idle_pss, idle_fds, processes = await asyncio.to_thread(snapshot, server.pid)
+                peaks = {"pss": idle_pss, "fds": idle_fds}
+                stop = asyncio.Event()
+                sampler = asyncio.create_task(sample(server.pid, peaks, stop))
+                # a client per level, closed before the files are counted again, so keep-alive sockets don't count
+                async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+                    results, failed, elapsed = await level(
+                        client, f"{base}/stream", dialogues, concurrency, args.duration, f"c{concurrency}"
+                    )
+                stop.set()
+                await sampler
+                await asyncio.sleep(1)
+                _, after_fds, _ = await asyncio.to_thread(snapshot, server.pid)
+                ttfts = [first * 1000 for first, _ in results]
+                rows[concurrency] = {
+                    "answers": len(results),
+                    "failed": failed,
+                    "rps": len(results) / elapsed,
+                    "ttft_p50_ms": percentile(ttfts, 0.5),
+                    "ttft_p95_ms": percentile(ttfts, 0.95),
+                    "ttft_p99_ms": percentile(ttfts, 0.99),
+                    "total_p50_ms": percentile([total * 1000 for _, total in results], 0.5),
+                    "idle_mb": idle_pss / 1024,
+                    "peak_mb": peaks["pss"] / 1024,
+                    "kb_per_stream": (peaks["pss"] - idle_pss) / concurrency,
+                    "processes": processes,
+                    "idle_fds": idle_fds,
+                    "peak_fds": peaks["fds"],
+                    "after_fds": after_fds,
+                }
+            async with httpx.AsyncClient(timeout=10) as client:
+                stages = stage_means((await client.get(f"{base}/metrics")).text)
+        finally:
+            server.terminate()
+            server.wait()
+            if database is not None:
+                drop_database(admin_uri, database)
+    return rows, stages
+
+
+def report(args, rows, stages):
+    print(
+        f"{sum(len(d) for d in conversations(load_corpus(args.corpus)))} turns replayed in a loop, "
+        f"{args.workers} worker(s), {args.checkpointer} checkpointer, model {args.think_ms:.0f}ms + "
+        f"{args.gap_ms:.0f}ms/word, knowledgebase {args.kb_delay_ms:.0f}ms, search {args.search_delay_ms:.0f}ms"
+    )
+    print(
+        f"{'clients':>7} {'answers':>7} {'failed':>6} {'req/s':>6} {'TTFT p50':>9} {'p95':>7} {'p99':>7} "
+        f"{'total p50':>9} {'MB idle':>8} {'MB peak':>8} {'KB/stream':>9} {'procs':>5} {'fds idle/peak/after':>20}"
+    )
+    for concurrency, row in rows.items():
+        fds = f"{row['idle_fds']}/{row['peak_fds']}/{row['after_fds']}"
+        print(
+            f"{concurrency:>7} {row['answers']:>7} {row['failed']:>6} {row['rps']:6.1f} {row['ttft_p50_ms']:7.0f}ms "
+            f"{row['ttft_p95_ms']:5.0f}ms {row['ttft_p99_ms']:5.0f}ms {row['total_p50_ms']:7.0f}ms "
+            f"{row['idle_mb']:8.1f} {row['peak_mb']:8.1f} {row['kb_per_stream']:9.0f} {row['processes']:>5} {fds:>20}"
+        )
+    print("\nserver stages (mean over the run)")
+    for (name, target), (mean, count) in sorted(stages.items()):
+        print(f"  {name + (' ' + target if target else ''):<36} {mean:9.2f}ms  n={count}")
+
+
+def compare(rows, baseline, tolerance):
+    """Lines describing regressions against ``baseline``; empty when there are none."""
+    regressions = []
+    for concurrency, row in rows.items():
+        before = baseline.get(str(concurrency))
+        if before is None:
+            continue
+        checks = [
+            ("req/s", row["rps"] < before["rps"] * (1 - tolerance), before["rps"], row["rps"]),
+            ("TTFT p95", row["ttft_p95_ms"] > before["ttft_p95_ms"] * (1 + tolerance), before["ttft_p95_ms"], row["ttft_p95_ms"]),
+            (
+                "KB/stream",
+                row["kb_per_stream"] > max(before["kb_per_stream"], 1024) * (1 + tolerance),
+                before["kb_per_stream"],
+                row["kb_per_stream"],
+            ),
+            (
+                "fds after",
+                row["after_fds"] - row["idle_fds"] > max(0, before["after_fds"] - before["idle_fds"]),
+                before["after_fds"] - before["idle_fds"],
+                row["after_fds"] - row["idle_fds"],
+            ),
+        ]
+        if row["failed"] > before["failed"]:
+            checks.append(("failed", True, before["failed"], row["failed"]))
+        for name, worse, old, new in checks:
+            if worse:
+                regressions.append(f"{concurrency} clients: {name} {old:.1f} -> {new:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--checkpointer", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--think-ms", type=float, default=300, help="model delay before each call's first chunk")
+    parser.add_argument("--gap-ms", type=float, default=10, help="model delay between words")
+    parser.add_argument("--kb-delay-ms", type=float, default=150)
+    parser.add_argument("--search-delay-ms", type=float, default=800)
+    parser.add_argument("--doc-chars", type=int, default=1000, help="characters per knowledgebase passage")
+    parser.add_argument("--port", type=int, default=8793)
+    parser.add_argument("--save", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="results saved by an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    rows, stages = asyncio.run(run(args))
+    report(args, rows, stages)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(rows, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        print("\n" + ("\n".join(f"REGRESSION {line}" for line in regressions) or "no regressions against the baseline"))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
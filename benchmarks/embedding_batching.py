@@ -0,0 +1,149 @@
+"""
+Query-embedding throughput with and without BatchingEmbeddings, against a
+local fake of an OpenAI-compatible embeddings endpoint (the NVIDIA BGE-M3
+one NvidiaOpenAIEmbeddings_BGE_M3 talks to).
+
+The fake answers ``POST /v1/embeddings`` after ``--latency`` ms plus
+``--per-text`` ms per input, runs at most ``--server-concurrency`` requests
+at once (a provider's concurrency limit) and returns a deterministic vector
+per text. ``--clients`` concurrent callers embed ``--queries`` questions of
+benchmarks/data/retrieval_queries.jsonl, a ``--repeat`` share of them asked
+verbatim by several farmers, the rest made unique. Reported per mode:
+queries/s, caller latency p50/p95, and the requests and texts the endpoint
+received. Every batched vector is checked against the direct one.
+
+    python benchmarks/embedding_batching.py --queries 2000 --clients 64
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import functools
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+from utils.embedding_batcher import BatchingEmbeddings
+from utils.nvidia_bge_m3 import NvidiaOpenAIEmbeddings_BGE_M3
+
+QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retrieval_queries.jsonl")
+
+
+@functools.lru_cache(maxsize=None)
+def fake_vector(text, dims):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(dims).astype(np.float32).tolist()
+
+
+def fake_server(args, counters):
+    app = FastAPI()
+    limit = asyncio.Semaphore(args.server_concurrency)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"]
+        counters["requests"] += 1
+        counters["texts"] += len(texts)
+        async with limit:
+            await asyncio.sleep((args.latency + args.per_text * len(texts)) / 1000)
+        return {
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_vector(text, args.dims)}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+def workload(args):
+    with open(QUERIES, encoding="utf-8") as f:
+        base = [json.loads(line)["query"] for line in f if line.strip()]
+    rng = random.Random(7)
+    return [rng.choice(base) if rng.random() < args.repeat else f"{rng.choice(base)} ({i})" for i in range(args.queries)]
+
+
+async def run(embedder, queries, clients):
+    latencies = []
+    vectors = {}
+    queue = list(reversed(queries))
+
+    async def client():
+        while queue:
+            text = queue.pop()
+            started = time.perf_counter()
+            vectors[text] = await embedder.aembed_query(text)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(queries) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], vectors
+
+
+async def main(args):
+    counters = {"requests": 0, "texts": 0}
+    server = uvicorn.Server(uvicorn.Config(fake_server(args, counters), host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    queries = workload(args)
+    direct = NvidiaOpenAIEmbeddings_BGE_M3(api_key="benchmark", base_url=f"http://127.0.0.1:{args.port}/v1")
+    rows = []
+    outputs = {}
+    try:
+        for label, embedder in (
+            ("direct", direct),
+            ("batched", BatchingEmbeddings(direct, window_ms=args.window, max_batch=args.max_batch, concurrency=args.concurrency)),
+        ):
+            counters.update(requests=0, texts=0)
+            rps, p50, p95, outputs[label] = await run(embedder, queries, args.clients)
+            rows.append((label, rps, p50, p95, counters["requests"], counters["texts"]))
+            if isinstance(embedder, BatchingEmbeddings):
+                print(f"batcher: {embedder.stats()}")
+    finally:
+        server.should_exit = True
+        await serving
+
+    same = all(np.allclose(outputs["batched"][text], outputs["direct"][text]) for text in outputs["direct"])
+    print(
+        f"{args.queries} queries ({len(set(queries))} distinct), {args.clients} callers; endpoint "
+        f"{args.latency:.0f} ms + {args.per_text:.1f} ms/text, {args.server_concurrency} requests at once"
+    )
+    print(f"{'mode':<8} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9} {'texts':>7}")
+    for label, rps, p50, p95, requests, texts in rows:
+        print(f"{label:<8} {rps:10.1f} {p50 * 1000:8.1f} {p95 * 1000:8.1f} {requests:>9} {texts:>7}")
+    print(f"{'ok  ' if same else 'FAIL'} every caller got the vector of its own text")
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--repeat", type=float, default=0.2, help="share of queries repeating a common question")
+    parser.add_argument("--latency", type=float, default=60, help="ms per request at the fake endpoint")
+    parser.add_argument("--per-text", type=float, default=0.5, help="extra ms per text in a request")
+    parser.add_argument("--server-concurrency", type=int, default=8)
+    # small vectors keep JSON encoding, on the same CPU as the client, out of the measurement
+    parser.add_argument("--dims", type=int, default=64)
+    parser.add_argument("--window", type=float, default=5, help="EMBED_BATCH_WINDOW_MS")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8794)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
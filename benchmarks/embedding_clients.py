@@ -0,0 +1,146 @@
+"""
+Sync vs async query embedding at 1, 8 and 32 concurrent callers, for both
+providers, against a local mock endpoint.
+
+The mock serves the Gemini ``batchEmbedContents`` and the OpenAI-compatible
+``/v1/embeddings`` APIs after ``--latency`` ms, fails a ``--fail-rate``
+share of requests with 503 (exercising the jittered retries) and counts
+the TCP connections it sees. ``sync`` runs the blocking ``embed_query`` on
+that many threads, the way ingestion scripts overlap calls; ``async`` runs
+``aembed_query`` on that many tasks of one event loop. Reported per run:
+calls/s, client-side p50/p95, the embedder's own histogram p95 (bucket
+bound), retries, and connections opened after a warm-up call.
+
+    python benchmarks/embedding_clients.py --calls 256 --latency 50
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# short backoff so the injected failures do not dominate the run
+os.environ.setdefault("EMBED_RETRY_BASE", "0.05")
+
+from utils.embedding_engine import GeminiEmbedder
+from utils.nvidia_bge_m3 import NvidiaOpenAIEmbeddings_BGE_M3
+from utils.http_clients import LatencyHistogram
+
+VECTOR = [0.01] * 64
+
+
+def mock_server(args, connections):
+    app = FastAPI()
+    rng = random.Random(11)
+
+    async def answer(request, body):
+        connections.add((request.client.host, request.client.port))
+        await asyncio.sleep(args.latency / 1000)
+        if rng.random() < args.fail_rate:
+            return JSONResponse({"error": {"code": 503, "message": "overloaded", "status": "UNAVAILABLE"}}, status_code=503)
+        return JSONResponse(body)
+
+    @app.post("/v1beta/models/{model}:batchEmbedContents")
+    async def gemini(model: str, request: Request):
+        requests = (await request.json())["requests"]
+        return await answer(request, {"embeddings": [{"values": VECTOR} for _ in requests]})
+
+    @app.post("/v1/embeddings")
+    async def openai(request: Request):
+        texts = (await request.json())["input"]
+        return await answer(request, {
+            "object": "list",
+            "model": "mock",
+            "data": [{"object": "embedding", "index": i, "embedding": VECTOR} for i in range(len(texts))],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    return app
+
+
+def embedder(provider, base):
+    if provider == "gemini":
+        return GeminiEmbedder(api_key="benchmark", base_url=base)
+    return NvidiaOpenAIEmbeddings_BGE_M3(api_key="benchmark", base_url=f"{base}/v1")
+
+
+async def run_async(engine, calls, concurrency):
+    latencies = []
+    remaining = list(range(calls))
+
+    async def caller():
+        while remaining:
+            i = remaining.pop()
+            started = time.perf_counter()
+            await engine.aembed_query(f"প্রশ্ন {i}")
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return latencies
+
+
+async def run_sync(engine, calls, concurrency):
+    def call(i):
+        started = time.perf_counter()
+        engine.embed_query(f"প্রশ্ন {i}")
+        return time.perf_counter() - started
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return await asyncio.gather(*(loop.run_in_executor(pool, call, i) for i in range(calls)))
+
+
+async def main(args):
+    connections = set()
+    server = uvicorn.Server(uvicorn.Config(mock_server(args, connections), host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.calls} calls per run, mock latency {args.latency:.0f} ms, {args.fail_rate:.0%} of requests fail with 503")
+    print(f"{'provider':<8} {'mode':<6} {'callers':>7} {'calls/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'hist p95':>8} {'retries':>7} {'conns':>6}")
+    try:
+        for provider in ("gemini", "nvidia"):
+            for concurrency in args.concurrency:
+                for mode, run in (("sync", run_sync), ("async", run_async)):
+                    engine = embedder(provider, base)
+                    # the SDK import and client setup are not what is measured
+                    if mode == "sync":
+                        await asyncio.to_thread(engine.embed_query, "warm up")
+                    else:
+                        await engine.aembed_query("warm up")
+                    engine.latency = LatencyHistogram()
+                    connections.clear()
+                    started = time.perf_counter()
+                    latencies = sorted(await run(engine, args.calls, concurrency))
+                    elapsed = time.perf_counter() - started
+                    stats = engine.stats()
+                    print(
+                        f"{provider:<8} {mode:<6} {concurrency:>7} {args.calls / elapsed:8.1f} "
+                        f"{latencies[len(latencies) // 2] * 1000:7.1f} {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} "
+                        f"{str(stats['p95_ms']):>8} {stats['retries']:>7} {len(connections):>6}"
+                    )
+    finally:
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=50, help="ms per request at the mock")
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8795)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,109 @@
+"""
+Stand-in chat model for benchmarks. Plays Gemini's part in the real agent
+graph: on a new question it calls a tool, and once the tool result is in
+it streams an answer word by word, with delays the benchmark sets.
+
+    model = FakeChatModel(tokens=200, gap=0.01)
+    agent = build_agent(tools, InMemorySaver(), model=model)
+
+Subclasses script other conversations through ``question``, ``tool_call``,
+``answer`` and ``delay``.
+"""
+import re
+import json
+import uuid
+import asyncio
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = "গাভীর দুধ জ্বর হলে ক্যালসিয়াম বোরোগ্লুকোনেট শিরায় ধীরে ধীরে দিতে হবে এবং খামারে পরিষ্কার পানি রাখুন".split()
+# the argument each tool takes the question in
+TOOL_ARGUMENTS = {"knowledgebase": "messages", "tavily-search": "query"}
+_HUMAN = re.compile(r"""HumanMessage\(content=(['"])(.*?)(?<!\\)\1""", re.S)
+
+
+def history(messages):
+    # build_prompt() folds the history into one human message
+    return str(messages[-1].content)
+
+
+def answered(messages):
+    """True once a tool result follows the question of the current turn."""
+    text = history(messages)
+    return text.rfind("ToolMessage(") > text.rfind("HumanMessage(")
+
+
+def words(count):
+    return [WORDS[i % len(WORDS)] for i in range(count)]
+
+
+def tool_call(tool, question):
+    return {"name": tool, "args": {TOOL_ARGUMENTS.get(tool, "query"): question}, "id": f"call-{uuid.uuid4().hex[:12]}"}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Calls ``tool`` for a new question, then streams ``tokens`` words.
+    ``think`` is waited before each model call's first chunk and ``gap``
+    between words; ``produced`` counts the words streamed.
+    """
+
+    tool: str = "knowledgebase"
+    tokens: int = 50
+    think: float = 0.0
+    gap: float = 0.01
+    produced: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-livestock"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def question(self, messages):
+        """The question of the current turn."""
+        found = _HUMAN.findall(history(messages))
+        return found[-1][1] if found else ""
+
+    def tool_call(self, question):
+        """The tool call for ``question``, or None to answer it without a tool."""
+        return tool_call(self.tool, question)
+
+    def answer(self, question):
+        """The answer's words."""
+        return words(self.tokens)
+
+    def delay(self, messages):
+        """Seconds before the first chunk of a model call."""
+        return self.think
+
+    def _reply(self, messages):
+        question = self.question(messages)
+        call = None if answered(messages) else self.tool_call(question)
+        return call, [] if call else self.answer(question)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        call, answer = self._reply(messages)
+        message = AIMessage(content="", tool_calls=[call]) if call else AIMessage(content=" ".join(answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay = self.delay(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        call, answer = self._reply(messages)
+        if call:
+            chunk = {**call, "args": json.dumps(call["args"], ensure_ascii=False), "index": 0}
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[chunk]))
+            return
+        for i, word in enumerate(answer):
+            if i and self.gap:
+                await asyncio.sleep(self.gap)
+            self.produced += 1
+            token = word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,83 @@
+"""
+Stand-in stdio MCP server for benchmarks. Mirrors the shape of
+langchain_chatbot/server.py without touching Gemini or Postgres, or, with
+FAKE_MCP_ROLE=search, the search tool of tavily-mcp.
+
+    FAKE_MCP_DELAY=0.05 python benchmarks/fake_mcp_server.py
+"""
+import os
+import asyncio
+from fastmcp import FastMCP
+
+mcp = FastMCP(name="fake_mcp")
+DELAY = float(os.getenv("FAKE_MCP_DELAY", "0.01"))
+# when set, a line is appended here for every call the client cancels
+CANCEL_LOG = os.getenv("FAKE_MCP_CANCEL_LOG")
+# "knowledgebase" or "search"
+ROLE = os.getenv("FAKE_MCP_ROLE", "knowledgebase")
+# characters per returned document; 0 returns one-line placeholders
+DOC_CHARS = int(os.getenv("FAKE_MCP_DOC_CHARS", "0"))
+
+PASSAGE = "গাভীর দুধ জ্বর হলে ক্যালসিয়াম বোরোগ্লুকোনেট শিরায় ধীরে ধীরে দিতে হবে। "
+
+
+def documents(query, count=5):
+    if not DOC_CHARS:
+        return [f"document {i} for {query}" for i in range(count)]
+    text = (PASSAGE * (DOC_CHARS // len(PASSAGE) + 1))[:DOC_CHARS]
+    return [f"{i}: {query}\n{text}" for i in range(count)]
+
+
+async def wait(query):
+    try:
+        await asyncio.sleep(DELAY)
+    except asyncio.CancelledError:
+        if CANCEL_LOG:
+            with open(CANCEL_LOG, "a") as f:
+                f.write(f"{query}\n")
+        raise
+
+
+if ROLE == "knowledgebase":
+
+    @mcp.tool
+    async def knowledgebase(messages: str):
+        """
+        Fake knowledgebase lookup.
+
+        Args:
+            messages (str): The query message.
+        Returns:
+            list: A list of documents' contents.
+        """
+        await wait(messages)
+        return documents(messages)
+
+    @mcp.tool
+    async def slow():
+        """Outlast the client's call timeout."""
+        await asyncio.sleep(3600)
+
+    @mcp.tool
+    def crash():
+        """Kill the server process to exercise restarts."""
+        os._exit(1)
+
+elif ROLE == "search":
+
+    @mcp.tool(name="tavily-search")
+    async def tavily_search(query: str):
+        """
+        Fake web search.
+
+        Args:
+            query (str): The search query.
+        Returns:
+            list: Result snippets.
+        """
+        await wait(query)
+        return documents(query, 3)
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,195 @@
+"""
+Prompt tokens and time to first token against conversation length, with
+the full history vs. the HistoryPolicy window.
+
+One conversation replays the questions of benchmarks/data/retrieval_queries.jsonl
+through the real agent graph (build_agent, in-memory checkpointer). The
+knowledgebase tool returns the top 5 BM25 chunks of the corpus, and a
+replaying chat model stands in for Gemini: it calls the tool, then
+streams a fixed answer after a delay of ``base + per_token * prompt
+tokens``. The summary model of the windowed run is the same fake with a
+fixed ``--summary-delay``, which must not show up in the TTFT.
+
+The latency model defaults to the figures below; record Gemini's own with
+
+    GOOGLE_API_KEY=... python benchmarks/history_window.py --record benchmarks/data/gemini_ttft.jsonl
+
+and replay with ``--latency benchmarks/data/gemini_ttft.jsonl``.
+
+    python benchmarks/history_window.py --turns 30
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Database"))
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+for name in ("APP_VERSION", "LANGSMITH_API_KEY", "LANGSMITH_PROJECT", "GOOGLE_API_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from ingest import DEFAULT_SOURCE, chunk_id, split_markdown
+from utils.bm25 import BM25Index, build_bm25_index
+import main
+from main import build_agent, build_prompt
+from history import HistoryPolicy, count_tokens
+from fake_chat_model import FakeChatModel
+
+os.environ["LANGSMITH_TRACING"] = "false"
+
+QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retrieval_queries.jsonl")
+ANSWER = (
+    "🐔 গামবোরো রোগ প্রতিরোধে বাচ্চার বয়স ১০-১৪ দিনে প্রথম টিকা চোখে ফোঁটা দিয়ে দিন। "
+    "২১-২৪ দিন বয়সে বুস্টার ডোজ দিতে হবে। টিকা দেওয়ার আগে ও পরে ২ ঘণ্টা পানি বন্ধ রাখবেন না, "
+    "তবে টিকার পানিতে ক্লোরিন মেশাবেন না। খামার পরিষ্কার রাখুন এবং অসুস্থ মুরগি আলাদা করুন। "
+    "সমস্যা থাকলে নিকটস্থ উপজেলা প্রাণিসম্পদ অফিসে যোগাযোগ করুন।"
+)
+SUMMARY = "সারসংক্ষেপ: খামারি মুরগির টিকা ও রোগ নিয়ে জিজ্ঞেস করেছেন।"
+# seconds: delay before the first token = base + per_token * prompt tokens
+DEFAULT_BASE = 0.45
+DEFAULT_PER_TOKEN = 0.00004
+
+
+class ReplayChatModel(FakeChatModel):
+    """Calls the knowledgebase for a new question, then streams ANSWER; the delay grows with the prompt."""
+
+    base: float = DEFAULT_BASE
+    per_token: float = DEFAULT_PER_TOKEN
+    gap: float = 0.0
+    prompt_tokens: list = []
+
+    def answer(self, question):
+        return ANSWER.split(" ")
+
+    def delay(self, messages):
+        tokens = count_tokens(messages)
+        self.prompt_tokens.append(tokens)
+        return self.base + self.per_token * tokens
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        # only the summariser calls the model outside of a stream
+        await asyncio.sleep(self.base)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=SUMMARY))])
+
+
+def knowledgebase_tool(index):
+    async def knowledgebase(messages: str):
+        """Look up the livestock knowledgebase."""
+        return [doc.page_content for doc in index.search(messages, 5)]
+
+    return StructuredTool.from_function(coroutine=knowledgebase, name="knowledgebase")
+
+
+async def conversation(agent, model, questions, turns, thread_id):
+    """Per turn: prompt tokens of the answering model call and seconds to the first answer token."""
+    rows = []
+    config = {"configurable": {"thread_id": thread_id}}
+    for i in range(turns):
+        question = questions[i % len(questions)]
+        model.prompt_tokens.clear()
+        started = time.perf_counter()
+        first = None
+        async for event in agent.astream_events({"messages": [HumanMessage(content=question)]}, config, version="v2"):
+            if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content and first is None:
+                first = time.perf_counter() - started
+        rows.append((model.prompt_tokens[-1], first))
+    return rows
+
+
+def fit_latency(path):
+    with open(path) as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    tokens = np.array([s["prompt_tokens"] for s in samples], dtype=float)
+    ttft = np.array([s["ttft_s"] for s in samples])
+    per_token, base = np.polyfit(tokens, ttft, 1)
+    return float(base), float(per_token)
+
+
+async def record(path, questions, index, turns):
+    """TTFT of the real Gemini model for growing full-history prompts."""
+    tool = knowledgebase_tool(index)
+    prompt = build_prompt()
+    messages = []
+    with open(path, "w") as out:
+        for i in range(turns):
+            question = questions[i % len(questions)]
+            messages.append(HumanMessage(content=question))
+            chunks = await tool.ainvoke({"messages": question})
+            messages.append(AIMessage(content=json.dumps(chunks, ensure_ascii=False)))
+            started = time.perf_counter()
+            first = None
+            usage = None
+            async for chunk in main.google.astream(prompt.invoke({"messages": messages})):
+                if first is None and chunk.content:
+                    first = time.perf_counter() - started
+                usage = chunk.usage_metadata or usage
+            messages.append(AIMessage(content=ANSWER))
+            sample = {"prompt_tokens": usage["input_tokens"] if usage else None, "ttft_s": first}
+            out.write(json.dumps(sample) + "\n")
+            print(sample)
+
+
+async def main_async(args):
+    with open(QUERIES, encoding="utf-8") as f:
+        questions = [json.loads(line)["query"] for line in f if line.strip()]
+    chunks = split_markdown(DEFAULT_SOURCE)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb.bm25")
+        build_bm25_index(((chunk_id("kb", c), c["text"], c["metadata"]) for c in chunks), path)
+        index = BM25Index(path)
+
+        if args.record:
+            await record(args.record, questions, index, args.turns)
+            return
+
+        base, per_token = fit_latency(args.latency) if args.latency else (DEFAULT_BASE, DEFAULT_PER_TOKEN)
+        print(f"latency model: {base * 1000:.0f} ms + {per_token * 1e6:.1f} ms per 1k prompt tokens")
+        tools = [knowledgebase_tool(index)]
+        results = {}
+        for label, policy in (
+            ("full history", HistoryPolicy(max_tokens=0, tool_outputs="keep")),
+            ("window", HistoryPolicy(summary_model=ReplayChatModel(base=args.summary_delay))),
+        ):
+            model = ReplayChatModel(base=base, per_token=per_token)
+            agent = build_agent(tools, InMemorySaver(), model=model, history_policy=policy)
+            results[label] = await conversation(agent, model, questions, args.turns, label)
+            if policy.summary_model is not None:
+                state = (await agent.aget_state({"configurable": {"thread_id": label}})).values
+                # no summary is written while the conversation still fits the window
+                ids = [m.id for m in state["messages"]]
+                until = state.get("summarized_until")
+                covered = ids.index(until) + 1 if until in ids else 0
+                print(
+                    f"{label}: {policy.stats()}, summary in state covers {covered} of "
+                    f"{len(state['messages'])} messages"
+                )
+        index.close()
+
+    print(f"{'turn':>5} " + " ".join(f"{label + ' tokens':>20} {'TTFT ms':>8}" for label in results))
+    for i in range(args.turns):
+        if (i + 1) in (1, 2, 5) or (i + 1) % args.every == 0:
+            cells = [f"{rows[i][0]:>20} {rows[i][1] * 1000:8.0f}" for rows in results.values()]
+            print(f"{i + 1:>5} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--every", type=int, default=10)
+    parser.add_argument("--summary-delay", type=float, default=1.5)
+    parser.add_argument("--latency", help="jsonl of prompt_tokens/ttft_s samples to fit the latency model")
+    parser.add_argument("--record", help="record Gemini TTFT samples to this jsonl instead")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
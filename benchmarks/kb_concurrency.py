@@ -0,0 +1,67 @@
+"""
+Throughput of one knowledgebase MCP server process as concurrent callers
+grow from 1 to 64. Runs the real langchain_chatbot/server.py over stdio, so
+DB_URI, COLLECTION_NAME and GOOGLE_API_KEY must be set; pass --server to
+point at another stdio server (e.g. benchmarks/fake_mcp_server.py).
+
+    python benchmarks/kb_concurrency.py --calls-per-level 64
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.mcp_manager import MCPSessionPool
+
+QUESTIONS = [
+    "গরুর খুরা রোগের লক্ষণ কী?",
+    "মুরগির রানীক্ষেত রোগের টিকা কখন দিতে হয়?",
+    "ছাগলের পিপিআর রোগ হলে কী করব?",
+    "বাছুরকে কতটুকু দুধ খাওয়াতে হয়?",
+]
+
+
+async def run_level(pool, concurrency, calls):
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await pool.call_tool("knowledgebase", {"messages": QUESTIONS[i % len(QUESTIONS)]})
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return timings, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default=os.path.join(ROOT, "langchain_chatbot", "server.py"))
+    parser.add_argument("--calls-per-level", type=int, default=64)
+    args = parser.parse_args()
+
+    connection = {"command": sys.executable, "args": [args.server], "transport": "stdio"}
+    pool = MCPSessionPool("knowledgebase", connection, size=1)
+    await pool.start()
+    try:
+        await pool.call_tool("knowledgebase", {"messages": QUESTIONS[0]})
+        for concurrency in (1, 2, 4, 8, 16, 32, 64):
+            timings, elapsed = await run_level(pool, concurrency, max(args.calls_per_level, concurrency))
+            print(
+                f"concurrency={concurrency:<3} "
+                f"throughput={len(timings) / elapsed:7.1f}/s "
+                f"p50={statistics.median(timings) * 1000:8.1f}ms"
+            )
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
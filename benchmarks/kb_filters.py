@@ -0,0 +1,227 @@
+"""
+Latency and precision of the knowledgebase lookup with and without the
+species/topic filters (utils/metadata_tags.py), on a local pgvector
+database.
+
+The collection is written the way Database/ingest.py writes it: tagged
+structure chunks, COPY through PGVectorWriter, the tag indexes of
+METADATA_INDEXES, ANALYZE. Without embedding credentials the vectors are
+hashed TF-IDF vectors of the BM25 tokens (``--embeddings lexical``), a
+stand-in good enough to rank the labelled queries; ``--embeddings gemini``
+uses the configured model instead. For each filter mode over the labelled
+queries of benchmarks/data/retrieval_queries.jsonl:
+
+    answered    queries with a relevant phrase in the top 5 (a filtered
+                search returning nothing falls back to no filter, as the
+                tool does)
+    coverage    relevant phrases found in the top 5
+    precision   share of the top 5 matching the query's species/topic
+                labels, over the labelled queries
+    p50/p95 ms  asimilarity_search_with_score_by_vector, query embedding
+                excluded
+
+Latency is measured on the collection as ingested, then after adding
+``--copies`` jittered copies of every row (a larger knowledgebase), each
+time with and without the tag indexes. The plan of one filtered lookup is
+printed at the largest size.
+
+    DB_URI=postgresql://postgres:@/postgres?host=/tmp/pgdata python benchmarks/kb_filters.py --copies 20
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import argparse
+import hashlib
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import text
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Database"))
+
+from ingest import DEFAULT_SOURCE, PGVectorWriter, chunk_id, load_chunks
+from utils.bm25 import tokenize
+from utils.metadata_tags import clean_filter, matches
+from utils.vector_store import FILTER_EXPRESSIONS, METADATA_INDEXES, to_vector_literal
+from retrieval_eval import QUERIES, load_queries, nfc, percentile
+
+TOP_K = 5
+MODES = ("none", "species", "species+topic")
+
+
+class LexicalEmbeddings(Embeddings):
+    """Hashed, IDF-weighted token counts, L2-normalised; fitted on the chunks."""
+
+    def __init__(self, texts, dims):
+        self.dims = dims
+        df = Counter(token for t in texts for token in set(tokenize(t)))
+        self.idf = {token: math.log((len(texts) + 1) / (count + 1)) + 1 for token, count in df.items()}
+
+    def _bucket(self, token):
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") % self.dims
+
+    def _embed(self, text):
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for token, count in Counter(tokenize(text)).items():
+            vector[self._bucket(token)] += (1 + math.log(count)) * self.idf.get(token, 1.0)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_embeddings(kind, texts, dims):
+    if kind == "lexical":
+        return LexicalEmbeddings(texts, dims)
+    from utils.embedding_engine import embedding_engine
+
+    return embedding_engine
+
+
+def query_filter(query, mode):
+    if mode == "none":
+        return {}
+    return clean_filter(query.get("species"), query.get("topic") if mode == "species+topic" else None)
+
+
+async def lookup(store, vector, k, flt):
+    return await store.asimilarity_search_with_score_by_vector(vector, k, flt)
+
+
+async def quality(store, queries, vectors):
+    print(f"{'filter':<14} {'answered':>8} {'coverage':>8} {'precision':>9}")
+    for mode in MODES:
+        answered = coverage = labels = 0
+        precision = []
+        for query, vector in zip(queries, vectors):
+            flt = query_filter(query, mode)
+            scored = await lookup(store, vector, TOP_K, flt)
+            if flt and not scored:
+                scored = await lookup(store, vector, TOP_K, {})
+            texts = [nfc(doc.page_content) for doc, _ in scored]
+            found = [label for label in query["relevant"] if any(nfc(label) in t for t in texts)]
+            answered += bool(found)
+            coverage += len(found)
+            labels += len(query["relevant"])
+            wanted = query_filter(query, "species+topic")
+            if wanted and scored:
+                precision.append(sum(matches(doc.metadata, wanted) for doc, _ in scored) / len(scored))
+        print(f"{mode:<14} {answered / len(queries):8.2f} {coverage / labels:8.2f} {sum(precision) / len(precision):9.2f}")
+
+
+async def latency(store, queries, vectors, repeats):
+    results = {}
+    for mode in MODES:
+        latencies = []
+        for _ in range(repeats):
+            for query, vector in zip(queries, vectors):
+                flt = query_filter(query, mode)
+                started = time.perf_counter()
+                await lookup(store, vector, TOP_K, flt)
+                latencies.append((time.perf_counter() - started) * 1000)
+        results[mode] = (percentile(latencies, 0.5), percentile(latencies, 0.95))
+    return results
+
+
+async def set_indexes(store, create):
+    async with store.async_engine.begin() as conn:
+        for key in FILTER_EXPRESSIONS:
+            await conn.execute(text(f"DROP INDEX IF EXISTS ix_cmetadata_{key}"))
+        if create:
+            for statement in METADATA_INDEXES:
+                await conn.execute(text(statement))
+        await conn.execute(text("ANALYZE langchain_pg_embedding"))
+
+
+async def table_rows(store):
+    async with store.async_engine.connect() as conn:
+        count = await conn.execute(
+            text("SELECT count(*) FROM langchain_pg_embedding WHERE collection_id = :collection_id"),
+            {"collection_id": await store.acollection_id()},
+        )
+        return count.scalar()
+
+
+async def explain(store, vector, flt):
+    query, params = store._query(
+        {"embedding": to_vector_literal(vector), "collection_id": await store.acollection_id(), "k": TOP_K}, flt
+    )
+    async with store.async_engine.connect() as conn:
+        plan = (await conn.execute(text("EXPLAIN (ANALYZE, COSTS OFF) " + query.text), params)).all()
+    literal = params["embedding"]
+    print("\n".join(row[0].replace(literal, "<query vector>") for row in plan))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--queries", default=QUERIES)
+    parser.add_argument("--collection", default="kb_filters_bench")
+    parser.add_argument("--embeddings", choices=["lexical", "gemini"], default="lexical")
+    parser.add_argument("--dims", type=int, default=768, help="lexical vector size")
+    parser.add_argument("--copies", type=int, default=20, help="jittered copies of every row for the larger collection")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    connection = os.getenv("DB_URI")
+    if not connection:
+        sys.exit("Set DB_URI to a PostgreSQL database with the vector extension")
+
+    queries = load_queries(args.queries)
+    chunks = load_chunks(args.source)
+    embeddings = make_embeddings(args.embeddings, [chunk["text"] for chunk in chunks], args.dims)
+    vectors = embeddings.embed_documents([chunk["text"] for chunk in chunks])
+    query_vectors = [embeddings.embed_query(query["query"]) for query in queries]
+
+    writer = PGVectorWriter(embeddings, connection, args.collection)
+    await writer.open()
+    store = writer.store
+    try:
+        await writer.delete(await writer.existing_ids())
+        ids = [chunk_id(args.collection, chunk) for chunk in chunks]
+        await writer.write([(id_, c["text"], c["metadata"], v) for id_, c, v in zip(ids, chunks, vectors)])
+        await writer.analyze()
+
+        tagged = sum(bool(c["metadata"]["species"]) for c in chunks)
+        print(f"{len(chunks)} chunks, {tagged} with a species tag, {args.embeddings} embeddings, top {TOP_K}")
+        await quality(store, queries, query_vectors)
+
+        rng = np.random.default_rng(0)
+        print(f"\n{'rows':>7} {'indexes':>7} " + " ".join(f"{mode + ' p50/p95':>24}" for mode in MODES))
+        for copies in sorted({0, args.copies}):
+            for copy in range(copies):
+                rows = []
+                for id_, chunk, vector in zip(ids, chunks, vectors):
+                    jittered = np.asarray(vector) + rng.normal(0, 0.05, len(vector))
+                    jittered /= np.linalg.norm(jittered)
+                    rows.append((f"{id_}-{copy}", chunk["text"], chunk["metadata"], jittered.tolist()))
+                await writer.write(rows)
+            count = await table_rows(store)
+            for create in (False, True):
+                await set_indexes(store, create)
+                results = await latency(store, queries, query_vectors, args.repeats)
+                print(
+                    f"{count:>7} {'GIN' if create else 'none':>7} "
+                    + " ".join(f"{f'{p50:.2f} / {p95:.2f}':>24}" for p50, p95 in results.values())
+                )
+
+        rare = next(q for q in queries if q.get("species") == "buffalo")
+        print(f"\nplan, species={rare['species']}:")
+        await explain(store, query_vectors[queries.index(rare)], query_filter(rare, "species"))
+    finally:
+        await writer.delete(await writer.existing_ids())
+        await store.aclose()
+        await writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Lookup latency and memory footprint of the local knowledgebase backend.
+
+Writes a synthetic index (random unit vectors, Bangla-ish chunk texts) with
+write_local_index, times similarity_search_with_score_by_vector (the query
+embedding is excluded; it is the same for every backend), then starts
+several processes that map the same files and reports their RSS and PSS:
+PSS splits shared pages between the processes mapping them.
+
+    python benchmarks/local_kb.py --rows 5000 --dims 3072 --processes 4
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import multiprocessing
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.local_vector_store import LocalVectorStore, write_local_index
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields
+
+
+def lookups(prefix, index_type, dims, count, seed):
+    store = LocalVectorStore(embeddings=None, path=prefix, index_type=index_type)
+    rng = np.random.default_rng(seed)
+    queries = rng.standard_normal((count, dims), dtype=np.float32)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        store.similarity_search_with_score_by_vector(query, k=5)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.percentile(latencies, [50, 99]), store
+
+
+def worker(prefix, index_type, dims, barrier, results):
+    _, store = lookups(prefix, index_type, dims, 50, os.getpid())
+    barrier.wait()  # every process has touched the whole matrix
+    results.put(memory_kb())
+    barrier.wait()
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dims", type=int, default=3072)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--index-type", default="exact", choices=["exact", "hnsw"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, "kb")
+        rows = (
+            (f"chunk-{i}", f"গবাদিপশুর খাদ্য ও রোগ বিষয়ক অনুচ্ছেদ {i} " * 20, {"row": i}, rng.standard_normal(args.dims))
+            for i in range(args.rows)
+        )
+        started = time.perf_counter()
+        stats = write_local_index(rows, prefix, hnsw=args.index_type == "hnsw")
+        print(f"index: {stats} written in {time.perf_counter() - started:.2f}s")
+
+        (p50, p99), store = lookups(prefix, args.index_type, args.dims, args.lookups, 1)
+        print(f"{args.index_type} lookup, k=5: p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+        store.close()
+
+        barrier = multiprocessing.Barrier(args.processes)
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(prefix, args.index_type, args.dims, barrier, results))
+            for _ in range(args.processes)
+        ]
+        for proc in procs:
+            proc.start()
+        memory = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+        rss = np.mean([m["Rss"] for m in memory]) / 1024
+        pss = np.mean([m["Pss"] for m in memory]) / 1024
+        print(
+            f"{args.processes} processes mapping a {stats['bytes'] / 2**20:.1f} MiB matrix: "
+            f"RSS {rss:.1f} MiB, PSS {pss:.1f} MiB per process"
+        )
+
+
+if __name__ == "__main__":
+    main()
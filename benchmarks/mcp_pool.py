@@ -0,0 +1,114 @@
+"""
+Knowledgebase-style tool calls through the per-call MultiServerMCPClient
+tools (one subprocess per call) vs. a warm MCPSessionPool, plus a timed-out
+call that must leave the calls beside it running, and a crash to check
+that the pool restarts the server.
+
+    python benchmarks/mcp_pool.py --calls 50 --concurrency 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.environ.setdefault("MCP_CALL_TIMEOUT", "2")
+
+from utils.mcp_manager import MCPSessionPool, load_tools_for_server
+
+CONNECTION = {
+    "command": sys.executable,
+    "args": [os.path.join(ROOT, "benchmarks", "fake_mcp_server.py")],
+    "transport": "stdio",
+}
+
+
+async def run_calls(tool, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await tool.ainvoke({"messages": f"question {i}"})
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return timings, time.perf_counter() - started
+
+
+async def steady_calls(tool, seconds, concurrency):
+    """Keeps ``concurrency`` calls in flight for ``seconds``; returns how many failed."""
+    deadline = time.monotonic() + seconds
+    failed = 0
+
+    async def worker(w):
+        nonlocal failed
+        i = 0
+        while time.monotonic() < deadline:
+            try:
+                await tool.ainvoke({"messages": f"steady {w}.{i}"})
+            except Exception:
+                failed += 1
+            i += 1
+
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return failed
+
+
+def report(label, timings, elapsed):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"{label:<10} calls={len(timings):<4} "
+        f"p50={statistics.median(timings) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms "
+        f"throughput={len(timings) / elapsed:7.1f}/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    tools = await load_tools_for_server("fake", CONNECTION)
+    kb = next(t for t in tools if t.name == "knowledgebase")
+    report("per-call", *await run_calls(kb, args.calls, args.concurrency))
+
+    pool = MCPSessionPool("fake", CONNECTION, args.pool_size)
+    await pool.start()
+    try:
+        tools = {t.name: t for t in pool.get_tools()}
+        report("pooled", *await run_calls(tools["knowledgebase"], args.calls, args.concurrency))
+
+        slow = asyncio.create_task(tools["slow"].ainvoke({}))
+        failed = await steady_calls(tools["knowledgebase"], float(os.environ["MCP_CALL_TIMEOUT"]) + 1, args.concurrency)
+        try:
+            await slow
+        except Exception as e:
+            print(f"slow call failed as expected: {type(e).__name__}")
+        print(f"after timeout: {failed} calls beside it failed, {pool.stats()['restarts']} restarts")
+
+        try:
+            await tools["crash"].ainvoke({})
+        except Exception as e:
+            print(f"crash call failed as expected: {type(e).__name__}")
+        await run_calls(tools["knowledgebase"], args.pool_size * 2, 1)
+        for _ in range(100):
+            if pool.stats()["alive"] == args.pool_size:
+                break
+            await asyncio.sleep(0.1)
+        print(f"after crash: {pool.stats()}")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Accuracy vs. memory of the quantised local index formats.
+
+For every format this reports the bytes per matrix, the recall@5 of its
+top 5 against the full-precision top 5 (with and without the
+full-precision re-rank of the shortlist) and the lookup latency.
+
+On our corpus, export it first and pass the prefix; queries are the chunk
+embeddings themselves, perturbed with noise, so no embedding calls are made:
+
+    python Database/export_local_index.py --output /tmp/livestock --quantize float16,int8
+    python benchmarks/quantization_report.py --index /tmp/livestock
+
+Without --index a clustered synthetic matrix of the corpus' size is used.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.local_vector_store import LocalVectorStore, write_local_index
+
+K = 5
+
+
+def synthetic_rows(rows, dims, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, rows // 20), dims)).astype(np.float32)
+    for i in range(rows):
+        vector = centers[rng.integers(len(centers))] + 0.6 * rng.standard_normal(dims).astype(np.float32)
+        yield f"chunk-{i}", f"chunk {i}", {}, vector
+
+
+def make_queries(matrix, count, noise, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = matrix[rng.integers(len(matrix), size=count)]
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(matrix.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def evaluate(store, queries, truth):
+    recall = []
+    latencies = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        top, _ = store._top_k(query, K)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recall.append(len(set(top.tolist()) & expected) / K)
+    return float(np.mean(recall)), float(np.percentile(latencies, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", help="prefix of an exported index (with .f16/.i8 copies)")
+    parser.add_argument("--rows", type=int, default=900)
+    parser.add_argument("--dims", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--noise", type=float, default=0.5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        prefix = args.index
+        if prefix is None:
+            prefix = os.path.join(tmp, "kb")
+            write_local_index(synthetic_rows(args.rows, args.dims), prefix, quantize=["float16", "int8"])
+
+        exact = LocalVectorStore(embeddings=None, path=prefix)
+        matrix = np.asarray(exact.vectors)
+        queries = make_queries(matrix, args.queries, args.noise).astype(np.float32)
+        truth = [set(exact._top_k(query, K)[0].tolist()) for query in queries]
+        source = args.index or f"synthetic {args.rows} x {args.dims}"
+        print(f"{source}, {args.queries} queries, recall@{K} vs. float32 top {K}")
+
+        recall, p50 = evaluate(exact, queries, truth)
+        print(f"{'float32':<18} {matrix.nbytes / 2**20:8.2f} MiB  recall {recall:.3f}  p50 {p50:.3f} ms")
+        for quantization in ("float16", "int8"):
+            store = LocalVectorStore(embeddings=None, path=prefix, quantization=quantization)
+            size = store._codes.nbytes + (store._scales.nbytes if store._scales is not None else 0)
+            for rerank in (1, 4):
+                store.rerank = rerank
+                recall, p50 = evaluate(store, queries, truth)
+                label = f"{quantization}" + (f" rerank x{rerank}" if rerank > 1 else "")
+                print(f"{label:<18} {size / 2**20:8.2f} MiB  recall {recall:.3f}  p50 {p50:.3f} ms")
+            store.close()
+        exact.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Recall@k and latency of the knowledgebase retrievers over a fixed set of
+labelled queries (benchmarks/data/retrieval_queries.jsonl). A query's
+labels are phrases; every chunk containing one of them is relevant, and
+recall@k = relevant chunks in the top k / min(k, relevant chunks).
+
+BM25 runs offline on an index built from the source markdown:
+
+    python benchmarks/retrieval_eval.py
+
+Vector and hybrid search additionally need the collection ingested from the
+same source (Database/ingest.py) plus the embedding credentials:
+
+    DB_URI=... COLLECTION_NAME=... python benchmarks/retrieval_eval.py --vector --weights 1:1,1:2,2:1
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import unicodedata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Database"))
+
+from ingest import DEFAULT_SOURCE, chunk_id, split_markdown
+from utils.bm25 import BM25Index, build_bm25_index
+from utils.hybrid_search import HybridRetriever
+
+QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retrieval_queries.jsonl")
+KS = (1, 5, 10)
+
+
+def nfc(text):
+    return unicodedata.normalize("NFC", text)
+
+
+def load_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(text, labels):
+    text = nfc(text)
+    return any(nfc(label) in text for label in labels)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def evaluate(label, search, queries, texts):
+    recalls = {k: [] for k in KS}
+    latencies = []
+    for query in queries:
+        total = sum(is_relevant(text, query["relevant"]) for text in texts)
+        started = time.perf_counter()
+        docs = await search(query["query"], max(KS))
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits = [is_relevant(doc.page_content, query["relevant"]) for doc in docs]
+        for k in KS:
+            recalls[k].append(sum(hits[:k]) / min(k, total) if total else 0.0)
+
+    row = "  ".join(f"R@{k} {sum(r) / len(r):.3f}" for k, r in recalls.items())
+    print(f"{label:<22} {row}  p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--queries", default=QUERIES)
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME", "livestock"))
+    parser.add_argument("--vector", action="store_true", help="also evaluate PGVector and hybrid search")
+    parser.add_argument("--weights", default="1:1", help="comma separated vector:bm25 RRF weights")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    chunks = split_markdown(args.source)
+    texts = [chunk["text"] for chunk in chunks]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb.bm25")
+        started = time.perf_counter()
+        stats = build_bm25_index(
+            ((chunk_id(args.collection, chunk), chunk["text"], chunk["metadata"]) for chunk in chunks), path
+        )
+        print(f"index: {stats} built in {time.perf_counter() - started:.2f}s")
+        index = BM25Index(path)
+
+        async def bm25(query, k):
+            return index.search(query, k)
+
+        await evaluate("bm25", bm25, queries, texts)
+
+        if args.vector:
+            from utils.embedding_cache import CachedEmbeddings
+            from utils.embedding_engine import embedding_engine
+            from utils.vector_store import KnowledgebaseStore
+
+            store = KnowledgebaseStore(CachedEmbeddings(embedding_engine), os.environ["DB_URI"], args.collection)
+            await evaluate("vector", store.asimilarity_search, queries, texts)
+            for weights in args.weights.split(","):
+                vector_weight, bm25_weight = map(float, weights.split(":"))
+                retriever = HybridRetriever(store, index, vector_weight=vector_weight, bm25_weight=bm25_weight)
+                await evaluate(f"hybrid {weights}", retriever.asearch, queries, texts)
+            await store.aclose()
+
+        index.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Cold start of the knowledgebase MCP server (langchain_chatbot/server.py),
+the delay every agent (re)build waits on per pooled session.
+
+Spawns the server the way utils/mcp_manager does (stdio), and reports:
+
+    handshake   spawn to the ``initialize`` reply, then ``tools/list``
+    imports     ``python -X importtime`` of the modules loaded before the
+                handshake (run with KB_PREWARM=false, so the background
+                build does not mix in), largest top-level packages first
+    ready       with KB_PREWARM=true, spawn until the background build has
+                imported the store and created the embedding client
+
+and fails when the handshake imports exceed ``--budget-ms``, so a new
+eager import shows up in review.
+
+    python benchmarks/server_startup.py --runs 5 --budget-ms 1500
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+SERVER = os.path.join(ROOT, "langchain_chatbot", "server.py")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+READY_LINE = "Knowledgebase ready in"
+
+
+async def start(env, errlog):
+    """Seconds to the initialize reply and to the tools/list reply."""
+    params = StdioServerParameters(command=sys.executable, args=["-X", "importtime", SERVER], env=env, cwd=ROOT)
+    started = time.perf_counter()
+    async with stdio_client(params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            handshake = time.perf_counter() - started
+            await session.list_tools()
+            listed = time.perf_counter() - started
+            if env["KB_PREWARM"] == "true":
+                ready = await wait_ready(errlog.name, started)
+            else:
+                ready = None
+    return handshake, listed, ready
+
+
+async def wait_ready(path, started, timeout=60):
+    while time.perf_counter() - started < timeout:
+        with open(path) as f:
+            if READY_LINE in f.read():
+                return time.perf_counter() - started
+        await asyncio.sleep(0.01)
+    return None
+
+
+def top_level_imports(path):
+    """Cumulative microseconds per top-level module imported, in import order."""
+    imports = {}
+    with open(path) as f:
+        for line in f:
+            match = IMPORT_LINE.match(line)
+            # nested imports are indented below the module that pulled them in
+            if match and len(match.group(3)) == 1:
+                imports[match.group(4)] = int(match.group(2))
+    return imports
+
+
+async def main(args):
+    env = {
+        **os.environ,
+        "KB_BACKEND": args.backend,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark"),
+        "PYTHONPATH": ROOT,
+    }
+    tmp = tempfile.mkdtemp()
+    results = {}
+    imports = None
+    for prewarm in ("false", "true"):
+        runs = []
+        for i in range(args.runs):
+            log = os.path.join(tmp, f"stderr-{prewarm}-{i}.log")
+            with open(log, "w") as errlog:
+                runs.append(await start({**env, "KB_PREWARM": prewarm}, errlog))
+            if prewarm == "false":
+                imports = top_level_imports(log)
+        results[prewarm] = runs
+
+    print(f"{args.runs} runs each, medians")
+    for prewarm, runs in results.items():
+        handshake = statistics.median(r[0] for r in runs) * 1000
+        listed = statistics.median(r[1] for r in runs) * 1000
+        line = f"KB_PREWARM={prewarm:<5} handshake {handshake:6.0f} ms  tools/list {listed:6.0f} ms"
+        if prewarm == "true":
+            ready = [r[2] for r in runs if r[2] is not None]
+            line += f"  knowledgebase ready {statistics.median(ready) * 1000:6.0f} ms" if ready else "  never ready"
+        print(line)
+
+    total = sum(imports.values()) / 1000
+    print(f"\nimports before the handshake (last run): {total:.0f} ms, budget {args.budget_ms:.0f} ms")
+    for name, us in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:7.1f} ms  {name}")
+    return total <= args.budget_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="pgvector", choices=["pgvector", "local"])
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,192 @@
+"""
+Frames, bytes and CPU per answer of the SSE stream: the previous
+event_generator (json.dumps, one frame per chunk, prints) vs. the
+coalescing StreamEncoder with orjson and the sampled logger.
+
+A fake agent replays a knowledgebase answer: a tool call returning five
+Bangla chunks, then ``--tokens`` model chunks ``--gap`` ms apart. Each
+variant is served by its own uvicorn process; ``--streams`` clients read
+it concurrently and the server's CPU (user + system from /proc) over the
+run is reported. The old generator's prints and the new one's log lines
+both go to /dev/null, so their I/O cost is a lower bound.
+
+    python benchmarks/sse_stream.py --streams 100 --tokens 300 --gap 10
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+
+from sse import StreamEncoder
+from stream_generator import event_generator
+
+CHUNK = "গবাদিপশুর খাদ্য ও রোগ বিষয়ক তথ্য। গামবোরো রোগের টিকা ১০-১৪ দিন বয়সে চোখে দিতে হয়। " * 10
+WORDS = "গাভীর দুধ জ্বর হলে ক্যালসিয়াম বোরোগ্লুকোনেট শিরায় ধীরে ধীরে দিতে হবে এবং".split()
+
+
+class FakeAgent:
+    def __init__(self, tokens, gap):
+        self.tokens = tokens
+        self.gap = gap
+
+    async def astream_events(self, inputs, config=None, version=None):
+        yield {"event": "on_prompt_end", "name": "prompt", "data": {}}
+        yield {"event": "on_tool_start", "name": "knowledgebase", "data": {"input": {"messages": "দুধ জ্বর"}}}
+        await asyncio.sleep(0.05)
+        output = ToolMessage(content=json.dumps([CHUNK] * 5, ensure_ascii=False), tool_call_id="1")
+        yield {"event": "on_tool_end", "name": "knowledgebase", "data": {"output": output}}
+        yield {"event": "on_prompt_end", "name": "prompt", "data": {}}
+        for i in range(self.tokens):
+            await asyncio.sleep(self.gap)
+            chunk = AIMessageChunk(content=WORDS[i % len(WORDS)] + " ")
+            yield {"event": "on_chat_model_stream", "name": "model", "data": {"chunk": chunk}}
+
+
+async def legacy_event_generator(agent, messages, thread_id):
+    # the event_generator this repo shipped before the StreamEncoder
+    async for event in agent.astream_events(
+        {"messages": [HumanMessage(content=messages)]},
+        config={"configurable": {"thread_id": thread_id}},
+        version="v2",
+    ):
+        kind = event["event"]
+        if kind == "on_prompt_end":
+            print("[INFO] ⚡ Agent is thinking...")
+            print("================================================ \n")
+            yield f"data: {json.dumps({'type': 'thinking', 'content': 'Agent is thinking...'})}\n\n"
+        if kind == "on_tool_start":
+            print("[INFO] Agent is calling a tool...")
+            print("================================================ \n")
+            yield f"data: {json.dumps({'type': 'tool_start', 'content': 'Agent is calling a tool...'})}\n\n"
+            print(f"[DEBUG]:ON_TOOL_START -----{event['data']['input']}\n")
+        if kind == "on_tool_end":
+            tool_name = event["name"]
+            tool_output = event["data"]["output"]
+            tool_output = tool_output.content if isinstance(tool_output, ToolMessage) else str(tool_output)
+            print(f"[INFO] Agent is done calling {tool_name}...")
+            print("================================================ \n")
+            yield f"data: {json.dumps({'type': 'tool_end', 'content': 'Agent has finished calling the tool.'})}\n\n"
+            print(f"[DEBUG]:ON_TOOL_END -----{tool_output}\n\n")
+            yield f"data: {json.dumps({'type': 'tool_end', 'content': tool_output})}\n\n"
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            print(content, flush=True, end="")
+            yield f"data: {json.dumps({'type': 'stream', 'content': content})}\n\n"
+
+
+def create_app(variant):
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream(tokens: int, gap: float):
+        agent = FakeAgent(tokens, gap / 1000)
+        if variant == "legacy":
+            generator = legacy_event_generator(agent, "q", "t")
+        else:
+            flush_ms, flush_bytes, payload = VARIANTS[variant]
+            generator = event_generator(agent, "q", "t", encoder=StreamEncoder(flush_ms, flush_bytes, payload, 2000))
+        return StreamingResponse(generator, media_type="text/event-stream")
+
+    return app
+
+
+# name: (flush ms, flush bytes, tool payload)
+VARIANTS = {
+    "legacy": None,
+    "encoder-0ms": (0, 0, "full"),
+    "encoder-20ms": (20, 256, "full"),
+    "encoder-20ms-truncate": (20, 256, "truncate"),
+    "encoder-20ms-omit": (20, 256, "omit"),
+}
+
+
+def serve(variant, port):
+    import uvicorn
+
+    # the old generator prints every chunk, the new one logs tool calls; both to /dev/null
+    devnull = open(os.devnull, "w")
+    sys.stdout = devnull
+    logging.getLogger("stream").handlers[0].setStream(devnull)
+    uvicorn.run(create_app(variant), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def consume(client, url):
+    frames = 0
+    size = 0
+    async with client.stream("GET", url) as response:
+        async for data in response.aiter_bytes():
+            frames += data.count(b"\n\n")
+            size += len(data)
+    return frames, size
+
+
+async def measure(variant, args, port):
+    import httpx
+
+    server = subprocess.Popen([sys.executable, __file__, "--serve", variant, "--port", str(port)])
+    url = f"http://127.0.0.1:{port}/stream?tokens={args.tokens}&gap={args.gap}"
+    limits = httpx.Limits(max_connections=args.streams, max_keepalive_connections=args.streams)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get(f"http://127.0.0.1:{port}/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            await consume(client, url)  # warm-up
+
+            cpu = cpu_seconds(server.pid)
+            wall = time.perf_counter()
+            results = await asyncio.gather(*(consume(client, url) for _ in range(args.streams)))
+            wall = time.perf_counter() - wall
+            cpu = cpu_seconds(server.pid) - cpu
+    finally:
+        server.terminate()
+        server.wait()
+
+    frames = sum(r[0] for r in results) / args.streams
+    size = sum(r[1] for r in results) / args.streams
+    print(
+        f"{variant:<24} {frames:7.1f} frames/answer {size / 1024:8.1f} KiB/answer  "
+        f"server CPU {cpu * 1000:6.0f} ms per {args.streams} streams (wall {wall:.2f}s)"
+    )
+
+
+async def main(args):
+    print(f"{args.streams} concurrent streams, {args.tokens} chunks {args.gap:g} ms apart")
+    for i, variant in enumerate(VARIANTS):
+        await measure(variant, args, args.port + i)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--gap", type=float, default=10, help="ms between model chunks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,214 @@
+"""
+Checks that /stream stops working for clients that are gone.
+
+The real api.py app is served by uvicorn in this process, with a react
+agent built from benchmarks/fake_chat_model.py (it calls the knowledgebase
+once, then streams words) and MCP tools pooled from benchmarks/fake_mcp_server.py.
+An httpx client then:
+
+    completed    reads a whole answer
+    disconnect   closes the response after the first answer frame;
+                 the model must stop generating
+    tool         closes the response while a slow tool call is running;
+                 the fake MCP server must see the call cancelled
+    deadline     waits on a tool call longer than STREAM_DEADLINE;
+                 an ``error`` frame must end the stream
+
+A last case drives event_generator directly with an ``is_disconnected``
+that turns true mid-tool-call, the path taken when the server does not
+cancel the response itself. /stream/stats must count every outcome.
+
+    python benchmarks/stream_disconnect.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+# short budgets so the slow paths finish quickly; api.py needs these set to import
+os.environ.setdefault("STREAM_DEADLINE", "3")
+os.environ.setdefault("STREAM_DISCONNECT_POLL", "0.2")
+for name in ("APP_VERSION", "LANGSMITH_API_KEY", "LANGSMITH_PROJECT", "GOOGLE_API_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+import httpx
+import uvicorn
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+import api
+from fake_chat_model import FakeChatModel
+from main import State, build_prompt
+from stream_generator import DEADLINE_MESSAGE, event_generator, metrics
+from utils.mcp_manager import MCPSessionPool
+
+# main.py turns tracing on for the real agent; the fake one has nothing to trace
+os.environ["LANGSMITH_TRACING"] = "false"
+
+SLOW_TOOL = 30
+
+
+def build_fake_agent(pool, tokens=50, gap=0.01):
+    model = FakeChatModel(tokens=tokens, gap=gap)
+    agent = create_react_agent(
+        model=model,
+        tools=pool.get_tools(),
+        prompt=build_prompt(),
+        state_schema=State,
+        checkpointer=InMemorySaver(),
+    )
+    return agent, model
+
+
+def connection(delay, cancel_log):
+    env = {**os.environ, "FAKE_MCP_DELAY": str(delay), "FAKE_MCP_CANCEL_LOG": cancel_log}
+    return {
+        "command": sys.executable,
+        "args": [os.path.join(ROOT, "benchmarks", "fake_mcp_server.py")],
+        "transport": "stdio",
+        "env": env,
+    }
+
+
+def cancelled_calls(cancel_log):
+    if not os.path.exists(cancel_log):
+        return 0
+    with open(cancel_log) as f:
+        return len(f.readlines())
+
+
+async def read_stream(client, url, question, stop_at=None):
+    """The frame types received; the response is closed at the first ``stop_at`` frame."""
+    kinds = []
+    contents = []
+    async with client.stream("POST", url, json={"messages": question, "thread_id": question}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[len("data: "):])
+            kinds.append(data["type"])
+            contents.append(data["content"])
+            if data["type"] == stop_at:
+                break
+    return kinds, contents
+
+
+async def wait_for(predicate, timeout):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if predicate():
+            return time.monotonic() - started
+        await asyncio.sleep(0.02)
+    return None
+
+
+def check(label, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:<44} {detail}")
+    return ok
+
+
+async def main(args):
+    cancel_log = os.path.join(tempfile.mkdtemp(), "cancelled.log")
+    fast = MCPSessionPool("fast", connection(0.01, cancel_log), size=1)
+    slow = MCPSessionPool("slow", connection(SLOW_TOOL, cancel_log), size=1)
+    await asyncio.gather(fast.start(), slow.start())
+
+    # an agent in place before startup keeps the lifespan from building the real one
+    api.registry.agent, model = build_fake_agent(fast)
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    url = f"http://127.0.0.1:{args.port}/stream"
+    results = []
+
+    try:
+        async with httpx.AsyncClient(timeout=60) as client:
+            # completed
+            kinds, _ = await read_stream(client, url, "completed")
+            results.append(check("completed: whole answer streamed", model.produced == 50, f"{model.produced} words"))
+
+            # disconnect while tokens are streaming
+            api.registry.agent, model = build_fake_agent(fast, tokens=2000, gap=0.01)
+            await read_stream(client, url, "disconnect", stop_at="stream")
+            produced = model.produced
+            await asyncio.sleep(1)
+            results.append(check(
+                "disconnect: model stopped generating",
+                model.produced < 2000 and model.produced - produced < 10,
+                f"{produced} words at close, {model.produced} one second later",
+            ))
+
+            # disconnect while the MCP tool call is in flight
+            api.registry.agent, model = build_fake_agent(slow)
+            await read_stream(client, url, "tool", stop_at="tool_start")
+            await asyncio.sleep(0.2)  # let the tool call reach the server
+            seen = await wait_for(lambda: cancelled_calls(cancel_log) == 1, timeout=5)
+            results.append(check(
+                "tool: MCP call cancelled on the server",
+                seen is not None and slow.stats()["cancelled"] == 1,
+                f"after {seen:.2f}s" if seen is not None else "not cancelled",
+            ))
+
+            # deadline
+            api.registry.agent, model = build_fake_agent(slow)
+            started = time.monotonic()
+            kinds, contents = await read_stream(client, url, "deadline")
+            elapsed = time.monotonic() - started
+            results.append(check(
+                "deadline: error frame ends the stream",
+                kinds[-1] == "error" and contents[-1] == DEADLINE_MESSAGE,
+                f"{kinds} after {elapsed:.2f}s",
+            ))
+            seen = await wait_for(lambda: cancelled_calls(cancel_log) == 2, timeout=5)
+            results.append(check("deadline: MCP call cancelled on the server", seen is not None))
+
+            served = (await client.get(f"http://127.0.0.1:{args.port}/stream/stats")).json()
+            print(f"/stream/stats: {served}")
+    finally:
+        server.should_exit = True
+        await serving
+
+    # disconnect noticed by polling is_disconnected, with nobody closing the generator
+    agent, model = build_fake_agent(slow)
+    gone = False
+
+    async def is_disconnected():
+        return gone
+
+    kinds = []
+    started = time.monotonic()
+    async for data in event_generator(agent, "polled", "polled", is_disconnected=is_disconnected):
+        kinds.append(json.loads(data[len(b"data: "):])["type"])
+        if kinds[-1] == "tool_start":
+            gone = True
+    elapsed = time.monotonic() - started
+    seen = await wait_for(lambda: cancelled_calls(cancel_log) == 3, timeout=5)
+    results.append(check(
+        "polled: run cancelled without a closed response",
+        seen is not None and elapsed < SLOW_TOOL,
+        f"generator ended after {elapsed:.2f}s",
+    ))
+
+    await asyncio.gather(fast.close(), slow.close())
+
+    stats = metrics.stats()
+    results.append(check(
+        "metrics: outcomes counted",
+        stats["completed"] == 1 and stats["cancelled"] == 3 and stats["deadline"] == 1 and stats["active"] == 0,
+    ))
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
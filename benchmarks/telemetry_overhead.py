@@ -0,0 +1,163 @@
+"""
+Cost of the per-stage instrumentation (utils/telemetry.py).
+
+Each mode runs in its own process, since the metrics mode and the tracer
+provider are fixed once per process, and the modes take turns
+``--repeats`` times; the best figures of each are reported:
+
+    off           TELEMETRY_ENABLED=false
+    histograms    Prometheus histograms only (the default)
+    multiprocess  histograms written to PROMETHEUS_MULTIPROC_DIR (gunicorn)
+    spans 10%     histograms and OpenTelemetry spans, 10% of traces sampled
+    spans 100%    every trace sampled
+
+Spans go to an exporter that drops them, so the export itself (a batch
+thread and an HTTP request per batch in production) is not counted.
+Reported per mode:
+
+    stage us    one ``with stage(...)`` around an empty block
+    stream ms   CPU time of one event_generator run over a fake agent: two
+                model calls, a timed tool call and ``--tokens`` tokens with
+                no gaps between them, so the instrumentation's share is at
+                its largest
+    overhead    stream ms over the "off" mode
+    scrape ms   one /metrics body
+
+    python benchmarks/telemetry_overhead.py --tokens 300 --streams 200
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+MODES = {
+    "off": {"TELEMETRY_ENABLED": "false"},
+    "histograms": {},
+    "multiprocess": {"PROMETHEUS_MULTIPROC_DIR": None},
+    "spans 10%": {"OTEL_SAMPLE_RATE": "0.1"},
+    "spans 100%": {"OTEL_SAMPLE_RATE": "1.0"},
+}
+WORDS = "গাভীর দুধ জ্বর হলে ক্যালসিয়াম বোরোগ্লুকোনেট শিরায় ধীরে ধীরে দিতে হবে এবং".split()
+
+
+class FakeAgent:
+    """astream_events of a knowledgebase answer, with the run ids and node metadata LangGraph sends."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def astream_events(self, inputs, config=None, version=None):
+        from langchain_core.messages import AIMessageChunk, ToolMessage
+        from utils.telemetry import stage
+
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        metadata = {"langgraph_node": "agent"}
+        yield {"event": "on_chat_model_start", "run_id": first, "name": "model", "metadata": metadata, "data": {}}
+        call = AIMessageChunk(content="", tool_call_chunks=[{"name": "knowledgebase", "args": "{}", "id": "1", "index": 0}])
+        yield {"event": "on_chat_model_stream", "run_id": first, "name": "model", "metadata": metadata, "data": {"chunk": call}}
+        yield {"event": "on_tool_start", "run_id": "t", "name": "knowledgebase", "data": {"input": {"messages": "দুধ জ্বর"}}}
+        # what MCPSessionPool.call_tool wraps around the call
+        with stage("tool_call", "knowledgebase"):
+            output = ToolMessage(content="গাভীর দুধ জ্বর", tool_call_id="1")
+        yield {"event": "on_tool_end", "run_id": "t", "name": "knowledgebase", "data": {"output": output}}
+        yield {"event": "on_chat_model_start", "run_id": second, "name": "model", "metadata": metadata, "data": {}}
+        for i in range(self.tokens):
+            chunk = AIMessageChunk(content=WORDS[i % len(WORDS)] + " ")
+            yield {"event": "on_chat_model_stream", "run_id": second, "name": "model", "metadata": metadata, "data": {"chunk": chunk}}
+
+
+def run_mode(args):
+    """Measure in this process, configured by the environment the parent set; prints one JSON line."""
+    import utils.telemetry as telemetry
+    from stream_generator import event_generator
+
+    if "OTEL_SAMPLE_RATE" in os.environ:
+        from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+        class Discard(SpanExporter):
+            def export(self, spans):
+                return SpanExportResult.SUCCESS
+
+        telemetry.setup_tracing(Discard(), float(os.environ["OTEL_SAMPLE_RATE"]))
+
+    started = time.perf_counter()
+    for _ in range(args.stages):
+        with telemetry.stage("embedding"):
+            pass
+    stage_us = (time.perf_counter() - started) * 1e6 / args.stages
+
+    async def streams(count):
+        agent = FakeAgent(args.tokens)
+        for _ in range(count):
+            async for _ in event_generator(agent, "q", str(uuid.uuid4())):
+                pass
+
+    async def rounds():
+        await streams(10)
+        times = []
+        for _ in range(args.rounds):
+            started = time.process_time()
+            await streams(args.streams)
+            times.append((time.process_time() - started) * 1000 / args.streams)
+        return min(times)
+
+    stream_ms = asyncio.run(rounds())
+
+    started = time.perf_counter()
+    for _ in range(20):
+        telemetry.render()
+    scrape_ms = (time.perf_counter() - started) * 1000 / 20
+
+    print(json.dumps({"stage_us": stage_us, "stream_ms": stream_ms, "scrape_ms": scrape_ms}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="stream rounds per process, the fastest is kept")
+    parser.add_argument("--repeats", type=int, default=3, help="processes per mode")
+    parser.add_argument("--stages", type=int, default=100000)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args)
+
+    best = {}
+    for _ in range(args.repeats):
+        for mode, settings in MODES.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {**os.environ, "LOG_LEVEL": "WARNING", "OTEL_ENABLED": "false"}
+                for key in ("TELEMETRY_ENABLED", "PROMETHEUS_MULTIPROC_DIR", "OTEL_SAMPLE_RATE"):
+                    env.pop(key, None)
+                env.update({key: value if value is not None else tmp for key, value in settings.items()})
+                command = [
+                    sys.executable, __file__, "--mode", mode, "--tokens", str(args.tokens), "--streams",
+                    str(args.streams), "--rounds", str(args.rounds), "--stages", str(args.stages),
+                ]
+                result = json.loads(subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout)
+            previous = best.get(mode, result)
+            best[mode] = {key: min(value, previous[key]) for key, value in result.items()}
+
+    print(f"{args.repeats} x {args.rounds} x {args.streams} streams of {args.tokens} tokens per mode")
+    print(f"{'mode':<14} {'stage us':>9} {'stream ms':>10} {'overhead':>9} {'scrape ms':>10}")
+    baseline = best["off"]["stream_ms"]
+    for mode, result in best.items():
+        overhead = result["stream_ms"] / baseline - 1
+        print(
+            f"{mode:<14} {result['stage_us']:9.2f} {result['stream_ms']:10.2f} {overhead:9.1%} {result['scrape_ms']:10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
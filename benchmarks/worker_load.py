@@ -0,0 +1,209 @@
+"""
+Requests/sec and p95 time to first token of /stream against the number of
+gunicorn workers.
+
+For each ``--workers`` count the API is started with
+langchain_chatbot/gunicorn.conf.py, serving ``fake_app()`` below: the real
+app with the fake chat model of benchmarks/stream_disconnect.py, and an
+in-process knowledgebase tool returning five chunks, so each answer costs
+what the real one costs the API process (the tool result and ``--tokens``
+words encoded as SSE) but no Gemini or MCP time. ``--concurrency`` clients
+then post questions back to back for ``--duration`` seconds.
+
+A last check sends SIGHUP to gunicorn (a rolling restart of the workers)
+while a long answer is streaming: the answer must arrive complete, and new
+requests must keep being served meanwhile.
+
+    python benchmarks/worker_load.py --workers 1 2 4 --concurrency 32
+
+The client runs on the same machine; give it cores of its own when
+measuring (e.g. ``taskset``), and expect no gain from more workers than
+the server has cores.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "langchain_chatbot"))
+
+import httpx
+
+CONFIG = os.path.join(ROOT, "langchain_chatbot", "gunicorn.conf.py")
+CHUNK = "গাভীর দুধ জ্বর হলে ক্যালসিয়াম বোরোগ্লুকোনেট শিরায় ধীরে ধীরে দিতে হবে। " * 20
+FIRST_TOKEN = b'"type":"stream"'
+SERVER_ENV = {
+    "RATE_LIMIT_PER_MINUTE": "0",
+    "STREAM_MAX_ACTIVE": "1000",
+    "STREAM_MAX_QUEUED": "1000",
+    "STREAM_DEADLINE": "60",
+    "ANSWER_CACHE_ENABLED": "false",
+    "CHECKPOINT_COMPACT_INTERVAL": "0",
+    "DB_URI": "",
+    "APP_VERSION": "benchmark",
+    "LANGSMITH_API_KEY": "benchmark",
+    "LANGSMITH_PROJECT": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+}
+
+
+def fake_app():
+    """The API with a fake agent, built in each worker after the fork."""
+    from langchain_core.tools import StructuredTool
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    from fake_chat_model import FakeChatModel
+    import api
+    from main import build_agent
+
+    async def knowledgebase(messages: str):
+        """Look up the livestock knowledgebase."""
+        return [CHUNK] * 5
+
+    tool = StructuredTool.from_function(coroutine=knowledgebase, name="knowledgebase")
+    model = FakeChatModel(tokens=int(os.getenv("LOAD_TOKENS", "200")), gap=float(os.getenv("LOAD_GAP", "0.002")))
+    # an agent in place before startup keeps the lifespan from building the real one
+    api.registry.agent = build_agent([tool], InMemorySaver(), model=model)
+    os.environ["LANGSMITH_TRACING"] = "false"
+    return api.app
+
+
+def start_server(workers, port, tokens, gap):
+    env = {**os.environ, **SERVER_ENV, "LOAD_TOKENS": str(tokens), "LOAD_GAP": str(gap)}
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "-c", CONFIG,
+            "--workers", str(workers),
+            "--bind", f"127.0.0.1:{port}",
+            "--pythonpath", os.path.join(ROOT, "benchmarks"),
+            "--graceful-timeout", "30",
+            "--log-level", "warning",
+            "worker_load:fake_app()",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, base, timeout=60):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        try:
+            if (await client.get(f"{base}/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def ask(client, url, thread_id):
+    """Seconds to the first answer token and to the end; None when the request failed."""
+    started = time.perf_counter()
+    first = None
+    tail = b""
+    async with client.stream("POST", url, json={"messages": "q", "thread_id": thread_id}) as response:
+        if response.status_code != 200:
+            return None
+        async for data in response.aiter_bytes():
+            if first is None and FIRST_TOKEN in tail + data:
+                first = time.perf_counter() - started
+            tail = data[-len(FIRST_TOKEN):]
+    return first, time.perf_counter() - started
+
+
+async def load(client, url, concurrency, duration, label):
+    ttfts = []
+    failed = 0
+    stop = time.perf_counter() + duration
+
+    async def worker(c):
+        nonlocal failed
+        n = 0
+        while time.perf_counter() < stop:
+            n += 1
+            try:
+                result = await ask(client, url, f"{label}-{c}-{n}")
+            except httpx.HTTPError:
+                result = None
+            if result is None or result[0] is None:
+                failed += 1
+            else:
+                ttfts.append(result[0])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(c) for c in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ttfts.sort()
+    p = lambda q: ttfts[min(len(ttfts) - 1, int(len(ttfts) * q))] * 1000 if ttfts else float("nan")
+    return len(ttfts) / elapsed, p(0.5), p(0.95), failed
+
+
+async def drain_check(client, base, server):
+    """A long answer streaming through SIGHUP must finish; new requests must still be served."""
+    url = f"{base}/stream"
+    long_answer = asyncio.create_task(ask(client, url, "drain-long"))
+    await asyncio.sleep(0.3)
+    server.send_signal(signal.SIGHUP)
+    during = []
+    while not long_answer.done():
+        try:
+            during.append(await ask(client, url, f"drain-{len(during)}"))
+        except httpx.HTTPError:
+            during.append(None)
+    result = long_answer.result()
+    served = sum(1 for r in during if r is not None)
+    ok = result is not None and result[0] is not None and served == len(during)
+    print(
+        f"{'ok  ' if ok else 'FAIL'} reload while streaming: long answer "
+        f"{'complete' if result else 'broken'} after {result[1] if result else 0:.1f}s, "
+        f"{served}/{len(during)} requests served during the restart"
+    )
+    return ok
+
+
+async def main(args):
+    rows = []
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        base = f"http://127.0.0.1:{args.port}"
+        for workers in args.workers:
+            server = start_server(workers, args.port, args.tokens, args.gap)
+            try:
+                await wait_ready(client, base)
+                await load(client, f"{base}/stream", args.concurrency, 2, f"warm-{workers}")
+                rows.append((workers, *await load(client, f"{base}/stream", args.concurrency, args.duration, f"w{workers}")))
+            finally:
+                server.terminate()
+                server.wait()
+
+        # answers of about 3s, long enough to restart the workers under one
+        server = start_server(2, args.port, 300, 0.01)
+        try:
+            await wait_ready(client, base)
+            ok = await drain_check(client, base, server)
+        finally:
+            server.terminate()
+            server.wait()
+    print(f"{args.concurrency} clients, {args.tokens} words per answer, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'req/s':>8} {'TTFT p50':>9} {'TTFT p95':>9} {'failed':>7}")
+    for workers, rps, p50, p95, failed in rows:
+        print(f"{workers:>8} {rps:8.1f} {p50:7.0f}ms {p95:7.0f}ms {failed:>7}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--gap", type=float, default=0.002)
+    parser.add_argument("--port", type=int, default=8792)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
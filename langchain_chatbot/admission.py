@@ -0,0 +1,243 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.rate_limit import TokenBucket
+
+# /stream runs allowed at once; each holds MCP sessions, a checkpointer connection and a model stream
+STREAM_MAX_ACTIVE = int(os.getenv("STREAM_MAX_ACTIVE", "16"))
+# requests waiting for a slot before new ones are turned away with 503
+STREAM_MAX_QUEUED = int(os.getenv("STREAM_MAX_QUEUED", "32"))
+STREAM_QUEUE_TIMEOUT = float(os.getenv("STREAM_QUEUE_TIMEOUT", "10"))
+# how long a message waits for the previous one of its conversation, which may run for the whole
+# STREAM_DEADLINE; the default adds the same closing margin as gunicorn.conf.py's graceful_timeout
+STREAM_THREAD_TIMEOUT = float(os.getenv("STREAM_THREAD_TIMEOUT", str(float(os.getenv("STREAM_DEADLINE", "180")) + 15)))
+# per client: sustained requests per minute (0 turns rate limiting off) and burst.
+# Off by default: the frontend reaches the API through Vercel's /api rewrite (vercel.json), so
+# every user arrives from Vercel's addresses and a per-address limit would be one global limit
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_CLIENTS = int(os.getenv("RATE_LIMIT_CLIENTS", "10000"))
+# key clients by the first X-Forwarded-For address; turn on together with the rate limit only when
+# every request comes through a proxy that sets the header itself (Vercel does), since a direct
+# caller can put anything there
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+
+def client_key(request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(status_code, reason, retry_after):
+    return HTTPException(
+        status_code=status_code,
+        detail=reason,
+        headers={"Retry-After": str(max(1, round(retry_after)))},
+    )
+
+
+class Lease:
+    """A granted /stream slot plus the lock of its thread; release it once the response is done."""
+
+    def __init__(self, controller, thread_lock):
+        self.controller = controller
+        self.thread_lock = thread_lock
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.controller._release(self.thread_lock)
+
+
+class AdmissionController:
+    """
+    In-process scheduling for /stream: a token bucket per client, one run
+    at a time per ``thread_id`` (so a conversation's checkpoints never
+    race) with one message waiting behind it, and at most ``max_active``
+    runs with a bounded FIFO of waiters.
+    Anything that cannot be served soon is rejected at once with 429/503
+    and a Retry-After header rather than piling up.
+    """
+
+    def __init__(
+        self,
+        max_active=STREAM_MAX_ACTIVE,
+        max_queued=STREAM_MAX_QUEUED,
+        queue_timeout=STREAM_QUEUE_TIMEOUT,
+        thread_timeout=STREAM_THREAD_TIMEOUT,
+        rate_per_minute=RATE_LIMIT_PER_MINUTE,
+        burst=RATE_LIMIT_BURST,
+        max_clients=RATE_LIMIT_CLIENTS,
+    ):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.thread_timeout = thread_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.active = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected = {
+            "rate_limited": 0,
+            "queue_full": 0,
+            "queue_timeout": 0,
+            "thread_busy": 0,
+            "thread_timeout": 0,
+        }
+        self.waits = deque(maxlen=1000)
+        self._waiters = deque()
+        self._buckets = OrderedDict()
+        self._threads = {}
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _bucket(self, client):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    async def admit(self, client, thread_id):
+        """
+        Wait for a slot for ``client``'s run on ``thread_id`` and return its
+        Lease. Raises HTTPException 429 when the client is over its rate or
+        a message of the conversation is already waiting, and 503 when the
+        server is saturated.
+        """
+        if self.rate > 0:
+            bucket = self._bucket(client)
+            if not bucket.try_acquire():
+                self.rejected["rate_limited"] += 1
+                raise _reject(429, "Too many requests", bucket.retry_after())
+
+        started = time.monotonic()
+        # [lock, messages holding or waiting for it]
+        entry = self._threads.setdefault(thread_id, [asyncio.Lock(), 0])
+        if entry[1] >= 2:
+            # one waiter per conversation: each holds a connection for up to thread_timeout
+            self.rejected["thread_busy"] += 1
+            raise _reject(429, "A message of this conversation is already waiting", self.queue_timeout)
+        entry[1] += 1
+        try:
+            # a second message of a conversation waits for the first to finish, however long it runs
+            await asyncio.wait_for(entry[0].acquire(), timeout=self.thread_timeout)
+        except asyncio.TimeoutError:
+            self._drop_thread(thread_id, entry)
+            self.rejected["thread_timeout"] += 1
+            raise _reject(503, "Previous message of this conversation is still running", self.queue_timeout)
+        except BaseException:
+            self._drop_thread(thread_id, entry)
+            raise
+
+        try:
+            # the slot wait is bounded on its own, from the moment the conversation is free
+            await self._take_slot(time.monotonic() + self.queue_timeout)
+        except BaseException:
+            entry[0].release()
+            self._drop_thread(thread_id, entry)
+            raise
+
+        self.admitted += 1
+        self.waits.append(time.monotonic() - started)
+        return Lease(self, (thread_id, entry))
+
+    async def _take_slot(self, deadline):
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queued:
+            self.rejected["queue_full"] += 1
+            raise _reject(503, "Server is busy", self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, time.monotonic()))
+        self.peak_queued = max(self.peak_queued, len(self._waiters))
+        try:
+            # _release hands the slot over by resolving the future, so active is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(0.0, deadline - time.monotonic()))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # granted while timing out: give the slot to the next waiter
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters = deque(w for w in self._waiters if w[0] is not waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected["queue_timeout"] += 1
+                raise _reject(503, "Server is busy", self.queue_timeout)
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter, _ = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _drop_thread(self, thread_id, entry):
+        entry[1] -= 1
+        if entry[1] == 0 and self._threads.get(thread_id) is entry:
+            del self._threads[thread_id]
+
+    def _release(self, thread_lock):
+        thread_id, entry = thread_lock
+        self._release_slot()
+        entry[0].release()
+        self._drop_thread(thread_id, entry)
+
+    def stats(self):
+        waits = sorted(self.waits)
+
+        def percentile(q):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(len(waits) * q))] * 1000, 1)
+
+        oldest = time.monotonic() - self._waiters[0][1] if self._waiters else 0.0
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "max_queued": self.max_queued,
+            "oldest_wait_ms": round(oldest * 1000, 1),
+            "threads": len(self._threads),
+            "clients": len(self._buckets),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_p50_ms": percentile(0.5),
+            "wait_p95_ms": percentile(0.95),
+            "wait_p99_ms": percentile(0.99),
+        }
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """A StreamingResponse that gives its Lease back once it has been sent or abandoned."""
+
+    def __init__(self, content, lease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lease.release()
@@ -0,0 +1,104 @@
+import os
+import asyncio
+import time
+
+from main import build_agent, close_checkpointer, create_checkpointer
+from checkpoints import CheckpointCompactor
+from utils.mcp_manager import MCPSessionManager
+from utils.telemetry import stage
+
+MCP_RELOAD_GRACE = float(os.getenv("MCP_RELOAD_GRACE", "60"))
+
+
+class AgentRegistry:
+    """
+    Holds the compiled agent, its MCP tools and the checkpointer for the
+    lifetime of the API process, so /stream requests don't rebuild them.
+
+    ``model`` and ``checkpointer`` replace Gemini and the Postgres
+    checkpointer (benchmarks/e2e_replay.py runs the API on stand-ins).
+    """
+
+    def __init__(self, model=None, checkpointer=None):
+        self.model = model
+        self.agent = None
+        self.tools = []
+        self.mcp = None
+        self.checkpointer = checkpointer
+        self.compactor = None
+        self.loaded_at = None
+        self._lock = asyncio.Lock()
+        # closes of replaced MCP managers, held until done (the loop keeps tasks weakly)
+        self._closing = set()
+
+    async def start(self):
+        async with self._lock:
+            if self.agent is not None:
+                return
+            started = time.perf_counter()
+            with stage("agent_init", "start"):
+                if self.checkpointer is None:
+                    self.checkpointer = await create_checkpointer()
+                    if self.checkpointer is not None:
+                        self.compactor = CheckpointCompactor(self.checkpointer.conn).start()
+                await self._build()
+            print(f"[INFO] Agent ready in {time.perf_counter() - started:.2f}s")
+
+    async def _build(self):
+        mcp = await MCPSessionManager().start()
+        tools = mcp.get_tools()
+        print(f"[INFO] Loaded {len(tools)} tools from MCP config")
+        previous = self.mcp
+        self.agent = build_agent(tools, self.checkpointer, model=self.model)
+        self.tools = tools
+        self.mcp = mcp
+        self.loaded_at = time.time()
+        if previous is not None:
+            task = asyncio.create_task(self._close_later(previous))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _close_later(self, mcp):
+        # give streams still running on the previous agent time to finish their tool calls;
+        # cancelled by close(), which closes it right away
+        try:
+            await asyncio.sleep(MCP_RELOAD_GRACE)
+        finally:
+            await mcp.close()
+
+    async def get_agent(self):
+        if self.agent is None:
+            await self.start()
+        return self.agent
+
+    async def reload(self):
+        """
+        Re-read the MCP config and rebuild the tools and graph.
+        Streams that already hold the previous agent finish on it.
+        """
+        async with self._lock:
+            with stage("agent_init", "reload"):
+                await self._build()
+        return self.tools
+
+    def stats(self):
+        return self.mcp.stats() if self.mcp is not None else {}
+
+    def checkpoint_stats(self):
+        return self.compactor.stats() if self.compactor is not None else {}
+
+    async def close(self):
+        for task in self._closing:
+            task.cancel()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        if self.mcp is not None:
+            await self.mcp.close()
+            self.mcp = None
+        if self.compactor is not None:
+            await self.compactor.close()
+            self.compactor = None
+        if self.checkpointer is not None:
+            await close_checkpointer()
+            self.checkpointer = None
+        self.agent = None
+        self.tools = []
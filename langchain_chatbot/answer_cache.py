@@ -0,0 +1,140 @@
+import os
+import time
+import numpy as np
+
+from utils.embedding_cache import CachedEmbeddings
+from utils.embedding_engine import embedding_engine
+from utils.embedding_batcher import BatchingEmbeddings
+from utils.vector_store import KnowledgebaseStore
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_VERSION_INTERVAL = float(os.getenv("ANSWER_CACHE_VERSION_INTERVAL", "60"))
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding. A lookup returns the stored answer
+    of the most similar unexpired question when its cosine similarity is at
+    least ``threshold``.
+
+    ``version_fn`` is an optional coroutine returning a token for the state of
+    the knowledgebase collection; whenever it changes (re-ingestion) every
+    entry is dropped. It is polled at most every ``version_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        version_fn=None,
+        version_interval: float = ANSWER_CACHE_VERSION_INTERVAL,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.version_interval = version_interval
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._version_checked = 0.0
+        self.clear()
+
+    def clear(self):
+        self._vectors = None
+        self._expires = np.empty(0, dtype=np.float64)
+        self._answers = []
+
+    async def _embed(self, question: str):
+        vector = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def _check_version(self):
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked < self.version_interval:
+            return
+        self._version_checked = now
+        try:
+            version = await self.version_fn()
+        except Exception as e:
+            print(f"[WARNING] Answer cache could not read knowledgebase version: {e}")
+            return
+        if self.version is not None and version != self.version:
+            print("[INFO] Knowledgebase changed - clearing answer cache")
+            self.clear()
+        self.version = version
+
+    async def lookup(self, question: str):
+        await self._check_version()
+        vector = await self._embed(question) if self._answers else None
+
+        # the cache may have been cleared while the question was being embedded
+        if vector is None or not self._answers:
+            self.misses += 1
+            return None
+
+        scores = self._vectors @ vector
+        scores[self._expires <= time.time()] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._answers[best]
+
+    async def store(self, question: str, answer: str, ttl: float = None):
+        if not answer:
+            return
+        vector = await self._embed(question)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+
+        if self._vectors is None:
+            self._vectors = vector[None, :]
+            self._expires = np.array([expires_at])
+            self._answers = [answer]
+            return
+
+        # drop expired entries, then the oldest ones beyond max_entries
+        keep = np.flatnonzero(self._expires > time.time())
+        keep = keep[max(0, len(keep) - self.max_entries + 1):]
+        self._vectors = np.vstack([self._vectors[keep], vector])
+        self._expires = np.append(self._expires[keep], expires_at)
+        self._answers = [self._answers[i] for i in keep] + [answer]
+
+    def stats(self):
+        return {
+            "entries": len(self._answers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version,
+        }
+
+
+def build_answer_cache():
+    """The configured answer cache, or None when ANSWER_CACHE_ENABLED is off."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+
+    embeddings = CachedEmbeddings(BatchingEmbeddings(embedding_engine))
+    version_fn = None
+    if os.getenv("DB_URI"):
+        store = KnowledgebaseStore(
+            embeddings=embeddings,
+            connection=os.getenv("DB_URI"),
+            collection_name=os.getenv("COLLECTION_NAME"),
+            pool_size=1,
+            max_overflow=0,
+        )
+        version_fn = store.acollection_version
+
+    return SemanticAnswerCache(embeddings, version_fn=version_fn)
@@ -1,52 +1,168 @@
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 import uuid
 import os
+import sys
 
-from main import initialize_chat
-from stream_generator import event_generator
-from langchain_core.messages import HumanMessage
+# Add parent directory to path to import utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = FastAPI(
-    name=os.getenv("APP_NAME"),
-    description=os.getenv("APP_DESCRIPTION"),
-    version=os.getenv("APP_VERSION"),
-)
+from admission import AdmissionController, AdmittedStreamingResponse, client_key
+from agent_registry import AgentRegistry
+from answer_cache import build_answer_cache
+from stream_generator import cached_event_generator, event_generator, metrics as stream_metrics
+from utils.telemetry import render as render_metrics
+from langchain_core.messages import AIMessage, HumanMessage
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+registry = AgentRegistry()
+answer_cache = build_answer_cache()
+admission = AdmissionController()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await registry.start()
+    yield
+    await registry.close()
+
+
+router = APIRouter()
+
+
+def create_app() -> FastAPI:
+    """
+    The API application. Everything a worker needs is built in the
+    lifespan, after the fork under gunicorn, which serves the module's
+    ``app`` (see gunicorn.conf.py). The app shares the module's registry,
+    answer cache and admission controller, so build one per process.
+    """
+    app = FastAPI(
+        name=os.getenv("APP_NAME"),
+        description=os.getenv("APP_DESCRIPTION"),
+        version=os.getenv("APP_VERSION"),
+        lifespan=lifespan,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
 
 class ChatRequest(BaseModel):
     messages: str
-    thread_id: Optional[str] = str(uuid.uuid4())
+    thread_id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()))
 
-@app.post("/stream")
-async def stream_response(request: ChatRequest):
+@router.post("/stream")
+async def stream_response(request: ChatRequest, http_request: Request):
     messages = request.messages
     thread_id = request.thread_id
 
-    agent = await initialize_chat({
-        "messages": [HumanMessage(content=messages)],
-        "thread_id": thread_id,
-    })
+    # 429/503 here, before any agent work, when the client or the server is over its limit
+    lease = await admission.admit(client_key(http_request), thread_id)
+    try:
+        agent = await registry.get_agent()
+        return await respond(agent, messages, thread_id, http_request, lease)
+    except BaseException:
+        lease.release()
+        raise
+
+async def respond(agent, messages, thread_id, http_request, lease):
+    """The cached or streamed answer; the response holds ``lease`` until it is done."""
+    on_answer = None
+    if answer_cache is not None and await is_new_thread(agent, thread_id):
+        answer = await answer_cache.lookup(messages)
+        if answer is not None:
+            await record_exchange(agent, thread_id, messages, answer)
+            return AdmittedStreamingResponse(cached_event_generator(answer), lease, media_type="text/event-stream")
+
+        async def on_answer(answer):
+            await answer_cache.store(messages, answer)
+
+    return AdmittedStreamingResponse(
+        event_generator(
+            agent, messages, thread_id, on_answer=on_answer, is_disconnected=http_request.is_disconnected
+        ),
+        lease,
+        media_type="text/event-stream",
+    )
+
+async def is_new_thread(agent, thread_id):
+    """Cached answers only stand in for the first turn of a conversation."""
+    if agent.checkpointer is None:
+        return True
+    state = await agent.aget_state({"configurable": {"thread_id": thread_id}})
+    return not state.values.get("messages")
 
-    return StreamingResponse(event_generator(agent, messages, thread_id), media_type="text/event-stream")
+async def record_exchange(agent, thread_id, question, answer):
+    # keep the thread history consistent so follow-up questions have context
+    if agent.checkpointer is None:
+        return
+    await agent.aupdate_state(
+        {"configurable": {"thread_id": thread_id}},
+        {"messages": [HumanMessage(content=question), AIMessage(content=answer)]},
+        as_node="agent",
+    )
 
-@app.get("/health")
+@router.post("/cache/invalidate")
+async def invalidate_cache():
+    """Drop all cached answers, e.g. after re-ingesting the knowledgebase."""
+    if answer_cache is not None:
+        answer_cache.clear()
+    return {"status": "ok"}
+
+@router.post("/reload")
+async def reload():
+    """Rebuild the agent after the MCP config (config.json) changed."""
+    tools = await registry.reload()
+    return {
+        "status": "reloaded",
+        "tools": [tool.name for tool in tools],
+    }
+
+@router.get("/mcp/stats")
+async def mcp_stats():
+    """Per-server MCP session pool health and tool-call latency."""
+    return registry.stats()
+
+@router.get("/stream/stats")
+async def stream_stats():
+    """Active /stream runs and how finished ones ended (completed, cancelled, deadline, failed)."""
+    return stream_metrics.stats()
+
+@router.get("/checkpoints/stats")
+async def checkpoint_stats():
+    """Checkpointer connection pool usage and the last compaction run."""
+    return registry.checkpoint_stats()
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """Slots in use, queue depth and wait times, and rejections by reason."""
+    return admission.stats()
+
+@router.get("/metrics")
+def prometheus_metrics():
+    """Per-stage latency histograms (utils/telemetry.py) for Prometheus to scrape."""
+    # a plain def runs in the threadpool: in multi-process mode this reads every process's samples file
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@router.get("/health")
 async def health():
     return {
         "status": "ok",
         "environment": "docker" if os.path.exists("/.dockerenv") else "native",
     }
 
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=6500)
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Shared Postgres connection pool for the LangGraph checkpointer, and the
+compaction job that keeps its tables bounded.
+
+Every agent step writes a checkpoint, so a conversation of n turns leaves
+O(n) rows in ``checkpoints``/``checkpoint_writes`` and a new version of the
+message list in ``checkpoint_blobs``. Only the latest checkpoint of a
+thread is needed to continue it, so compaction keeps the newest
+``CHECKPOINT_KEEP`` per thread (for history and resuming a failed step),
+drops the writes and blobs no kept checkpoint refers to, and deletes
+threads idle for ``CHECKPOINT_THREAD_TTL_DAYS``.
+
+Run it once by hand or from cron:
+
+    python langchain_chatbot/checkpoints.py --keep 20 --ttl-days 30
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import get_logger
+
+CHECKPOINT_POOL_MIN = int(os.getenv("CHECKPOINT_POOL_MIN", "1"))
+CHECKPOINT_POOL_MAX = int(os.getenv("CHECKPOINT_POOL_MAX", "10"))
+CHECKPOINT_POOL_TIMEOUT = float(os.getenv("CHECKPOINT_POOL_TIMEOUT", "10"))
+# checkpoints kept per thread; the latest one's parent is read for pending sends, so at least 2
+CHECKPOINT_KEEP = max(2, int(os.getenv("CHECKPOINT_KEEP", "20")))
+# threads without a new checkpoint for this long are deleted; 0 keeps them forever
+CHECKPOINT_THREAD_TTL_DAYS = float(os.getenv("CHECKPOINT_THREAD_TTL_DAYS", "30"))
+# seconds between compaction runs inside the API process; 0 disables the background job
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL", "3600"))
+CHECKPOINT_COMPACT_BATCH = int(os.getenv("CHECKPOINT_COMPACT_BATCH", "200"))
+
+# any number unique to this job; only one worker compacts at a time. Taken per batch transaction:
+# behind a transaction-mode pooler a session-level lock and its unlock may reach different backends
+COMPACT_LOCK_ID = 7_316_001
+
+logger = get_logger("checkpoints")
+
+OVERGROWN_THREADS_SQL = """
+    SELECT thread_id
+    FROM checkpoints
+    GROUP BY thread_id
+    HAVING count(*) > %(keep)s
+"""
+
+TRIM_CHECKPOINTS_SQL = """
+    WITH ranked AS (
+        SELECT thread_id, checkpoint_ns, checkpoint_id,
+               row_number() OVER (
+                   PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+               ) AS position
+        FROM checkpoints
+        WHERE thread_id = ANY(%(threads)s)
+    )
+    DELETE FROM checkpoints c
+    USING ranked r
+    WHERE c.thread_id = r.thread_id
+      AND c.checkpoint_ns = r.checkpoint_ns
+      AND c.checkpoint_id = r.checkpoint_id
+      AND r.position > %(keep)s
+"""
+
+TRIM_WRITES_SQL = """
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = ANY(%(threads)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = w.thread_id
+            AND c.checkpoint_ns = w.checkpoint_ns
+            AND c.checkpoint_id = w.checkpoint_id
+      )
+"""
+
+# a blob row is one version of one channel; keep the versions a kept checkpoint points at.
+# aput writes a checkpoint's blobs before its row, so a version no row points at yet may be about
+# to be used: only versions older than the newest one a kept checkpoint points at are deleted.
+# Versions start with a zero-padded counter ("00000000000000000000000000000007.0.61…")
+TRIM_BLOBS_SQL = """
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(%(threads)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = b.thread_id
+            AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+      )
+      AND split_part(b.version, '.', 1) < (
+          SELECT max(split_part(c.checkpoint -> 'channel_versions' ->> b.channel, '.', 1))
+          FROM checkpoints c
+          WHERE c.thread_id = b.thread_id
+            AND c.checkpoint_ns = b.checkpoint_ns
+      )
+"""
+
+LOCK_SQL = "SELECT pg_try_advisory_xact_lock(%s) AS locked"
+
+# checkpoint_id is a uuid6, time-ordered, but the write time is only stored in the checkpoint's ts
+IDLE_THREADS_SQL = """
+    SELECT thread_id
+    FROM checkpoints
+    GROUP BY thread_id
+    HAVING max((checkpoint ->> 'ts')::timestamptz) < now() - make_interval(secs => %(ttl)s)
+"""
+
+DELETE_THREADS_SQL = [
+    "DELETE FROM checkpoint_writes WHERE thread_id = ANY(%(threads)s)",
+    "DELETE FROM checkpoint_blobs WHERE thread_id = ANY(%(threads)s)",
+    "DELETE FROM checkpoints WHERE thread_id = ANY(%(threads)s)",
+]
+
+
+async def open_checkpoint_pool(
+    db_uri: str,
+    min_size: int = CHECKPOINT_POOL_MIN,
+    max_size: int = CHECKPOINT_POOL_MAX,
+    timeout: float = CHECKPOINT_POOL_TIMEOUT,
+) -> AsyncConnectionPool:
+    """
+    An open pool configured the way AsyncPostgresSaver expects its
+    connections (autocommit, dict rows). psycopg never prepares statements
+    on them (``prepare_threshold=None``), since prepared statements break
+    behind a transaction-mode pooler such as Supabase's.
+    """
+    pool = AsyncConnectionPool(
+        db_uri,
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+        open=False,
+        kwargs={"autocommit": True, "prepare_threshold": None, "row_factory": dict_row},
+    )
+    await pool.open(wait=True, timeout=timeout)
+    return pool
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def compact_checkpoints(
+    pool: AsyncConnectionPool,
+    keep: int = CHECKPOINT_KEEP,
+    ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS,
+    batch: int = CHECKPOINT_COMPACT_BATCH,
+) -> dict:
+    """
+    Trim every thread to its newest ``keep`` checkpoints and delete threads
+    idle for more than ``ttl_days``. Works in transactions of ``batch``
+    threads so no lock is held on a whole table; each takes the compaction
+    lock. Returns the rows deleted per table, or None when another process
+    holds the lock.
+    """
+    keep = max(2, keep)
+    deleted = {"threads": 0, "checkpoints": 0, "checkpoint_writes": 0, "checkpoint_blobs": 0}
+    async with pool.connection() as conn:
+
+        async def locked():
+            # released when the transaction ends
+            row = await (await conn.execute(LOCK_SQL, (COMPACT_LOCK_ID,))).fetchone()
+            return row["locked"]
+
+        if ttl_days > 0:
+            rows = await (await conn.execute(IDLE_THREADS_SQL, {"ttl": ttl_days * 86400})).fetchall()
+            idle = [row["thread_id"] for row in rows]
+            for threads in _batches(idle, batch):
+                async with conn.transaction():
+                    if not await locked():
+                        return None
+                    for sql in DELETE_THREADS_SQL:
+                        await conn.execute(sql, {"threads": threads})
+                deleted["threads"] += len(threads)
+
+        rows = await (await conn.execute(OVERGROWN_THREADS_SQL, {"keep": keep})).fetchall()
+        overgrown = [row["thread_id"] for row in rows]
+        for threads in _batches(overgrown, batch):
+            async with conn.transaction():
+                if not await locked():
+                    return None
+                for table, sql in (
+                    ("checkpoints", TRIM_CHECKPOINTS_SQL),
+                    ("checkpoint_writes", TRIM_WRITES_SQL),
+                    ("checkpoint_blobs", TRIM_BLOBS_SQL),
+                ):
+                    cursor = await conn.execute(sql, {"threads": threads, "keep": keep})
+                    deleted[table] += cursor.rowcount
+    return deleted
+
+
+class CheckpointCompactor:
+    """Runs compact_checkpoints every ``interval`` seconds in the background."""
+
+    def __init__(self, pool, interval=CHECKPOINT_COMPACT_INTERVAL, keep=CHECKPOINT_KEEP, ttl_days=CHECKPOINT_THREAD_TTL_DAYS):
+        self.pool = pool
+        self.interval = interval
+        self.keep = keep
+        self.ttl_days = ttl_days
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_deleted = None
+        self._task = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+        return self
+
+    async def run_once(self):
+        started = time.perf_counter()
+        deleted = await compact_checkpoints(self.pool, self.keep, self.ttl_days)
+        if deleted is None:
+            logger.info("Checkpoint compaction skipped, another worker is running it")
+            return None
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_duration = time.perf_counter() - started
+        self.last_deleted = deleted
+        logger.info(f"Checkpoint compaction took {self.last_duration:.2f}s, deleted {deleted}")
+        return deleted
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Checkpoint compaction failed: {e}")
+
+    def stats(self):
+        pool = self.pool.get_stats()
+        return {
+            "pool_size": pool.get("pool_size"),
+            "pool_available": pool.get("pool_available"),
+            "requests_waiting": pool.get("requests_waiting"),
+            "requests_wait_ms": pool.get("requests_wait_ms"),
+            "connections_num": pool.get("connections_num"),
+            "compaction_runs": self.runs,
+            "last_compaction": self.last_run,
+            "last_compaction_s": self.last_duration,
+            "last_deleted": self.last_deleted,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compact the LangGraph checkpoint tables once.")
+    parser.add_argument("--keep", type=int, default=CHECKPOINT_KEEP)
+    parser.add_argument("--ttl-days", type=float, default=CHECKPOINT_THREAD_TTL_DAYS)
+    args = parser.parse_args()
+
+    pool = await open_checkpoint_pool(os.getenv("DB_URI"), min_size=1, max_size=2)
+    try:
+        deleted = await compact_checkpoints(pool, args.keep, args.ttl_days)
+        print(f"[INFO] Deleted {deleted}" if deleted is not None else "[INFO] Another compaction is running")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Production serving: the API in N uvicorn worker processes under gunicorn.
+
+    WEB_WORKERS=4 gunicorn -c langchain_chatbot/gunicorn.conf.py
+
+Workers share nothing. Each one builds its own agent, MCP sessions,
+checkpointer pool and answer cache in the app's lifespan before it takes
+requests, so per-process limits (STREAM_MAX_ACTIVE, CHECKPOINT_POOL_MAX, MCP
+pool sizes) multiply by WEB_WORKERS.
+
+The heavy libraries are imported here, in the master, so every fork starts
+with them loaded and shares their pages. Only modules are imported: anything
+that opens sockets, threads or subprocesses (the Gemini client, the DB pool,
+MCP servers) must be created after the fork, which is why the app itself is
+not preloaded.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: F401
+import orjson  # noqa: F401
+import fastapi  # noqa: F401
+import langchain.chat_models  # noqa: F401
+import langchain_core.messages  # noqa: F401
+import langchain_core.prompts  # noqa: F401
+import langchain_google_genai  # noqa: F401
+import langchain_mcp_adapters.client  # noqa: F401
+import langgraph.prebuilt  # noqa: F401
+import langgraph.checkpoint.postgres.aio  # noqa: F401
+import google.genai  # noqa: F401
+import psycopg_pool  # noqa: F401
+
+from utils.telemetry import PROMETHEUS_MULTIPROC_DIR
+
+# api.py builds its app, registry and limits at import, which gunicorn does in each worker after the fork
+wsgi_app = "api:app"
+worker_class = "workers.DrainingUvicornWorker"
+preload_app = False
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:6500")
+workers = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+# a worker that does not check in for this long is restarted; covers the lifespan warm-up too
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+# on restart, how long running streams get to finish; at least STREAM_DEADLINE plus the close margin
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", str(int(float(os.getenv("STREAM_DEADLINE", "180"))) + 15)))
+keepalive = 5
+# recycle workers after this many requests (0 never), jittered so they don't restart together
+max_requests = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "100"))
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    # samples files left by a previous run would be added to this one's /metrics
+    if PROMETHEUS_MULTIPROC_DIR:
+        for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+            if name.endswith(".db"):
+                os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
@@ -0,0 +1,244 @@
+"""
+What part of a conversation the model sees on each turn.
+
+The checkpointer keeps a thread's full message list, and create_react_agent
+would send all of it to Gemini every turn, knowledgebase chunks of every
+earlier answer included. HistoryPolicy is used as the agent's
+``pre_model_hook`` and builds the model input instead (the stored history
+is left untouched):
+
+* the current turn (the last question, its tool calls and results) is
+  always sent as is;
+* tool results of earlier turns are cut to a short stub, or dropped along
+  with the tool calls that asked for them;
+* earlier turns are added newest first while they fit HISTORY_MAX_TOKENS;
+* turns that fell out of the window are folded into a rolling summary by
+  a background task, so no turn waits on it. The summary is sent ahead of
+  the window and saved in the thread's state on the next model call.
+
+A finished summary waits in the process that wrote it (``_ready``) until
+that call. Under gunicorn the thread's next request may reach another
+worker, which does not see it: that turn goes without the newer summary
+and the worker writes one of its own. Once a summary is saved in the
+thread's state every worker uses it.
+"""
+import os
+import asyncio
+import contextvars
+from collections import OrderedDict
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableLambda
+
+from utils.logger import get_logger
+
+# approximate tokens of earlier turns (plus summary) sent with the current turn; 0 sends the full history
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))
+# keep: earlier tool results as they are; stub: first HISTORY_TOOL_STUB_CHARS characters; drop: remove them
+HISTORY_TOOL_OUTPUTS = os.getenv("HISTORY_TOOL_OUTPUTS", "stub")
+HISTORY_TOOL_STUB_CHARS = int(os.getenv("HISTORY_TOOL_STUB_CHARS", "200"))
+# Bangla script takes more tokens per character than English
+HISTORY_CHARS_PER_TOKEN = float(os.getenv("HISTORY_CHARS_PER_TOKEN", "3"))
+HISTORY_SUMMARY = os.getenv("HISTORY_SUMMARY", "true").lower() == "true"
+# summarise once at least this many messages have left the window
+HISTORY_SUMMARY_MIN_MESSAGES = int(os.getenv("HISTORY_SUMMARY_MIN_MESSAGES", "8"))
+HISTORY_SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "150"))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a Bangladeshi farmer and a livestock help agent.
+Update the summary with the new messages below. Keep the farmer's animals, their symptoms, the advice already given and anything the farmer said about their farm.
+Write in Bangla, at most {max_words} words, without greetings.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+logger = get_logger("history")
+
+
+def count_tokens(messages, chars_per_token=HISTORY_CHARS_PER_TOKEN):
+    return count_tokens_approximately(messages, chars_per_token=chars_per_token)
+
+
+def split_turns(messages):
+    """Split the history into turns, each starting at a HumanMessage."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact_turn(turn, tool_outputs=HISTORY_TOOL_OUTPUTS, stub_chars=HISTORY_TOOL_STUB_CHARS):
+    """An earlier turn with its tool results stubbed or dropped according to ``tool_outputs``."""
+    if tool_outputs == "keep":
+        return turn
+    compacted = []
+    for message in turn:
+        if isinstance(message, ToolMessage):
+            if tool_outputs == "drop":
+                continue
+            content = str(message.content)
+            if len(content) > stub_chars:
+                content = f"[{message.name or 'tool'} result from an earlier turn, shortened] {content[:stub_chars]}…"
+            compacted.append(
+                ToolMessage(content=content, tool_call_id=message.tool_call_id, name=message.name, id=message.id)
+            )
+        elif tool_outputs == "drop" and isinstance(message, AIMessage) and message.tool_calls:
+            # the call goes with its result; keep any text the model wrote alongside it
+            if message.content:
+                compacted.append(AIMessage(content=message.content, id=message.id, name=message.name))
+        else:
+            compacted.append(message)
+    return compacted
+
+
+def _transcript(messages):
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"Farmer: {message.content}")
+        elif isinstance(message, AIMessage) and message.content:
+            lines.append(f"Agent: {message.content}")
+    return "\n".join(lines)
+
+
+class HistoryPolicy:
+    """
+    The agent's ``pre_model_hook``: builds the model input from the
+    thread's messages, see the module docstring. ``summary_model`` writes
+    the rolling summary; without it turns outside the window are dropped.
+    """
+
+    def __init__(
+        self,
+        summary_model=None,
+        max_tokens=HISTORY_MAX_TOKENS,
+        tool_outputs=HISTORY_TOOL_OUTPUTS,
+        stub_chars=HISTORY_TOOL_STUB_CHARS,
+        chars_per_token=HISTORY_CHARS_PER_TOKEN,
+        summary_min_messages=HISTORY_SUMMARY_MIN_MESSAGES,
+        max_threads=10000,
+    ):
+        self.summary_model = summary_model if HISTORY_SUMMARY else None
+        self.max_tokens = max_tokens
+        self.tool_outputs = tool_outputs
+        self.stub_chars = stub_chars
+        self.chars_per_token = chars_per_token
+        self.summary_min_messages = summary_min_messages
+        self.max_threads = max_threads
+        self.summaries_written = 0
+        self.summary_errors = 0
+        # thread_id -> (summary, id of the last message it covers), until saved in the thread's state;
+        # per process, see the module docstring
+        self._ready = OrderedDict()
+        self._pending = {}
+
+    def as_hook(self):
+        return RunnableLambda(self.build, afunc=self.abuild, name="history_policy")
+
+    def build(self, state, config=None):
+        update, _ = self._build(state, config)
+        return update
+
+    async def abuild(self, state, config=None):
+        update, unsummarized = self._build(state, config)
+        if unsummarized is not None:
+            self._schedule_summary(*unsummarized)
+        return update
+
+    def _build(self, state, config):
+        messages = state["messages"]
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        update = {}
+
+        summary = state.get("summary")
+        covered = state.get("summarized_until")
+        ready = self._ready.pop(thread_id, None) if thread_id is not None else None
+        if ready is not None:
+            summary, covered = ready
+            update = {"summary": summary, "summarized_until": covered}
+
+        if self.max_tokens <= 0:
+            update["llm_input_messages"] = messages
+            return update, None
+
+        turns = split_turns(messages)
+        current, earlier = turns[-1], turns[:-1]
+
+        # messages a summary already covers are never sent again
+        first = 0
+        if covered is not None:
+            ids = [m.id for m in messages]
+            if covered in ids:
+                first = ids.index(covered) + 1
+
+        budget = self.max_tokens
+        summary_message = None
+        if summary:
+            summary_message = HumanMessage(content=SUMMARY_PREFIX + summary)
+            budget -= self._tokens([summary_message])
+
+        window = []
+        start = len(messages) - len(current)
+        for turn in reversed(earlier):
+            if start - len(turn) < first:
+                break
+            compacted = compact_turn(turn, self.tool_outputs, self.stub_chars)
+            tokens = self._tokens(compacted)
+            if tokens > budget:
+                break
+            budget -= tokens
+            window = compacted + window
+            start -= len(turn)
+
+        llm_input = ([summary_message] if summary_message else []) + window + current
+        update["llm_input_messages"] = llm_input
+
+        unsummarized = None
+        dropped = messages[first:start]
+        if self.summary_model is not None and thread_id is not None and len(dropped) >= self.summary_min_messages:
+            unsummarized = (thread_id, summary, dropped)
+        return update, unsummarized
+
+    def _tokens(self, messages):
+        return count_tokens(messages, self.chars_per_token)
+
+    def _schedule_summary(self, thread_id, summary, dropped):
+        if thread_id in self._pending:
+            return
+        # a fresh context keeps the summary call out of the running stream's callbacks and events
+        task = asyncio.create_task(self._summarize(thread_id, summary, dropped), context=contextvars.Context())
+        self._pending[thread_id] = task
+        task.add_done_callback(lambda _: self._pending.pop(thread_id, None))
+
+    async def _summarize(self, thread_id, summary, dropped):
+        prompt = SUMMARY_PROMPT.format(
+            max_words=HISTORY_SUMMARY_MAX_WORDS,
+            summary=summary or "(none)",
+            messages=_transcript(dropped),
+        )
+        try:
+            response = await self.summary_model.ainvoke(prompt)
+        except Exception as e:
+            self.summary_errors += 1
+            logger.warning(f"History summary for thread {thread_id} failed: {e}")
+            return
+        self.summaries_written += 1
+        self._ready[thread_id] = (str(response.content).strip(), dropped[-1].id)
+        self._ready.move_to_end(thread_id)
+        while len(self._ready) > self.max_threads:
+            self._ready.popitem(last=False)
+
+    def stats(self):
+        return {
+            "summaries_written": self.summaries_written,
+            "summary_errors": self.summary_errors,
+            "summaries_pending": len(self._pending),
+        }
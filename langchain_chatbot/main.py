@@ -1,7 +1,6 @@
 import os
 import sys
 from dotenv import load_dotenv
-from psycopg import AsyncConnection
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,14 +13,17 @@ from langgraph.prebuilt import create_react_agent
 
 from utils.mcp_manager import get_mcp_tools_from_config
 from system_prompt import sys_prompt
+from checkpoints import open_checkpoint_pool
+from history import HistoryPolicy
 
 
 load_dotenv()
 
-os.environ["LANGSMITH_TRACING"] = "true"
-os.environ["LANGSMITH_ENDPOINT"] = "https://api.smith.langchain.com"
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-os.environ["LANGSMITH_PROJECT"] = os.getenv("LANGSMITH_PROJECT")
+# LangSmith tracing is opt-in: LANGSMITH_TRACING=true with LANGSMITH_API_KEY and LANGSMITH_PROJECT,
+# which langsmith reads from the environment; per-stage latency is always at /metrics (utils/telemetry.py)
+if os.getenv("LANGSMITH_TRACING", "false").lower() == "true" and not os.getenv("LANGSMITH_API_KEY"):
+    print("[WARNING] LANGSMITH_TRACING is set without LANGSMITH_API_KEY - LangSmith tracing is off")
+    os.environ["LANGSMITH_TRACING"] = "false"
 DB_URI = os.getenv("DB_URI")
 
 google = init_chat_model("google_genai:gemini-2.5-flash", temperature=0.3)
@@ -29,52 +31,85 @@ google = init_chat_model("google_genai:gemini-2.5-flash", temperature=0.3)
 class State(MessagesState):
     thread_id: str
     remaining_steps: int
+    # rolling summary of the turns that no longer fit the model's history window
+    summary: str
+    summarized_until: str
+
+history = HistoryPolicy(summary_model=google)
+
+def build_prompt():
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", sys_prompt),
+            ("human", "{messages}"),
+            ("placeholder", "{agent_scratchpad}"),
+        ]
+    )
+
+
+_checkpointer = None
+
+
+async def create_checkpointer():
+    """
+    The Postgres checkpointer shared by every agent of this process, backed
+    by one connection pool, or None to run without persistence.
+    """
+    global _checkpointer
+    if _checkpointer is not None:
+        return _checkpointer
+    if not DB_URI:
+        print("[INFO] No DB_URI provided - running without persistence")
+        return None
+
+    try:
+        print("[INFO] Attempting to connect to database...")
+        pool = await open_checkpoint_pool(DB_URI)
+        checkpointer = AsyncPostgresSaver(pool)
+        await checkpointer.setup()
+        print(f"[INFO] Database connection successful - persistence enabled (pool of {pool.min_size}-{pool.max_size})")
+        _checkpointer = checkpointer
+        return checkpointer
+    except Exception as db_error:
+        print(f"[WARNING] Database connection failed: {db_error}")
+        print("[INFO] Continuing without database persistence...")
+        return None
+
+
+async def close_checkpointer():
+    global _checkpointer
+    if _checkpointer is not None:
+        await _checkpointer.conn.close()
+        _checkpointer = None
+
+
+def build_agent(tools, checkpointer, model=None, history_policy=None):
+    return create_react_agent(
+        model=model or google,
+        tools=tools,
+        prompt=build_prompt(),
+        name="main_agent",
+        state_schema=State,
+        checkpointer=checkpointer,
+        pre_model_hook=(history_policy or history).as_hook(),
+    )
+
 
 async def initialize_chat(state: State):
+    """Build a fresh agent from scratch (MCP tools, checkpointer and graph).
+
+    The API server shares one agent through ``agent_registry.AgentRegistry``;
+    this is kept for scripts and for benchmarking the per-request path.
+    """
     try:
         print("Initializing chat...")
         tools = await get_mcp_tools_from_config()
         print(f"Loaded {len(tools)} tools from MCP config")
 
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", sys_prompt),
-                ("human", "{messages}"),
-                ("placeholder", "{agent_scratchpad}"),
-            ]
-        )
-
-        llm = google
-
-        # Try to connect to database, fallback to memory if it fails
-        checkpointer = None
-        if DB_URI:
-            try:
-                print("[INFO] Attempting to connect to database...")
-                conn = await AsyncConnection.connect(DB_URI)
-                await conn.set_autocommit(True)
-                pg_checkpointer = AsyncPostgresSaver(conn)
-                await pg_checkpointer.setup()
-                checkpointer = pg_checkpointer
-                print("[INFO] Database connection successful - persistence enabled")
-            except Exception as db_error:
-                print(f"[WARNING] Database connection failed: {db_error}")
-                print("[INFO] Continuing without database persistence...")
-                checkpointer = None
-        else:
-            print("[INFO] No DB_URI provided - running without persistence")
-
-        agent = create_react_agent(
-            model=llm,
-            tools=tools,
-            prompt=prompt,
-            name="main_agent",
-            state_schema=State,
-            checkpointer=checkpointer,
-        )
-
-        return agent
+        checkpointer = await create_checkpointer()
+
+        return build_agent(tools, checkpointer)
 
     except Exception as e:
         print(f"[ERROR] Error in initialize_chat: {str(e)}")
-        raise
\ No newline at end of file
+        raise
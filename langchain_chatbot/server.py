@@ -2,42 +2,131 @@
 
 import os
 import sys
+import time
+import asyncio
+from typing import Literal, Optional
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
-from langchain_postgres import PGVector
 from dotenv import load_dotenv
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.embedding_engine import embedding_engine
+from utils.logger import get_logger
+from utils.metadata_tags import SPECIES, TOPICS, clean_filter
 
 load_dotenv(".env")
 
-mcp = FastMCP(name=os.getenv("APP_NAME"))
 SUPABASE_PG_CONN_URL = os.getenv("DB_URI")
 
+# "pgvector" queries Postgres; "local" serves a file exported by Database/export_local_index.py
+KB_BACKEND = os.getenv("KB_BACKEND", "pgvector")
+# the MCP handshake only needs fastmcp; the store, its imports (langchain_postgres, SQLAlchemy,
+# google-genai, numpy) and the embedding client are built in a background thread right after
+# startup, or with "false" on the first knowledgebase call
+KB_PREWARM = os.getenv("KB_PREWARM", "true").lower() == "true"
+# "false" returns the retriever's top 5 as they are, without utils/context_selection.py
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+
+logger = get_logger("kb_server")
+
+# one store (and connection pool) for the lifetime of the MCP server process
+_knowledgebase = None
+
+
+def build_knowledgebase():
+    """The vector store, and the hybrid retriever over it when a BM25 index exists."""
+    started = time.perf_counter()
+    from utils.embedding_engine import embedding_engine
+    from utils.embedding_batcher import BatchingEmbeddings
+    from utils.embedding_cache import CachedEmbeddings
+    from utils.hybrid_search import HybridRetriever, load_bm25_index
+
+    embeddings = CachedEmbeddings(BatchingEmbeddings(embedding_engine))
+    if KB_BACKEND == "local":
+        from utils.local_vector_store import LocalVectorStore
+
+        vector_store = LocalVectorStore(embeddings=embeddings)
+    else:
+        from utils.vector_store import KnowledgebaseStore
+
+        vector_store = KnowledgebaseStore(
+            embeddings=embeddings,
+            connection=SUPABASE_PG_CONN_URL,
+            collection_name=os.getenv("COLLECTION_NAME"),
+        )
+    # created here rather than on the first query, which would wait on the SDK import
+    embedding_engine.client
+    # keyword index written by Database/ingest.py; without it the tool stays pure vector search
+    bm25_index = load_bm25_index()
+    retriever = HybridRetriever(vector_store, bm25_index) if bm25_index is not None else None
+    logger.info(f"Knowledgebase ready in {time.perf_counter() - started:.2f}s")
+    return vector_store, retriever
+
+
+def get_knowledgebase():
+    """The task building the knowledgebase; started on first use, retried after a failure."""
+    global _knowledgebase
+    if _knowledgebase is None or (_knowledgebase.done() and _knowledgebase.exception() is not None):
+        _knowledgebase = asyncio.ensure_future(asyncio.to_thread(build_knowledgebase))
+    return _knowledgebase
+
+
+@asynccontextmanager
+async def lifespan(server):
+    if KB_PREWARM:
+        get_knowledgebase()
+    yield
+
+
+mcp = FastMCP(name=os.getenv("APP_NAME"), lifespan=lifespan)
+
+async def search(vector_store, retriever, query, flt):
+    if not RERANK_ENABLED:
+        if retriever is not None:
+            return await retriever.asearch(query, k=5, filter=flt)
+        return await vector_store.asimilarity_search(query, k=5, filter=flt)
+
+    from utils.context_selection import RERANK_CANDIDATES, select_context
+
+    # over-fetched, then cut to the relevant, distinct passages that fit the token budget
+    if retriever is not None:
+        scored = await retriever.asearch_with_score(query, k=RERANK_CANDIDATES, filter=flt)
+    else:
+        scored = await vector_store.asimilarity_search_with_relevance_scores(query, k=RERANK_CANDIDATES, filter=flt)
+    return select_context(scored)
+
+
 @mcp.tool
-def knowledgebase(messages: str):
+async def knowledgebase(
+    messages: str,
+    species: Optional[Literal[tuple(SPECIES)]] = None,
+    topic: Optional[Literal[tuple(TOPICS)]] = None,
+):
     """
     keyword: /kb
     Retrieve the query information from knowledgebase stored in postgres database.
     This tool will be used if user only asks to get information from the knowledgebase.
+    Set species and/or topic when the question is clearly about one of them; only passages
+    about it are searched then.
 
     Args:
         messages (str): The query message.
+        species (str, optional): The animal the question is about.
+        topic (str, optional): What the question is about.
     Returns:
         list: A list of documents' contents.
     """
+    # shielded: a cancelled call must not cancel the build the next call will need
+    vector_store, retriever = await asyncio.shield(get_knowledgebase())
+    # loaded by the build above, with the stores it times
+    from utils.telemetry import span
 
-    vector_store = PGVector(
-        embeddings=embedding_engine,
-        collection_name=os.getenv("COLLECTION_NAME"),
-        connection=SUPABASE_PG_CONN_URL,
-        use_jsonb=True,
-    )
-
-    retriever = vector_store.as_retriever(
-        search_type="similarity", search_kwargs={"k": 5}
-    )
-    docs = retriever.invoke(messages)
+    flt = clean_filter(species, topic)
+    with span("knowledgebase", **flt):
+        docs = await search(vector_store, retriever, messages, flt)
+        if not docs and flt:
+            # nothing is tagged that way; an untagged passage may still answer
+            logger.info(f"No passages for filter {flt}, searching unfiltered")
+            docs = await search(vector_store, retriever, messages, {})
 
     return [doc.page_content for doc in docs]
 
@@ -0,0 +1,88 @@
+import os
+import time
+import orjson
+
+# a token frame is sent once its oldest text is this old, or it is this large
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "20"))
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "256"))
+# full: send tool outputs as-is; truncate: cut at STREAM_TOOL_PAYLOAD_MAX characters; omit: status only
+STREAM_TOOL_PAYLOAD = os.getenv("STREAM_TOOL_PAYLOAD", "full")
+STREAM_TOOL_PAYLOAD_MAX = int(os.getenv("STREAM_TOOL_PAYLOAD_MAX", "2000"))
+
+TOOL_END_STATUS = "Agent has finished calling the tool."
+
+
+def frame(kind: str, content) -> bytes:
+    return b"data: " + orjson.dumps({"type": kind, "content": content}) + b"\n\n"
+
+
+class StreamEncoder:
+    """
+    Builds the SSE frames of one answer. Model tokens are buffered and
+    coalesced into a single ``stream`` frame per ``flush_ms`` / ``flush_bytes``
+    budget; every other frame flushes the buffer first so ordering holds.
+    """
+
+    def __init__(
+        self,
+        flush_ms: float = STREAM_FLUSH_MS,
+        flush_bytes: int = STREAM_FLUSH_BYTES,
+        tool_payload: str = STREAM_TOOL_PAYLOAD,
+        tool_payload_max: int = STREAM_TOOL_PAYLOAD_MAX,
+    ):
+        self.flush_delay = flush_ms / 1000.0
+        self.flush_bytes = flush_bytes
+        self.tool_payload = tool_payload
+        self.tool_payload_max = tool_payload_max
+        self.frames = 0
+        self.bytes = 0
+        self._buffer = []
+        self._buffered = 0
+        self._since = None
+
+    def _emit(self, data: bytes) -> bytes:
+        self.frames += 1
+        self.bytes += len(data)
+        return data
+
+    def time_to_flush(self):
+        """Seconds until the buffered text is due, or None when nothing is buffered."""
+        if self._since is None:
+            return None
+        return max(0.0, self._since + self.flush_delay - time.monotonic())
+
+    def token(self, content):
+        """Buffer ``content``; returns the frames that are due (possibly none)."""
+        if not isinstance(content, str):
+            # structured chunks are passed through as they are
+            return [data for data in (self.flush(), self._emit(frame("stream", content))) if data]
+        if not content:
+            return []
+        self._buffer.append(content)
+        self._buffered += len(content.encode("utf-8"))
+        if self._since is None:
+            self._since = time.monotonic()
+        if self._buffered >= self.flush_bytes or time.monotonic() - self._since >= self.flush_delay:
+            return [self.flush()]
+        return []
+
+    def flush(self):
+        if not self._buffer:
+            return None
+        content = "".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._since = None
+        return self._emit(frame("stream", content))
+
+    def event(self, kind: str, content):
+        """A non-token frame, preceded by any buffered text."""
+        return [data for data in (self.flush(), self._emit(frame(kind, content))) if data]
+
+    def tool_end(self, output: str):
+        """One ``tool_end`` frame carrying the (possibly truncated) output, or the status alone."""
+        if self.tool_payload == "omit" or not output:
+            return self.event("tool_end", TOOL_END_STATUS)
+        if self.tool_payload == "truncate" and len(output) > self.tool_payload_max:
+            output = output[: self.tool_payload_max] + "…"
+        return self.event("tool_end", output)
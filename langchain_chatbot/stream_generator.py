@@ -1,46 +1,255 @@
-import json
+import os
+import time
+import asyncio
+import logging
+from collections import deque
 from langchain_core.messages import HumanMessage, ToolMessage
 
-async def event_generator(agent, messages, thread_id):
-        
-    async for event in agent.astream_events(
-        {"messages": [HumanMessage(content=messages)]}, 
+from sse import StreamEncoder, frame
+from utils.logger import get_logger, sampled
+from utils.telemetry import observe, span
+
+# events buffered between the agent run and a slow client before the run is paused
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+# wall-clock budget of one /stream request, tool calls included
+STREAM_DEADLINE = float(os.getenv("STREAM_DEADLINE", "180"))
+STREAM_DISCONNECT_POLL = float(os.getenv("STREAM_DISCONNECT_POLL", "1"))
+
+DEADLINE_MESSAGE = "উত্তর তৈরি করতে অনেক বেশি সময় লাগছে, অনুগ্রহ করে আবার চেষ্টা করুন।"
+
+logger = get_logger("stream")
+
+_DONE = object()
+_FLUSH = object()
+
+
+class StreamMetrics:
+    """Outcome counters and durations of /stream runs in this process."""
+
+    def __init__(self):
+        self.active = 0
+        self.outcomes = {"completed": 0, "cancelled": 0, "deadline": 0, "failed": 0}
+        self.durations = deque(maxlen=1000)
+
+    def record(self, outcome, seconds):
+        self.outcomes[outcome] += 1
+        self.durations.append(seconds)
+
+    def stats(self):
+        durations = sorted(self.durations)
+
+        def percentile(q):
+            if not durations:
+                return None
+            return round(durations[min(len(durations) - 1, int(len(durations) * q))], 3)
+
+        return {"active": self.active, **self.outcomes, "p50_s": percentile(0.5), "p95_s": percentile(0.95)}
+
+
+metrics = StreamMetrics()
+
+
+def _signal(queue, marker):
+    # markers never wait for space: a full queue means the consumer has events to wake up for
+    try:
+        queue.put_nowait(marker)
+    except asyncio.QueueFull:
+        pass
+
+
+def _time_model(event, started):
+    """Record llm_ttft, a model call's start to its first chunk (text or tool call); ``started`` maps run ids."""
+    kind = event["event"]
+    if kind == "on_chat_model_start":
+        started[event["run_id"]] = time.monotonic()
+    elif kind == "on_chat_model_stream" and event.get("run_id") in started:
+        chunk = event["data"]["chunk"]
+        if chunk.content or getattr(chunk, "tool_call_chunks", None):
+            node = event.get("metadata", {}).get("langgraph_node", "")
+            observe("llm_ttft", time.monotonic() - started.pop(event["run_id"]), node)
+
+
+async def _pump(events, queue, deadline, thread_id):
+    """
+    Move agent events into the bounded ``queue``: when the client reads
+    slowly the put blocks and the run stops being drained. Raises
+    TimeoutError once ``deadline`` seconds have passed.
+
+    The run happens in this task, so its span is the root of the tool
+    call and model spans, and model timings are taken here, before the
+    queue can delay them.
+    """
+    model_started = {}
+    try:
+        with span("stream", thread_id=thread_id):
+            async with asyncio.timeout(deadline):
+                async for event in events:
+                    _time_model(event, model_started)
+                    await queue.put(event)
+    finally:
+        _signal(queue, _DONE)
+
+
+async def _watch_disconnect(is_disconnected, pump, interval):
+    """Cancel the run when the client is gone, even while no frame is being sent."""
+    while not pump.done():
+        await asyncio.sleep(interval)
+        if await is_disconnected():
+            pump.cancel()
+            return True
+    return False
+
+
+async def event_generator(
+    agent,
+    messages,
+    thread_id,
+    on_answer=None,
+    encoder=None,
+    is_disconnected=None,
+    deadline=STREAM_DEADLINE,
+    queue_size=STREAM_QUEUE_SIZE,
+):
+    """
+    Stream the agent run as SSE frames. When ``on_answer`` is given it is
+    awaited with the final answer text (the tokens after the last tool call)
+    once the run has finished.
+
+    The run is cancelled, in-flight MCP calls included, when the response
+    is closed early, when ``is_disconnected`` (e.g. ``Request.is_disconnected``)
+    reports the client gone, or after ``deadline`` seconds; in the last
+    case an ``error`` frame tells the client why.
+    """
+    encoder = encoder or StreamEncoder()
+    # per-token and tool-payload lines are only logged for a sample of streams
+    verbose = sampled(logger)
+    answer = []
+
+    events = agent.astream_events(
+        {"messages": [HumanMessage(content=messages)]},
         config={"configurable": {"thread_id": thread_id}},
         version="v2",
-    ):
-        kind = event["event"]
-
-        if kind == "on_prompt_end":
-            # console.print(f"[DEBUG]:ON_CHAT_MODEL_START -----{event['data']}\n\n")
-            print("[INFO] ⚡ Agent is thinking...")
-            print("================================================ \n")
-            yield f"data: {json.dumps({'type': 'thinking', 'content': 'Agent is thinking...'})}\n\n"
-
-        # tool call
-        if kind == "on_tool_start":
-            print("[INFO] Agent is calling a tool...")
-            print("================================================ \n")
-            yield f"data: {json.dumps({'type': 'tool_start', 'content': 'Agent is calling a tool...'})}\n\n"
-            print(f"[DEBUG]:ON_TOOL_START -----{event['data']['input']}\n")
-            # yield f"data: {json.dumps({'type': 'tool_start', 'content': event['data']['input']})}\n\n"
-        if kind == "on_tool_end":
-            tool_name = event["name"]
-            tool_output = event["data"]["output"]
-
-            if isinstance(tool_output, ToolMessage):
-                tool_output = tool_output.content
-            else:
-                tool_output = str(tool_output)
-
-            print(f"[INFO] Agent is done calling {tool_name}...")
-            print("================================================ \n")
-            yield f"data: {json.dumps({'type': 'tool_end', 'content': 'Agent has finished calling the tool.'})}\n\n"
-            print(f"[DEBUG]:ON_TOOL_END -----{tool_output}\n\n")
-            yield f"data: {json.dumps({'type': 'tool_end', 'content': tool_output})}\n\n"
-
-        # stream of the output
-        if kind == "on_chat_model_stream":
-            content = event["data"]["chunk"].content
-            print(content, flush=True, end="")
-
-            yield f"data: {json.dumps({'type': 'stream', 'content': content})}\n\n"
+    )
+    queue = asyncio.Queue(maxsize=queue_size)
+    pump = asyncio.create_task(_pump(events, queue, deadline, thread_id))
+    watcher = None
+    if is_disconnected is not None:
+        watcher = asyncio.create_task(_watch_disconnect(is_disconnected, pump, STREAM_DISCONNECT_POLL))
+    loop = asyncio.get_running_loop()
+    timer = None
+    started = time.monotonic()
+    outcome = "failed"
+    metrics.active += 1
+
+    try:
+        while True:
+            if pump.done() and queue.empty():
+                break
+            event = await queue.get()
+
+            if event is _FLUSH:
+                # the model paused; send what is buffered instead of waiting for the next token
+                timer = None
+                data = encoder.flush()
+                if data:
+                    yield data
+                continue
+            if event is _DONE:
+                break
+
+            kind = event["event"]
+
+            if kind == "on_prompt_end":
+                logger.debug("Agent is thinking...")
+                for data in encoder.event("thinking", "Agent is thinking..."):
+                    yield data
+
+            # tool call
+            elif kind == "on_tool_start":
+                answer = []
+                logger.info(f"Agent is calling {event['name']}")
+                if verbose:
+                    logger.debug(f"ON_TOOL_START ----- {event['data'].get('input')}")
+                for data in encoder.event("tool_start", "Agent is calling a tool..."):
+                    yield data
+
+            elif kind == "on_tool_end":
+                tool_output = event["data"]["output"]
+                if isinstance(tool_output, ToolMessage):
+                    tool_output = tool_output.content
+                else:
+                    tool_output = str(tool_output)
+
+                logger.info(f"Agent is done calling {event['name']}")
+                if verbose:
+                    logger.debug(f"ON_TOOL_END ----- {tool_output[:500]}")
+                for data in encoder.tool_end(tool_output):
+                    yield data
+
+            # stream of the output
+            elif kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if isinstance(content, str):
+                    answer.append(content)
+                for data in encoder.token(content):
+                    yield data
+
+            # at most one pending flush timer, for the text currently buffered
+            delay = encoder.time_to_flush()
+            if delay is None and timer is not None:
+                timer.cancel()
+                timer = None
+            elif delay is not None and timer is None:
+                timer = loop.call_later(delay, _signal, queue, _FLUSH)
+            elif delay == 0:
+                # the timer already fired (its signal may have been dropped on a full queue)
+                timer = None
+                yield encoder.flush()
+
+        await asyncio.wait([pump])
+        if watcher is not None and watcher.done() and watcher.result():
+            outcome = "cancelled"
+            logger.info(f"Client of thread {thread_id} disconnected, run cancelled")
+            return
+
+        error = pump.exception()
+        if isinstance(error, TimeoutError):
+            outcome = "deadline"
+            logger.warning(f"Thread {thread_id} hit the {deadline:.0f}s deadline, run cancelled")
+            for data in encoder.event("error", DEADLINE_MESSAGE):
+                yield data
+            return
+        if error is not None:
+            raise error
+
+        data = encoder.flush()
+        if data:
+            yield data
+        outcome = "completed"
+    except (asyncio.CancelledError, GeneratorExit):
+        # the response was closed early: Starlette saw the client disconnect
+        outcome = "cancelled"
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        for task in (pump, watcher):
+            if task is not None and not task.done():
+                task.cancel()
+        metrics.active -= 1
+        elapsed = time.monotonic() - started
+        metrics.record(outcome, elapsed)
+        observe("stream_total", elapsed, outcome)
+
+    if verbose:
+        logger.debug(f"Answer ----- {''.join(answer)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Stream {thread_id}: {encoder.frames} frames, {encoder.bytes} bytes")
+
+    if on_answer is not None:
+        await on_answer("".join(answer))
+
+
+async def cached_event_generator(answer):
+    """Replay a cached answer in the same SSE format as ``event_generator``."""
+    yield frame("stream", answer)
@@ -0,0 +1,28 @@
+"""
+Gunicorn worker class for the API, see gunicorn.conf.py.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+# seconds of gunicorn's graceful_timeout kept for the lifespan shutdown (MCP sessions, DB pool)
+WORKER_CLOSE_MARGIN = float(os.getenv("WORKER_CLOSE_MARGIN", "10"))
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """
+    A UvicornWorker that drains instead of being killed on restart.
+
+    On SIGTERM (deploy, HUP reload, max_requests recycling) uvicorn stops
+    accepting, lets running /stream responses finish, then runs the
+    lifespan shutdown. UvicornWorker does not give uvicorn a graceful
+    timeout, so uvicorn waits on streams forever and gunicorn kills the
+    worker after ``graceful_timeout`` with its MCP server processes still
+    running. Here uvicorn gives up ``WORKER_CLOSE_MARGIN`` seconds earlier,
+    cancels what is left (which cancels the MCP tool calls too) and closes
+    the registry in time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = max(1, int(self.cfg.graceful_timeout - WORKER_CLOSE_MARGIN))
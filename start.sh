@@ -59,5 +59,10 @@ if [ "$DOCKER_ENV" = true ] && [ -n "$DB_URI" ]; then
 fi
 
 # Start the langchain chatbot
-echo "Starting FastAPI server on port 6500..."
-python langchain_chatbot/api.py
\ No newline at end of file
+if [ "${WEB_WORKERS:-1}" -gt 1 ]; then
+    echo "Starting FastAPI server on port 6500 with $WEB_WORKERS workers..."
+    exec gunicorn -c langchain_chatbot/gunicorn.conf.py
+else
+    echo "Starting FastAPI server on port 6500..."
+    python langchain_chatbot/api.py
+fi
\ No newline at end of file
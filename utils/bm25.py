@@ -0,0 +1,235 @@
+"""
+BM25 keyword index over the knowledgebase chunks.
+
+The index is one file written at ingestion time and memory-mapped by the
+MCP server, so it costs no start-up parse and is shared through the page
+cache by every server process:
+
+    magic | header length | JSON header | sections...
+
+The header holds the BM25 parameters and (name, offset, dtype, count) for
+each section: the sorted vocabulary, CSR postings (term pointers, doc ids,
+term frequencies), document lengths, and the chunk ids, texts and metadata
+so keyword-only hits need no database round trip.
+"""
+import os
+import re
+import json
+import mmap
+import struct
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.metadata_tags import MetadataMasks, normalize
+
+MAGIC = b"BM25IDX1"
+
+# letters, signs and digits of the Bengali block plus ASCII alphanumerics
+_TOKEN = re.compile(r"[ঀ-ৣ০-৿a-z0-9]+")
+_BANGLA_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+
+# longest first; only stripped when at least two characters remain
+_SUFFIXES = sorted(
+    ["গুলোর", "গুলো", "গুলি", "সমূহের", "সমূহ", "দের", "ের", "এর", "কে", "তে", "টির", "টি", "টা", "র"],
+    key=len,
+    reverse=True,
+)
+_STOPWORDS = {
+    unicodedata.normalize("NFC", word)
+    for word in [
+        "ও", "এবং", "বা", "এ", "এই", "ঐ", "সে", "যে", "যা", "না", "হয়", "হবে", "করে", "করা",
+        "থেকে", "জন্য", "দিয়ে", "দিতে", "একটি", "কি", "কী", "কোন", "আর", "তবে", "যদি",
+    ]
+}
+
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    NFC (which also splits the composed ড়/ঢ়/য় consistently) without
+    the Bijoy leftovers, as metadata_tags.normalize does for tagging, map
+    Bangla digits to ASCII, then strip common inflectional suffixes so
+    e.g. টিকা, টিকার and টিকাগুলো share a term.
+    """
+    text = normalize(text).translate(_BANGLA_DIGITS).casefold()
+    tokens = []
+    for token in _TOKEN.findall(text):
+        token = token.strip("ঃ")
+        if token and token not in _STOPWORDS:
+            tokens.append(_stem(token))
+    return tokens
+
+
+def _blob(items: List[str]):
+    encoded = [item.encode("utf-8") for item in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def build_bm25_index(docs: Iterable[Tuple[str, str, dict]], path: str, k1: float = 1.5, b: float = 0.75):
+    """
+    Write the index for ``docs`` ((id, text, metadata) tuples) to ``path``.
+    The file is written next to ``path`` and renamed over it, so servers
+    that still map the previous index keep reading a consistent file.
+    """
+    ids, texts, metadatas, counts = [], [], [], []
+    for id_, text, metadata in docs:
+        ids.append(id_)
+        texts.append(text)
+        metadatas.append(json.dumps(metadata or {}, ensure_ascii=False))
+        counts.append(Counter(tokenize(text)))
+
+    vocabulary = sorted(set().union(*counts)) if counts else []
+    term_index = {term: i for i, term in enumerate(vocabulary)}
+    postings = [[] for _ in vocabulary]
+    for doc, counter in enumerate(counts):
+        for term, tf in counter.items():
+            postings[term_index[term]].append((doc, min(tf, 65535)))
+
+    term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.uint64)
+    np.cumsum([len(p) for p in postings], out=term_ptr[1:])
+    post_doc = np.fromiter((doc for p in postings for doc, _ in p), dtype=np.uint32, count=int(term_ptr[-1]))
+    post_tf = np.fromiter((tf for p in postings for _, tf in p), dtype=np.uint16, count=int(term_ptr[-1]))
+    doc_len = np.array([sum(c.values()) for c in counts], dtype=np.uint32)
+
+    terms, term_offsets = _blob(vocabulary)
+    id_blob, id_offsets = _blob(ids)
+    text_blob, text_offsets = _blob(texts)
+    meta_blob, meta_offsets = _blob(metadatas)
+    sections = [
+        ("terms", np.frombuffer(terms, dtype=np.uint8)),
+        ("term_offsets", term_offsets),
+        ("term_ptr", term_ptr),
+        ("post_doc", post_doc),
+        ("post_tf", post_tf),
+        ("doc_len", doc_len),
+        ("ids", np.frombuffer(id_blob, dtype=np.uint8)),
+        ("id_offsets", id_offsets),
+        ("texts", np.frombuffer(text_blob, dtype=np.uint8)),
+        ("text_offsets", text_offsets),
+        ("metadata", np.frombuffer(meta_blob, dtype=np.uint8)),
+        ("metadata_offsets", meta_offsets),
+    ]
+
+    header = {
+        "k1": k1,
+        "b": b,
+        "docs": len(ids),
+        "avgdl": float(doc_len.mean()) if len(ids) else 0.0,
+        "sections": {},
+    }
+    # section offsets are relative to the end of the header, 8-byte aligned
+    offset = 0
+    for name, array in sections:
+        header["sections"][name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (-(len(MAGIC) + 8 + len(encoded)) % 8)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        for _, array in sections:
+            data = array.tobytes()
+            f.write(data + b"\0" * (-len(data) % 8))
+    os.replace(tmp_path, path)
+    return {"docs": len(ids), "terms": len(vocabulary), "postings": int(term_ptr[-1]), "bytes": os.path.getsize(path)}
+
+
+class BM25Index:
+    """Read-only, memory-mapped view of an index written by ``build_bm25_index``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a BM25 index: {path}")
+        (length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mmap[start : start + length])
+        base = start + length
+
+        self.k1 = header["k1"]
+        self.b = header["b"]
+        self.docs = header["docs"]
+        self.avgdl = header["avgdl"] or 1.0
+        self._sections = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=base + offset)
+            for name, (offset, dtype, count) in header["sections"].items()
+        }
+
+        terms = self._strings("terms", "term_offsets")
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.term_ptr = self._sections["term_ptr"]
+        self.post_doc = self._sections["post_doc"]
+        self.post_tf = self._sections["post_tf"]
+        doc_len = self._sections["doc_len"].astype(np.float32)
+        # the length normalisation part of the BM25 denominator, per document
+        self._norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+        self._masks = MetadataMasks(self.docs, lambda i: json.loads(self._item("metadata", "metadata_offsets", i)))
+
+    def _strings(self, blob, offsets):
+        data = self._sections[blob].tobytes()
+        offsets = self._sections[offsets]
+        return [data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    def _item(self, blob, offsets, i):
+        offsets = self._sections[offsets]
+        return self._sections[blob][offsets[i] : offsets[i + 1]].tobytes().decode("utf-8")
+
+    def document(self, i: int) -> Document:
+        return Document(
+            id=self._item("ids", "id_offsets", i),
+            page_content=self._item("texts", "text_offsets", i),
+            metadata=json.loads(self._item("metadata", "metadata_offsets", i)),
+        )
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.docs, dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            docs = self.post_doc[start:end]
+            tf = self.post_tf[start:end].astype(np.float32)
+            idf = np.log1p((self.docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += qtf * idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search_with_score(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """``filter`` as in utils/metadata_tags.py."""
+        scores = self.scores(query)
+        if filter:
+            scores[~self._masks.mask(filter)] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.document(int(i)), float(scores[i])) for i in hits]
+
+    def search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k, filter)]
+
+    def close(self):
+        self._sections = {}
+        self.term_ptr = self.post_doc = self.post_tf = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # a caller still holds a view; the map goes away with it
+            pass
+        self._file.close()
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 load_dotenv(override=True)
 
@@ -26,3 +27,27 @@ config_json = {
     }
   }
 }
+
+
+def load_config():
+    """Return the MCP server config.
+
+    Reads the JSON file named by ``MCP_CONFIG_FILE`` (e.g. ``config.json``) on
+    every call so a running server can pick up edits, and falls back to the
+    built-in ``config_json`` when no file is configured. ``env`` values in the
+    file are overridden by the process environment so secrets stay out of it.
+    """
+    config_file = os.getenv("MCP_CONFIG_FILE")
+    if not config_file or not os.path.exists(config_file):
+        return config_json
+
+    with open(config_file, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    for server_info in config.get("mcpServers", {}).values():
+        if "env" in server_info:
+            server_info["env"] = {
+                key: os.getenv(key, value) for key, value in server_info["env"].items()
+            }
+
+    return config
@@ -0,0 +1,200 @@
+"""
+Which retrieved chunks the knowledgebase tool hands to the model.
+
+The tool used to return a fixed top 5, and with chunks of 800 characters
+overlapping by 300 that was often the same paragraph twice, plus weak
+matches padding out a question only one chunk answers. ``select_context``
+takes an over-fetched ranking, (document, score) pairs best first with
+higher scores better, and:
+
+* keeps at least RERANK_MIN_K and at most RERANK_MAX_K candidates, cutting
+  at the first one scoring below RERANK_MIN_SCORE or below
+  RERANK_RELATIVE_SCORE times the best score (adaptive k);
+* merges chunks that overlap each other, neighbours of the same section,
+  into one passage and drops chunks contained in another;
+* orders the passages by maximal marginal relevance over word-pair
+  similarity and drops near-duplicates of a passage already taken;
+* adds passages while they fit RERANK_TOKEN_BUDGET, cutting the one that
+  does not fit at a line break.
+"""
+import os
+import math
+from typing import List, Sequence, Tuple
+from langchain_core.documents import Document
+
+from utils.bm25 import tokenize
+
+# candidates fetched for the selection to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_MIN_K = int(os.getenv("RERANK_MIN_K", "1"))
+RERANK_MAX_K = int(os.getenv("RERANK_MAX_K", "5"))
+# absolute floor on the retriever's score (cosine similarity, or the normalised RRF score of hybrid search)
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0"))
+# candidates scoring below this share of the best one are cut
+RERANK_RELATIVE_SCORE = float(os.getenv("RERANK_RELATIVE_SCORE", "0.6"))
+# 1 ranks by relevance only; lower values favour passages unlike those already taken
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+# word-pair Jaccard similarity above which a passage is a near-duplicate
+RERANK_DUP_THRESHOLD = float(os.getenv("RERANK_DUP_THRESHOLD", "0.6"))
+# shortest shared text, in characters, for two chunks to be merged as neighbours
+RERANK_MERGE_MIN_OVERLAP = int(os.getenv("RERANK_MERGE_MIN_OVERLAP", "40"))
+# approximate tokens of knowledgebase context returned per call; 0 for no limit
+RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", "1200"))
+# Bangla script takes more tokens per character than English
+RERANK_CHARS_PER_TOKEN = float(os.getenv("RERANK_CHARS_PER_TOKEN", "3"))
+
+
+def estimate_tokens(text: str, chars_per_token: float = RERANK_CHARS_PER_TOKEN) -> int:
+    return math.ceil(len(text) / chars_per_token)
+
+
+def adaptive_cutoff(
+    scored: Sequence[Tuple[Document, float]],
+    min_k: int = RERANK_MIN_K,
+    max_k: int = RERANK_MAX_K,
+    min_score: float = RERANK_MIN_SCORE,
+    relative_score: float = RERANK_RELATIVE_SCORE,
+) -> List[Tuple[Document, float]]:
+    """The leading candidates up to the first score drop-off; ``scored`` is best first."""
+    if not scored:
+        return []
+    best = scored[0][1]
+    kept = []
+    for doc, score in scored[:max_k]:
+        if len(kept) >= min_k and (score < min_score or score < best * relative_score):
+            break
+        kept.append((doc, score))
+    return kept
+
+
+def overlap_length(first: str, second: str, min_overlap: int = RERANK_MERGE_MIN_OVERLAP) -> int:
+    """Characters of ``first``'s end that ``second`` starts with (0 below ``min_overlap``)."""
+    if len(second) < min_overlap:
+        return 0
+    key = second[:min_overlap]
+    start = first.find(key, max(0, len(first) - len(second)))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(key, start + 1)
+    return 0
+
+
+def merge_neighbours(
+    scored: Sequence[Tuple[Document, float]], min_overlap: int = RERANK_MERGE_MIN_OVERLAP
+) -> List[Tuple[Document, float]]:
+    """
+    Chunks contained in another are dropped and chunks overlapping by at
+    least ``min_overlap`` characters are joined in text order. A merged
+    passage keeps the best score and the rank of its best chunk.
+    """
+    passages = [[doc.page_content, score, doc] for doc, score in scored]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(passages)):
+            for j in range(len(passages)):
+                if i == j:
+                    continue
+                first, second = passages[i], passages[j]
+                if second[0] in first[0]:
+                    text = first[0]
+                else:
+                    shared = overlap_length(first[0], second[0], min_overlap)
+                    if not shared:
+                        continue
+                    text = first[0] + second[0][shared:]
+                # the merged passage takes the place of the better ranked of the two
+                keep, drop = (i, j) if i < j else (j, i)
+                passages[keep] = [text, max(first[1], second[1]), passages[keep][2]]
+                del passages[drop]
+                merged = True
+                break
+            if merged:
+                break
+    return [
+        (doc if text == doc.page_content else Document(id=doc.id, page_content=text, metadata=doc.metadata), score)
+        for text, score, doc in passages
+    ]
+
+
+def shingles(text: str) -> set:
+    tokens = tokenize(text)
+    return set(zip(tokens, tokens[1:])) or set(tokens)
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def mmr_order(
+    scored: Sequence[Tuple[Document, float]],
+    mmr_lambda: float = RERANK_MMR_LAMBDA,
+    dup_threshold: float = RERANK_DUP_THRESHOLD,
+) -> List[Tuple[Document, float]]:
+    """
+    Maximal marginal relevance: repeatedly take the passage maximising
+    lambda * relevance - (1 - lambda) * similarity to those already taken.
+    Relevance is the score over the best score; passages at least
+    ``dup_threshold`` similar to a taken one are dropped.
+    """
+    if not scored:
+        return []
+    best = max(score for _, score in scored) or 1.0
+    remaining = [(doc, score, shingles(doc.page_content)) for doc, score in scored]
+    taken = []
+    while remaining:
+        choice = None
+        for i, (doc, score, words) in enumerate(remaining):
+            similarity = max((jaccard(words, other) for _, _, other in taken), default=0.0)
+            if similarity >= dup_threshold:
+                continue
+            value = mmr_lambda * score / best - (1 - mmr_lambda) * similarity
+            if choice is None or value > choice[0]:
+                choice = (value, i)
+        if choice is None:
+            break
+        taken.append(remaining.pop(choice[1]))
+    return [(doc, score) for doc, score, _ in taken]
+
+
+def fit_budget(
+    docs: Sequence[Document],
+    token_budget: int = RERANK_TOKEN_BUDGET,
+    chars_per_token: float = RERANK_CHARS_PER_TOKEN,
+) -> List[Document]:
+    """Passages in order while they fit; the first that does not is cut at its last line break that fits."""
+    if token_budget <= 0:
+        return list(docs)
+    selected = []
+    left = token_budget
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content, chars_per_token)
+        if tokens <= left:
+            selected.append(doc)
+            left -= tokens
+            continue
+        cut = doc.page_content.rfind("\n", 0, int(left * chars_per_token))
+        if cut > 0:
+            selected.append(Document(id=doc.id, page_content=doc.page_content[:cut], metadata=doc.metadata))
+        break
+    return selected
+
+
+def select_context(
+    scored: Sequence[Tuple[Document, float]],
+    min_k: int = RERANK_MIN_K,
+    max_k: int = RERANK_MAX_K,
+    min_score: float = RERANK_MIN_SCORE,
+    relative_score: float = RERANK_RELATIVE_SCORE,
+    mmr_lambda: float = RERANK_MMR_LAMBDA,
+    dup_threshold: float = RERANK_DUP_THRESHOLD,
+    min_overlap: int = RERANK_MERGE_MIN_OVERLAP,
+    token_budget: int = RERANK_TOKEN_BUDGET,
+    chars_per_token: float = RERANK_CHARS_PER_TOKEN,
+) -> List[Document]:
+    """The passages to return for an over-fetched, best first ranking (see the module docstring)."""
+    kept = adaptive_cutoff(scored, min_k, max_k, min_score, relative_score)
+    passages = merge_neighbours(kept, min_overlap)
+    ordered = mmr_order(passages, mmr_lambda, dup_threshold)
+    return fit_budget([doc for doc, _ in ordered], token_budget, chars_per_token)
@@ -0,0 +1,141 @@
+"""
+Micro-batching in front of an embedding client.
+
+Every knowledgebase call embeds one query, so a burst of agent turns sends
+a burst of single-text requests, each paying a full round trip and a
+share of the provider's request rate limit. BatchingEmbeddings collects
+the queries arriving within EMBED_BATCH_WINDOW_MS, sends them as one
+request of at most EMBED_BATCH_MAX texts (at most EMBED_BATCH_CONCURRENCY
+requests in flight) and hands every caller its own vector. A text that is
+already being embedded is not sent again; its callers share the result.
+"""
+import os
+import asyncio
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+from utils.logger import get_logger
+
+# how long the first query of a batch waits for company; 0 batches only what arrives in the same loop tick
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+EMBED_BATCH_CONCURRENCY = int(os.getenv("EMBED_BATCH_CONCURRENCY", "4"))
+
+logger = get_logger("embedding_batcher")
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Batches concurrent ``aembed_query`` calls into ``aembed_queries``
+    requests of the wrapped client (GeminiEmbedder,
+    NvidiaOpenAIEmbeddings_BGE_M3). Clients without ``aembed_queries`` get
+    one ``aembed_query`` per distinct text, so only the deduplication
+    applies. Documents and the sync methods go straight through. One event
+    loop only.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        window_ms: float = EMBED_BATCH_WINDOW_MS,
+        max_batch: int = EMBED_BATCH_MAX,
+        concurrency: int = EMBED_BATCH_CONCURRENCY,
+    ):
+        self.embeddings = embeddings
+        # CachedEmbeddings keys on the model name; batching must not change it
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.concurrency = max(1, concurrency)
+        self.queries = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.largest_batch = 0
+        self.errors = 0
+        # text -> future of its vector, from the moment it is queued until its batch returns
+        self._inflight = {}
+        self._pending = []
+        self._timer = None
+        self._semaphore = None
+        self._tasks = set()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.queries += 1
+        future = self._inflight.get(text)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[text] = future
+            self._pending.append(text)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # a caller giving up must not cancel the batch for the others waiting on it
+        return list(await asyncio.shield(future))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        texts, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._send(texts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, texts):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                if hasattr(self.embeddings, "aembed_queries"):
+                    vectors = await self.embeddings.aembed_queries(texts)
+                else:
+                    vectors = await asyncio.gather(*(self.embeddings.aembed_query(text) for text in texts))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Embedding batch of {len(texts)} failed: {e}")
+            for text in texts:
+                future = self._inflight.pop(text)
+                if not future.done():
+                    future.set_exception(e)
+                    # marked retrieved, so callers that already gave up don't log "never retrieved"
+                    future.exception()
+            return
+        except BaseException:
+            for text in texts:
+                self._inflight.pop(text).cancel()
+            raise
+
+        self.batches += 1
+        self.batched_texts += len(texts)
+        self.largest_batch = max(self.largest_batch, len(texts))
+        for text, vector in zip(texts, vectors):
+            future = self._inflight.pop(text)
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "queries": self.queries,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "mean_batch": self.batched_texts / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
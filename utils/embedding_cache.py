@@ -0,0 +1,175 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "86400"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC, collapse whitespace and casefold, so trivially different spellings share a key."""
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Caching wrapper around any langchain ``Embeddings``.
+
+    Keys are sha256(model, task type, normalised text). Vectors are kept as
+    float32 arrays in an in-process LRU bounded by ``max_bytes`` with a TTL,
+    and optionally in a sqlite file so the cache survives restarts and is
+    shared by every MCP server process on the host.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        ttl: float = EMBED_CACHE_TTL,
+        max_bytes: int = EMBED_CACHE_MAX_BYTES,
+        path: Optional[str] = EMBED_CACHE_PATH,
+    ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM embeddings WHERE expires_at < ?", (time.time(),))
+
+    def key(self, text: str, task_type: str) -> str:
+        raw = f"{self.model}\x1f{task_type}\x1f{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return vector.tolist()
+                self._drop(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, expires_at FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    vector = array("f")
+                    vector.frombytes(row[0])
+                    self._remember(key, vector, row[1])
+                    self.disk_hits += 1
+                    return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def _put(self, key: str, values: List[float]):
+        vector = array("f", values)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, vector, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), expires_at),
+                )
+        # hand back the stored float32 values so hits and misses are identical
+        return vector.tolist()
+
+    def _remember(self, key, vector, expires_at):
+        if key in self._memory:
+            self._drop(key)
+        self._memory[key] = (vector, expires_at)
+        self.size_bytes += len(vector) * vector.itemsize
+        while self.size_bytes > self.max_bytes and self._memory:
+            self._drop(next(iter(self._memory)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        vector, _ = self._memory.pop(key)
+        self.size_bytes -= len(vector) * vector.itemsize
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.key(text, "query")
+        vector = self._get(key)
+        if vector is None:
+            vector = self._put(key, self.embeddings.embed_query(text))
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self.key(text, "query")
+        vector = self._get(key)
+        if vector is None:
+            vector = self._put(key, await self.embeddings.aembed_query(text))
+        return vector
+
+    def _split(self, texts: List[str]):
+        keys = [self.key(text, "document") for text in texts]
+        vectors = [self._get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        return keys, vectors, missing
+
+    def _fill(self, keys, vectors, missing, embedded):
+        for i, vector in zip(missing, embedded):
+            vectors[i] = self._put(keys[i], vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._split(texts)
+        if missing:
+            embedded = self.embeddings.embed_documents([texts[i] for i in missing])
+            self._fill(keys, vectors, missing, embedded)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._split(texts)
+        if missing:
+            embedded = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            self._fill(keys, vectors, missing, embedded)
+        return vectors
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.size_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
@@ -1,40 +1,127 @@
 import os
+import threading
 from typing import List
-from google import genai
-from google.genai import types
+import httpx
 from dotenv import load_dotenv
 from langchain_core.embeddings import Embeddings
 load_dotenv(override=True)
 
+from utils.http_clients import (
+    EMBED_READ_TIMEOUT,
+    RETRY_STATUS,
+    LatencyHistogram,
+    acall_with_retry,
+    async_http_client,
+    call_with_retry,
+    http2_available,
+    sync_http_client,
+)
+
+# another endpoint for the Gemini API, e.g. a proxy or a local mock
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
+
+
+def _retryable(exc):
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRY_STATUS
+    return isinstance(exc, httpx.TransportError)
+
 
 class GeminiEmbedder(Embeddings):
-    def __init__(self, api_key: str, model: str = "gemini-embedding-2-preview"):
-        self.client = genai.Client(api_key=api_key)
+    """
+    Gemini embeddings. The google-genai client (and the import of the SDK,
+    over a second on a cold start) is created on first use, so importing
+    this module stays cheap for processes that may never embed. It sends
+    through the pooled clients of utils/http_clients; calls are retried
+    there and timed in ``latency``.
+    """
+
+    def __init__(self, api_key: str, model: str = "gemini-embedding-2-preview", base_url: str = GEMINI_BASE_URL):
+        self.api_key = api_key
         self.model = model
+        self.base_url = base_url
+        self.latency = LatencyHistogram()
+        self._client = None
+        self._client_lock = threading.Lock()
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings = self.client.models.embed_content(
-        model=self.model,
-        contents=texts,
-        config=types.EmbedContentConfig(
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        # the sync methods may be called from many threads at once; they must share one pool
+        with self._client_lock:
+            if self._client is not None:
+                return self._client
+            from google import genai
+            from google.genai import types
+
+            self._client = genai.Client(
+                api_key=self.api_key,
+                http_options=types.HttpOptions(
+                    base_url=self.base_url,
+                    # per request, in ms; without it the SDK sends none and the pool's timeout is lifted
+                    timeout=int(EMBED_READ_TIMEOUT * 1000),
+                    httpx_client=sync_http_client(),
+                    httpx_async_client=async_http_client(),
+                    # retried by call_with_retry, with jitter and inside the latency histogram
+                    retry_options=types.HttpRetryOptions(attempts=1),
+                ),
+            )
+        return self._client
+
+    def _config(self):
+        from google.genai import types
+
+        return types.EmbedContentConfig(
             task_type="retrieval_document",
-         )
+        )
+
+    def _contents(self, texts):
+        # one Content per text: the SDK folds a plain list of strings into a single
+        # multi-part content for gemini-embedding-2 models, which returns one vector
+        from google.genai import types
+
+        return [types.Content(parts=[types.Part(text=text)]) for text in texts]
+
+    def _embed(self, texts):
+        return call_with_retry(
+            lambda: self.client.models.embed_content(model=self.model, contents=self._contents(texts), config=self._config()),
+            self.latency,
+            _retryable,
         ).embeddings
 
-        return [embedding.values for embedding in embeddings]
+    async def _aembed(self, texts):
+        return (await acall_with_retry(
+            lambda: self.client.aio.models.embed_content(
+                model=self.model, contents=self._contents(texts), config=self._config()
+            ),
+            self.latency,
+            _retryable,
+        )).embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [embedding.values for embedding in self._embed(texts)]
 
     def embed_query(self, text: str) -> List[float]:
-        embeddings = self.client.models.embed_content(
-        model=self.model,
-        contents=text,
-        config=types.EmbedContentConfig(
-            task_type="retrieval_document",
-         )
-       ).embeddings
-        return embeddings[0].values
+        return self._embed([text])[0].values
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [embedding.values for embedding in await self._aembed(texts)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed([text]))[0].values
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Several queries in one request, embedded exactly as ``aembed_query`` would."""
+        return await self.aembed_documents(texts)
+
+    def stats(self):
+        return {"http2": http2_available(), **self.latency.stats()}
 
 
 embedding_engine = GeminiEmbedder(
     api_key=os.getenv("GOOGLE_API_KEY"),
     model="gemini-embedding-2-preview",
-)
\ No newline at end of file
+)
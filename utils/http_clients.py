@@ -0,0 +1,175 @@
+"""
+Pooled HTTP clients, retries and latency histograms for the embedding
+providers (utils/embedding_engine.py, utils/nvidia_bge_m3.py).
+
+Both SDKs take an httpx client, so connections are kept alive and bounded
+here instead of by whatever the SDK defaults to. HTTP/2 is used when the
+``h2`` package is installed (``pip install httpx[http2]``); requests to
+one host then share a few multiplexed connections.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+import importlib.util
+from typing import Callable, Sequence
+
+import httpx
+
+EMBED_HTTP_MAX_CONNECTIONS = int(os.getenv("EMBED_HTTP_MAX_CONNECTIONS", "20"))
+# below EMBED_HTTP_MAX_CONNECTIONS, busy periods close and reopen the connections in between
+EMBED_HTTP_MAX_KEEPALIVE = int(os.getenv("EMBED_HTTP_MAX_KEEPALIVE", str(EMBED_HTTP_MAX_CONNECTIONS)))
+# seconds an idle connection is kept open
+EMBED_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("EMBED_HTTP_KEEPALIVE_EXPIRY", "30"))
+EMBED_HTTP2 = os.getenv("EMBED_HTTP2", "true").lower() == "true"
+EMBED_CONNECT_TIMEOUT = float(os.getenv("EMBED_CONNECT_TIMEOUT", "5"))
+EMBED_READ_TIMEOUT = float(os.getenv("EMBED_READ_TIMEOUT", "30"))
+# attempts per call, the first included; waits grow from EMBED_RETRY_BASE up to EMBED_RETRY_MAX seconds
+EMBED_RETRIES = max(1, int(os.getenv("EMBED_RETRIES", "3")))
+EMBED_RETRY_BASE = float(os.getenv("EMBED_RETRY_BASE", "0.5"))
+EMBED_RETRY_MAX = float(os.getenv("EMBED_RETRY_MAX", "8"))
+
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+# upper bounds in milliseconds; the last bucket is everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def http2_available() -> bool:
+    return EMBED_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(EMBED_READ_TIMEOUT, connect=EMBED_CONNECT_TIMEOUT)
+
+
+def _client_options():
+    return dict(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=EMBED_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=EMBED_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=EMBED_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=http_timeout(),
+    )
+
+
+def sync_http_client() -> httpx.Client:
+    return httpx.Client(**_client_options())
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """Bound to the event loop it is first used on, like any httpx.AsyncClient."""
+    return httpx.AsyncClient(**_client_options())
+
+
+def retry_delay(attempt: int, base: float = EMBED_RETRY_BASE, cap: float = EMBED_RETRY_MAX) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)], so clients that failed together retry apart."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def status_of(exc: BaseException):
+    """The HTTP status of an SDK or httpx error, if it carries one."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+class LatencyHistogram:
+    """
+    Call latencies in fixed buckets (LATENCY_BUCKETS_MS), with the count,
+    sum and error/retry counters. Thread-safe, so the sync methods can be
+    called from a thread pool.
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(self.buckets_ms) if ms <= bound), len(self.buckets_ms))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def percentile(self, q: float):
+        """Upper bound of the bucket holding the q-quantile, in ms (None above the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def stats(self):
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_ms": round(self.sum / self.count * 1000, 2) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets_ms": {
+                **{str(bound): count for bound, count in zip(self.buckets_ms, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+def call_with_retry(
+    fn: Callable,
+    histogram: LatencyHistogram,
+    retryable: Callable[[BaseException], bool],
+    attempts: int = EMBED_RETRIES,
+):
+    """``fn()``, retried with jittered backoff while ``retryable``; the whole call is timed."""
+    started = time.perf_counter()
+    try:
+        for attempt in range(attempts):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == attempts - 1 or not retryable(e):
+                    histogram.errors += 1
+                    raise
+                histogram.retries += 1
+            time.sleep(retry_delay(attempt))
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+async def acall_with_retry(
+    fn: Callable,
+    histogram: LatencyHistogram,
+    retryable: Callable[[BaseException], bool],
+    attempts: int = EMBED_RETRIES,
+):
+    """Async ``call_with_retry``: awaits ``fn()``."""
+    started = time.perf_counter()
+    try:
+        for attempt in range(attempts):
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt == attempts - 1 or not retryable(e):
+                    histogram.errors += 1
+                    raise
+                histogram.retries += 1
+            await asyncio.sleep(retry_delay(attempt))
+    finally:
+        histogram.observe(time.perf_counter() - started)
@@ -0,0 +1,127 @@
+import os
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+
+from utils.bm25 import BM25Index
+from utils.telemetry import stage
+
+if TYPE_CHECKING:
+    # langchain_postgres is a slow import and the local backend never needs it
+    from utils.vector_store import KnowledgebaseStore
+
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH")
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", "1.0"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+
+def reciprocal_rank_fusion_with_scores(
+    rankings: Sequence[List[Document]], weights: Sequence[float], rrf_k: int = HYBRID_RRF_K
+) -> List[Tuple[Document, float]]:
+    """
+    Merge ranked lists by weighted RRF: a document scores
+    sum(weight / (rrf_k + rank)) over the lists it appears in. Documents
+    are matched on their text, so rows ingested before chunk ids existed
+    still fuse with the keyword hits. Scores are divided by the best
+    possible one, first in every list, so they fall in (0, 1].
+    """
+    scores = {}
+    docs = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sum(weights) / (rrf_k + 1) or 1.0
+    return [(docs[key], scores[key] / best) for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Document]], weights: Sequence[float], rrf_k: int = HYBRID_RRF_K
+) -> List[Document]:
+    return [doc for doc, _ in reciprocal_rank_fusion_with_scores(rankings, weights, rrf_k)]
+
+
+class HybridRetriever:
+    """
+    PGVector similarity and BM25 keyword search run side by side and fused
+    with ``reciprocal_rank_fusion``. Each side contributes its top
+    ``candidates``; a weight of 0 switches that side off. ``store`` may be
+    a ``KnowledgebaseStore`` or a ``LocalVectorStore``.
+    """
+
+    def __init__(
+        self,
+        store: "KnowledgebaseStore",
+        index: BM25Index,
+        vector_weight: float = HYBRID_VECTOR_WEIGHT,
+        bm25_weight: float = HYBRID_BM25_WEIGHT,
+        rrf_k: int = HYBRID_RRF_K,
+        candidates: int = HYBRID_CANDIDATES,
+    ):
+        self.store = store
+        self.index = index
+        self.vector_weight = vector_weight
+        self.bm25_weight = bm25_weight
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    def _keyword_search(self, query, n, filter):
+        if not self.bm25_weight:
+            return []
+        with stage("keyword_search"):
+            return self.index.search(query, k=n, filter=filter)
+
+    def _fuse(self, vector_docs, keyword_docs, k):
+        fused = reciprocal_rank_fusion_with_scores(
+            [vector_docs, keyword_docs], [self.vector_weight, self.bm25_weight], self.rrf_k
+        )
+        return fused[:k]
+
+    def search_with_score(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """(document, normalised RRF score) pairs, best first; ``filter`` applies to both sides."""
+        n = max(k, self.candidates)
+        vector_docs = self.store.similarity_search(query, k=n, filter=filter) if self.vector_weight else []
+        keyword_docs = self._keyword_search(query, n, filter)
+        return self._fuse(vector_docs, keyword_docs, k)
+
+    async def asearch_with_score(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        n = max(k, self.candidates)
+        vector_task = (
+            asyncio.create_task(self.store.asimilarity_search(query, k=n, filter=filter)) if self.vector_weight else None
+        )
+        try:
+            if vector_task is not None:
+                # let the vector side send its embedding request before the keyword side holds the loop
+                await asyncio.sleep(0)
+            # the keyword side is a few numpy ops on the mapped index; it runs while the embedding is in flight
+            keyword_docs = self._keyword_search(query, n, filter)
+        except BaseException:
+            if vector_task is not None:
+                vector_task.cancel()
+                await asyncio.gather(vector_task, return_exceptions=True)
+            raise
+        vector_docs = await vector_task if vector_task is not None else []
+        return self._fuse(vector_docs, keyword_docs, k)
+
+    def search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k, filter)]
+
+    async def asearch(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in await self.asearch_with_score(query, k, filter)]
+
+
+def load_bm25_index(path: str = BM25_INDEX_PATH):
+    """The index at ``path``, or None (pure vector search) when it is unset or missing."""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"[WARNING] BM25 index not found at {path} - falling back to vector search only")
+        return None
+    return BM25Index(path)
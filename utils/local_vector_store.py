@@ -0,0 +1,256 @@
+"""
+In-process knowledgebase backend: no database on the lookup path.
+
+An index is two files sharing a prefix, written by ``write_local_index``
+(see Database/export_local_index.py):
+
+    <prefix>.npy    float32 matrix of unit-normalised embeddings, one row per chunk
+    <prefix>.jsonl  one {"id", "text", "metadata"} line per row, in the same order
+
+Both are memory-mapped read-only, so every MCP server process on the host
+shares the same page-cache copy; a process only owns the line offsets.
+Search is an exact dot product over the matrix. With ``index_type="hnsw"``
+and hnswlib installed, ``<prefix>.hnsw`` (written with ``hnsw=True``) is
+used instead; hnswlib keeps its graph in process memory.
+
+Quantised copies of the matrix can be written alongside it:
+
+    <prefix>.f16.npy                       float16 codes (2 bytes per dim)
+    <prefix>.i8.npy + <prefix>.i8scale.npy int8 codes with one float32 scale per row (1 byte per dim)
+
+With ``quantization`` set, candidates are scored on the codes and only the
+best ``rerank * k`` rows are re-scored in full precision, so the float32
+matrix is read a few rows at a time instead of being kept resident.
+"""
+import os
+import json
+import mmap
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from utils.metadata_tags import MetadataMasks
+from utils.telemetry import stage
+
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH")
+LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "exact")
+LOCAL_HNSW_EF = int(os.getenv("LOCAL_HNSW_EF", "64"))
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")
+LOCAL_RERANK_FACTOR = int(os.getenv("LOCAL_RERANK_FACTOR", "4"))
+
+# rows converted to float32 per step when scoring quantised codes
+_BLOCK_ROWS = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize_float16(matrix: np.ndarray) -> np.ndarray:
+    return matrix.astype(np.float16)
+
+
+def quantize_int8(matrix: np.ndarray):
+    """Symmetric per-row scalar quantisation: row ~= codes * scale."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _save(path, array):
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, array)
+    return f"{path}.tmp", path
+
+
+def write_local_index(
+    rows: Iterable[Tuple[str, str, dict, List[float]]], prefix: str, hnsw: bool = False, quantize=()
+):
+    """
+    Write (id, text, metadata, vector) rows under ``prefix``, plus the
+    quantised copies named in ``quantize`` ("float16", "int8"). Files are
+    renamed into place, so running servers keep their old mapping.
+    """
+    vectors = []
+    tmp_jsonl = f"{prefix}.jsonl.tmp"
+    with open(tmp_jsonl, "w", encoding="utf-8") as f:
+        for id_, text, metadata, vector in rows:
+            f.write(json.dumps({"id": id_, "text": text, "metadata": metadata or {}}, ensure_ascii=False) + "\n")
+            vectors.append(np.asarray(vector, dtype=np.float32))
+
+    matrix = _normalize(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    files = [_save(f"{prefix}.npy", matrix)]
+    if "float16" in quantize:
+        files.append(_save(f"{prefix}.f16.npy", quantize_float16(matrix)))
+    if "int8" in quantize:
+        codes, scales = quantize_int8(matrix)
+        files.append(_save(f"{prefix}.i8.npy", codes))
+        files.append(_save(f"{prefix}.i8scale.npy", scales))
+
+    if hnsw:
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        index.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+        index.add_items(matrix, np.arange(len(matrix)))
+        index.save_index(f"{prefix}.hnsw.tmp")
+        os.replace(f"{prefix}.hnsw.tmp", f"{prefix}.hnsw")
+
+    for tmp, path in files:
+        os.replace(tmp, path)
+    os.replace(tmp_jsonl, f"{prefix}.jsonl")
+    return {"rows": len(matrix), "dims": matrix.shape[1] if len(matrix) else 0, "bytes": matrix.nbytes}
+
+
+class LocalVectorStore:
+    """Drop-in for ``KnowledgebaseStore`` searches, served from a local index."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: str = LOCAL_INDEX_PATH,
+        index_type: str = LOCAL_INDEX_TYPE,
+        ef: int = LOCAL_HNSW_EF,
+        quantization: str = LOCAL_INDEX_QUANTIZATION,
+        rerank: int = LOCAL_RERANK_FACTOR,
+    ):
+        self.embeddings = embeddings
+        self.path = path
+        self.rerank = rerank
+        self.vectors = np.load(f"{path}.npy", mmap_mode="r")
+        self._codes = None
+        self._scales = None
+        if quantization == "float16":
+            self._codes = np.load(f"{path}.f16.npy", mmap_mode="r")
+        elif quantization == "int8":
+            self._codes = np.load(f"{path}.i8.npy", mmap_mode="r")
+            self._scales = np.load(f"{path}.i8scale.npy", mmap_mode="r")
+        elif quantization != "none":
+            raise ValueError(f"Unknown quantization: {quantization}")
+
+        self._file = open(f"{path}.jsonl", "rb")
+        self._docs = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f"{path}.jsonl") else b""
+        ends = np.flatnonzero(np.frombuffer(self._docs, dtype=np.uint8) == ord("\n")) + 1
+        self._offsets = np.concatenate([[0], ends]).astype(np.int64)
+        if len(self._offsets) - 1 != len(self.vectors):
+            raise ValueError(f"{path}.jsonl has {len(self._offsets) - 1} rows, {path}.npy has {len(self.vectors)}")
+
+        self._masks = MetadataMasks(len(self.vectors), lambda i: self.document(i).metadata)
+
+        self._hnsw = None
+        if index_type == "hnsw":
+            self._hnsw = self._load_hnsw(ef)
+
+    def _load_hnsw(self, ef):
+        try:
+            import hnswlib
+        except ImportError:
+            print("[WARNING] hnswlib is not installed - using exact search")
+            return None
+        if not os.path.exists(f"{self.path}.hnsw"):
+            print(f"[WARNING] {self.path}.hnsw not found - using exact search")
+            return None
+        index = hnswlib.Index(space="ip", dim=self.vectors.shape[1])
+        index.load_index(f"{self.path}.hnsw", max_elements=len(self.vectors))
+        index.set_ef(ef)
+        return index
+
+    def document(self, i: int) -> Document:
+        row = json.loads(self._docs[self._offsets[i] : self._offsets[i + 1]])
+        return Document(id=row["id"], page_content=row["text"], metadata=row["metadata"])
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """(queries, rows) dot products against the quantised codes, one block of rows at a time."""
+        scores = np.empty((len(queries), len(self._codes)), dtype=np.float32)
+        buffer = np.empty((min(_BLOCK_ROWS, len(self._codes)), self._codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self._codes), _BLOCK_ROWS):
+            block = self._codes[start : start + _BLOCK_ROWS]
+            rows = buffer[: len(block)]
+            np.copyto(rows, block, casting="unsafe")
+            np.matmul(queries, rows.T, out=scores[:, start : start + len(block)])
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    @staticmethod
+    def _best(scores, k):
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _top_k(self, query: np.ndarray, k: int, filter: Optional[Dict[str, str]] = None):
+        if filter:
+            # exact over the matching rows, whatever the index type; fancy indexing reads only those
+            rows = np.flatnonzero(self._masks.mask(filter))
+            scores = self.vectors[rows] @ query
+            top = self._best(scores, min(k, len(rows))) if len(rows) else rows
+            return rows[top], scores[top]
+        k = min(k, len(self.vectors))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+            return labels[0].astype(np.int64), 1 - distances[0]
+        if self._codes is not None:
+            candidates = self._best(self.approximate_scores(query[None, :])[0], self.rerank * k)
+            # re-score the shortlist in full precision; fancy indexing reads only those rows
+            candidates = np.sort(candidates)
+            exact = self.vectors[candidates] @ query
+            top = self._best(exact, k)
+            return candidates[top], exact[top]
+        scores = self.vectors @ query
+        top = self._best(scores, k)
+        return top, scores[top]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 5, filter: Optional[Dict[str, str]] = None
+    ):
+        """(document, cosine distance) pairs, the same scale PGVector's ``<=>`` returns."""
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        with stage("vector_search", "local"):
+            top, scores = self._top_k(query, k, filter)
+        return [(self.document(int(i)), float(1 - score)) for i, score in zip(top, scores)]
+
+    async def asimilarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 5, filter: Optional[Dict[str, str]] = None
+    ):
+        return self.similarity_search_with_score_by_vector(embedding, k, filter)
+
+    def similarity_search_with_relevance_scores(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """(document, cosine similarity) pairs, best first; ``filter`` as in utils/metadata_tags.py."""
+        with stage("embedding"):
+            embedding = self.embeddings.embed_query(query)
+        return [(doc, 1 - distance) for doc, distance in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    async def asimilarity_search_with_relevance_scores(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        with stage("embedding"):
+            embedding = await self.embeddings.aembed_query(query)
+        return [(doc, 1 - distance) for doc, distance in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k, filter)]
+
+    async def asimilarity_search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_relevance_scores(query, k, filter)]
+
+    def close(self):
+        self.vectors = None
+        self._codes = None
+        self._scales = None
+        self._offsets = None
+        if isinstance(self._docs, mmap.mmap):
+            try:
+                self._docs.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    async def aclose(self):
+        self.close()
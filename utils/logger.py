@@ -0,0 +1,28 @@
+import os
+import sys
+import random
+import logging
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# share of streams whose per-token and tool-payload debug lines are logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    A logger printing ``[LEVEL] message`` like the rest of the codebase.
+    It writes to stderr, which also keeps it off the MCP stdio transport.
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+def sampled(logger: logging.Logger, level: int = logging.DEBUG, rate: float = LOG_SAMPLE_RATE) -> bool:
+    """Whether to log a high-volume unit of work (e.g. one stream) at ``level``."""
+    return logger.isEnabledFor(level) and random.random() < rate
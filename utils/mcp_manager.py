@@ -1,19 +1,39 @@
 import os
 import sys
 import json
+import time
 import asyncio
+import anyio
+from collections import deque
 from rich import print
+from mcp import types
+from mcp.shared.exceptions import McpError
+from langchain_core.tools import StructuredTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.sessions import create_session
+# private, and pinned in requirements.txt for it: load_mcp_tools binds each tool to one session, not to the pool
+from langchain_mcp_adapters.tools import _convert_call_tool_result, _list_all_tools
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from utils.config import config_json
+from utils.config import load_config
+from utils.telemetry import child_env, stage
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_PING_INTERVAL = float(os.getenv("MCP_PING_INTERVAL", "30"))
+MCP_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", "5"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "120"))
+MCP_RESTART_BACKOFF = float(os.getenv("MCP_RESTART_BACKOFF", "0.5"))
+MCP_RESTART_MAX_BACKOFF = float(os.getenv("MCP_RESTART_MAX_BACKOFF", "30"))
+
+# errors of a session whose streams are gone; other errors leave it serving the calls still running on it
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
 
 
 async def generate_mcp_config_file():
     print(f"Loading MCP configuration")
     mcp_config = {}
-    for server_name, server_info in config_json["mcpServers"].items():
+    for server_name, server_info in load_config()["mcpServers"].items():
         if server_info.get("disabled", False):
             continue
 
@@ -31,9 +51,11 @@ async def generate_mcp_config_file():
                 "args": server_info["args"],
                 "transport": "stdio",  # stdio transport for subprocess
             }
-            # Include environment variables if present
-            if "env" in server_info:
-                mcp_config[server_name]["env"] = server_info["env"]
+            # Include environment variables if present; the telemetry settings let the server's
+            # stages reach the same /metrics (utils/telemetry.py)
+            env = {**child_env(), **server_info.get("env", {})}
+            if env:
+                mcp_config[server_name]["env"] = env
 
     return mcp_config
 
@@ -43,7 +65,7 @@ async def create_mcp_client():
 
     mcp_config = {}
 
-    for server_name, server_info in config_json["mcpServers"].items():
+    for server_name, server_info in load_config()["mcpServers"].items():
         if server_info.get("disabled", False):
             continue
 
@@ -95,6 +117,317 @@ async def get_mcp_tools_from_config():
     return [tool for sublist in results for tool in sublist]
 
 
+class PooledSession:
+    """
+    One long-lived MCP session (for stdio servers, one subprocess).
+
+    The session is entered and exited inside its own task because the MCP
+    transports are anyio context managers that must close in the task that
+    opened them.
+    """
+
+    def __init__(self, server_name, connection):
+        self.server_name = server_name
+        self.connection = connection
+        self.session = None
+        self.in_flight = 0
+        self.last_used = 0.0
+        self._task = None
+        self._error = None
+        self._ready = None
+        self._stop = None
+
+    @property
+    def alive(self):
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._error = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                self.session = session
+                self.last_used = time.monotonic()
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=MCP_PING_TIMEOUT)
+        except Exception:
+            self._task.cancel()
+        self._task = None
+
+
+class MCPSessionPool:
+    """
+    A warm pool of sessions to one MCP server. Tool calls go to the least
+    busy live session, idle sessions are pinged, and sessions whose
+    transport fails, or that stop answering pings, are restarted with
+    exponential backoff. A tool's error reply only fails its own call.
+    """
+
+    def __init__(self, server_name, connection, size=MCP_POOL_SIZE):
+        self.server_name = server_name
+        self.members = [PooledSession(server_name, connection) for _ in range(max(1, size))]
+        self.mcp_tools = []
+        self.latencies = deque(maxlen=1000)
+        self.calls = 0
+        self.errors = 0
+        self.restarts = 0
+        self.cancelled = 0
+        self._restarting = set()
+        self._checking = set()
+        self._tasks = set()
+        self._health_task = None
+        self._closed = False
+
+    async def start(self):
+        await asyncio.gather(*(member.start() for member in self.members), return_exceptions=True)
+        member = self._pick()
+        if member is None:
+            raise RuntimeError(f"no MCP session to {self.server_name} could be started")
+
+        with stage("mcp_list_tools", self.server_name):
+            self.mcp_tools = await _list_all_tools(member.session)
+        for member in self.members:
+            if not member.alive:
+                self._schedule_restart(member)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    def _pick(self):
+        live = [m for m in self.members if m.alive and m not in self._restarting]
+        if not live:
+            return None
+        return min(live, key=lambda m: m.in_flight)
+
+    async def _acquire(self):
+        deadline = time.monotonic() + MCP_CALL_TIMEOUT
+        while True:
+            member = self._pick()
+            if member is not None:
+                return member
+            if self._closed or time.monotonic() > deadline:
+                raise RuntimeError(f"no live MCP session to {self.server_name}")
+            await asyncio.sleep(0.05)
+
+    async def call_tool(self, tool_name, arguments):
+        with stage("tool_call", tool_name):
+            return await self._call_tool(tool_name, arguments)
+
+    async def _call_tool(self, tool_name, arguments):
+        member = await self._acquire()
+        member.in_flight += 1
+        started = time.perf_counter()
+        request_id = None
+        try:
+            async with asyncio.timeout(MCP_CALL_TIMEOUT):
+                # the SDK has no public way to learn a request's id: it numbers requests sequentially
+                # and call_tool sends without awaiting first, so this is the id of the request below.
+                # mcp is pinned in requirements.txt for it; without the attribute no cancel is sent
+                request_id = getattr(member.session, "_request_id", None)
+                return await member.session.call_tool(tool_name, arguments)
+        except asyncio.CancelledError:
+            # the agent run was cancelled (client gone, deadline): stop the tool on the server too
+            self._cancel_remote(member, request_id)
+            raise
+        except Exception as e:
+            self.errors += 1
+            if self._transport_failed(member, e):
+                self._schedule_restart(member)
+            elif not isinstance(e, McpError):
+                # a timeout or an unexpected error: restart only if the session stops answering pings
+                self._schedule_check(member)
+            raise
+        finally:
+            member.in_flight -= 1
+            member.last_used = time.monotonic()
+            self.calls += 1
+            self.latencies.append(time.perf_counter() - started)
+
+    def _cancel_remote(self, member, request_id):
+        if request_id is None or not member.alive:
+            return
+        notification = types.ClientNotification(
+            types.CancelledNotification(
+                params=types.CancelledNotificationParams(requestId=request_id, reason="Client cancelled the run")
+            )
+        )
+        self.cancelled += 1
+        task = self._spawn(member.session.send_notification(notification))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def _spawn(self, coro):
+        # the loop only keeps a weak reference to a task; hold it until it is done
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @staticmethod
+    def _transport_failed(member, error):
+        if not member.alive or isinstance(error, TRANSPORT_ERRORS):
+            return True
+        # the SDK fails the requests still waiting when the connection closes with this code
+        return isinstance(error, McpError) and error.error.code == types.CONNECTION_CLOSED
+
+    def _schedule_check(self, member):
+        if self._closed or member in self._restarting or member in self._checking:
+            return
+        self._checking.add(member)
+        task = self._spawn(self._check(member))
+        task.add_done_callback(lambda _: self._checking.discard(member))
+
+    async def _check(self, member):
+        if not await self._ping(member):
+            print(f"❌ MCP session for {self.server_name} failed health check")
+            self._schedule_restart(member)
+
+    async def _ping(self, member):
+        try:
+            await asyncio.wait_for(member.session.send_ping(), timeout=MCP_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    def _schedule_restart(self, member):
+        if self._closed or member in self._restarting:
+            return
+        self._restarting.add(member)
+        self._spawn(self._restart(member))
+
+    async def _restart(self, member):
+        delay = MCP_RESTART_BACKOFF
+        try:
+            while not self._closed:
+                await member.stop()
+                try:
+                    await member.start()
+                    self.restarts += 1
+                    print(f"🔁 Restarted MCP session for {self.server_name}")
+                    return
+                except Exception as e:
+                    print(f"❌ Restart of {self.server_name} failed: {e}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MCP_RESTART_MAX_BACKOFF)
+        finally:
+            self._restarting.discard(member)
+
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(MCP_PING_INTERVAL)
+            now = time.monotonic()
+            for member in self.members:
+                if member in self._restarting:
+                    continue
+                if not member.alive:
+                    self._schedule_restart(member)
+                    continue
+                if member.in_flight or now - member.last_used < MCP_PING_INTERVAL:
+                    continue
+                if not await self._ping(member):
+                    print(f"❌ MCP session for {self.server_name} failed health check")
+                    self._schedule_restart(member)
+
+    def get_tools(self):
+        return [self._to_langchain_tool(tool) for tool in self.mcp_tools]
+
+    def _to_langchain_tool(self, tool):
+        async def call_tool(**arguments):
+            result = await self.call_tool(tool.name, arguments)
+            return _convert_call_tool_result(result)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+            metadata=tool.annotations.model_dump() if tool.annotations else None,
+        )
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2)
+
+        return {
+            "sessions": len(self.members),
+            "alive": sum(1 for m in self.members if m.alive),
+            "in_flight": sum(m.in_flight for m in self.members),
+            "calls": self.calls,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "cancelled": self.cancelled,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+    async def close(self):
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*(member.stop() for member in self.members), return_exceptions=True)
+
+
+class MCPSessionManager:
+    """Keeps one MCPSessionPool per configured server for the process lifetime."""
+
+    def __init__(self):
+        self.pools = {}
+
+    async def start(self):
+        config = await generate_mcp_config_file()
+        servers = load_config()["mcpServers"]
+        await asyncio.gather(
+            *(
+                self._start_pool(name, cfg, servers[name].get("poolSize", MCP_POOL_SIZE))
+                for name, cfg in config.items()
+            )
+        )
+        return self
+
+    async def _start_pool(self, name, cfg, size):
+        pool = MCPSessionPool(name, cfg, size)
+        try:
+            await pool.start()
+            self.pools[name] = pool
+            print(f"✅ Loaded {len(pool.mcp_tools)} tools from {name} ({size} sessions)")
+        except Exception as e:
+            print(f"❌ Failed to load tools from {name}: {e}")
+            await pool.close()
+
+    def get_tools(self):
+        return [tool for pool in self.pools.values() for tool in pool.get_tools()]
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    async def close(self):
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+        self.pools = {}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+Species and topic tags of the knowledgebase chunks, and the filters on them.
+
+Database/ingest.py tags every chunk from a keyword lexicon:
+``metadata["species"]`` and ``metadata["topics"]`` list the keys of
+SPECIES and TOPICS whose keywords appear in the chunk's heading
+breadcrumb, or at least TAG_MIN_MENTIONS times in its text. A chunk
+under "মডিউল-২৯ ঃ ছাগল পালন ব্যবস্থাপনা" is a goat chunk even where its
+paragraphs only say "খামার".
+
+Keywords count anywhere in a word, since Bangla compounds end in them
+(প্রাণিখাদ্য, ক্ষুরারোগ, শালদুধ), except those that unrelated words
+contain: WORD_START keywords must begin a word (টিকা is in সৃষ্টিকারী),
+and WHOLE_WORDS only count as the word itself or with one of
+CASE_ENDINGS (হাস begins হাসপাতাল and ends ইতিহাস).
+
+A filter is a {"species": "goat", "topics": "disease"} dict; a chunk
+matches when every key's list holds the value. KnowledgebaseStore turns it
+into jsonb containment on indexed expressions, LocalVectorStore and
+BM25Index into a row mask.
+"""
+import os
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional
+
+# text mentions a keyword needs to tag a chunk that its headings do not
+TAG_MIN_MENTIONS = int(os.getenv("TAG_MIN_MENTIONS", "2"))
+
+SPECIES = {
+    "chicken": ["মুরগি", "মুরগী", "মোরগ", "ব্রয়লার", "লেয়ার", "পুলেট", "পোল্ট্রি", "পোল্টি্র"],
+    "duck": ["হাঁস", "হাস"],
+    "quail": ["কোয়েল"],
+    "pigeon": ["কবুতর"],
+    "cattle": ["গরু", "গাভী", "গাভি", "বাছুর", "ষাঁড়", "বকনা", "গবাদি"],
+    "buffalo": ["মহিষ"],
+    "goat": ["ছাগল", "পাঁঠা", "খাসি"],
+    "sheep": ["ভেড়া"],
+}
+
+TOPICS = {
+    "disease": ["রোগ", "জীবাণু", "লক্ষণ", "চিকিৎসা", "আক্রান্ত", "সংক্রমণ"],
+    "vaccination": ["টিকা", "টীকা", "ভ্যাকসিন", "ভ্যাক্সিন"],
+    "parasites": ["কৃমি", "পরজীবী", "উকুন", "আঠালি", "আঁটালি"],
+    "feed": ["খাদ্য", "খাবার", "ঘাস", "পুষ্টি", "সাইলেজ", "দানাদার"],
+    "housing": ["বাসস্থান", "ঘর", "খাঁচা", "লিটার"],
+    "breeding": ["প্রজনন", "গর্ভ", "ব্রিডার", "বাচ্চা ফুটা", "ইনকিউবেটর"],
+    "milk": ["দুধ", "দুগ্ধ"],
+    "economics": ["লাভ", "আয়", "খরচ", "বাজার", "মূল্য"],
+}
+
+LEXICONS = {"species": SPECIES, "topics": TOPICS}
+
+# keywords found inside unrelated words (সৃষ্টিকারী, জলাভূমি); they must begin a word
+WORD_START = {"টিকা", "লাভ"}
+# "হাস", হাঁস without its chandrabindu, also begins হাসপাতাল and হাসি: the word itself or with a case ending
+WHOLE_WORDS = {"হাস"}
+CASE_ENDINGS = ["ের", "কে", "গুলো", "গুলোর", "গুলি", "টি", "টির"]
+
+# no Bengali letter or sign right before / after
+_WORD_START = "(?<![\u0980-\u09ff])"
+_WORD_END = "(?![\u0980-\u09ff])"
+
+# left inside words by the Bijoy conversion: zero-width non-joiner and joiner, soft hyphen, and
+# "œ", the Bijoy glyph of a conjunct's second half it does not convert (যতœ for যত্ন, মারাতœক for
+# মারাত্মক); dropping it keeps such a word one token
+_INVISIBLE = dict.fromkeys(map(ord, "\u200c\u200d\u00ad\u0153"), None)
+
+
+def normalize(text: str) -> str:
+    """NFC with the characters above removed; tagging and utils/bm25.py's tokenizer both use it."""
+    return unicodedata.normalize("NFC", text).translate(_INVISIBLE)
+
+
+def _keyword_pattern(keywords):
+    endings = "|".join(map(re.escape, CASE_ENDINGS))
+    alternatives = []
+    for keyword in sorted(keywords, key=len, reverse=True):
+        escaped = re.escape(normalize(keyword))
+        if keyword in WHOLE_WORDS:
+            escaped = f"{_WORD_START}{escaped}(?:{endings})?{_WORD_END}"
+        elif keyword in WORD_START:
+            escaped = _WORD_START + escaped
+        alternatives.append(escaped)
+    return re.compile("|".join(alternatives))
+
+
+_PATTERNS = {
+    key: {tag: _keyword_pattern(keywords) for tag, keywords in lexicon.items()} for key, lexicon in LEXICONS.items()
+}
+
+
+def tag(text: str, headings: List[str] = (), min_mentions: int = TAG_MIN_MENTIONS) -> Dict[str, List[str]]:
+    """{"species": [...], "topics": [...]} for a chunk's text and heading breadcrumb."""
+    text = normalize(text)
+    heading = normalize(" ".join(headings))
+    tags = {}
+    for key, patterns in _PATTERNS.items():
+        tags[key] = [
+            name
+            for name, pattern in patterns.items()
+            if pattern.search(heading) or len(pattern.findall(text)) >= min_mentions
+        ]
+    return tags
+
+
+def tag_chunk(chunk: dict) -> dict:
+    """The chunk with its species and topic tags added to its metadata."""
+    metadata = chunk["metadata"]
+    return {**chunk, "metadata": {**metadata, **tag(chunk["text"], metadata.get("headings", ()))}}
+
+
+def clean_filter(species: Optional[str] = None, topic: Optional[str] = None) -> Dict[str, str]:
+    """A filter from the tool's arguments; unknown or empty values are left out."""
+    flt = {}
+    if species and species in SPECIES:
+        flt["species"] = species
+    if topic and topic in TOPICS:
+        flt["topics"] = topic
+    return flt
+
+
+def matches(metadata: dict, flt: Dict[str, str]) -> bool:
+    return all(value in (metadata.get(key) or ()) for key, value in flt.items())
+
+
+class MetadataMasks:
+    """
+    Boolean row masks of a filter over a fixed set of rows, for the
+    in-process indexes. Each (key, value) mask is built once, by reading
+    every row's metadata through ``metadata_of``, and cached.
+    """
+
+    def __init__(self, rows: int, metadata_of: Callable[[int], dict]):
+        self.rows = rows
+        self.metadata_of = metadata_of
+        self._masks = {}
+        self._metadata = None
+
+    def _mask(self, key, value):
+        # imported here: the MCP server reads the vocabularies above for its tool schema before numpy is needed
+        import numpy as np
+
+        if (key, value) not in self._masks:
+            if self._metadata is None:
+                self._metadata = [self.metadata_of(i) for i in range(self.rows)]
+            self._masks[key, value] = np.fromiter(
+                (value in (metadata.get(key) or ()) for metadata in self._metadata), dtype=bool, count=self.rows
+            )
+        return self._masks[key, value]
+
+    def mask(self, flt: Dict[str, str]):
+        masks = [self._mask(key, value) for key, value in flt.items()]
+        mask = masks[0].copy()
+        for other in masks[1:]:
+            mask &= other
+        return mask
@@ -1,27 +1,94 @@
+import httpx
 from langchain_core.embeddings import Embeddings
-from openai import OpenAI
+from openai import APIConnectionError, AsyncOpenAI, OpenAI
 from typing import List
 
+from utils.http_clients import (
+    RETRY_STATUS,
+    LatencyHistogram,
+    acall_with_retry,
+    async_http_client,
+    call_with_retry,
+    http2_available,
+    http_timeout,
+    status_of,
+    sync_http_client,
+)
+
+
+def _retryable(exc):
+    # APITimeoutError is an APIConnectionError
+    if isinstance(exc, (APIConnectionError, httpx.TransportError)):
+        return True
+    return status_of(exc) in RETRY_STATUS
+
 
 class NvidiaOpenAIEmbeddings_BGE_M3(Embeddings):
+    """
+    BGE-M3 through NVIDIA's OpenAI-compatible endpoint, over the pooled
+    clients of utils/http_clients. The SDK's own retries are off; calls
+    are retried there, with jitter, and timed in ``latency``.
+    """
+
     def __init__(self, api_key: str, base_url: str, model: str = "baai/bge-m3"):
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=sync_http_client(),
+            timeout=http_timeout(),
+            max_retries=0,
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=async_http_client(),
+            timeout=http_timeout(),
+            max_retries=0,
+        )
         self.model = model
+        self.latency = LatencyHistogram()
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        response = self.client.embeddings.create(
-            input=texts,
-            model=self.model,
-            encoding_format="float",
-            extra_body={"truncate": "NONE"},
+    def _create(self, texts):
+        response = call_with_retry(
+            lambda: self.client.embeddings.create(
+                input=texts,
+                model=self.model,
+                encoding_format="float",
+                extra_body={"truncate": "NONE"},
+            ),
+            self.latency,
+            _retryable,
         )
         return [data.embedding for data in response.data]
 
-    def embed_query(self, text: str) -> List[float]:
-        response = self.client.embeddings.create(
-            input=[text],
-            model=self.model,
-            encoding_format="float",
-            extra_body={"truncate": "NONE"},
+    async def _acreate(self, texts):
+        response = await acall_with_retry(
+            lambda: self.async_client.embeddings.create(
+                input=texts,
+                model=self.model,
+                encoding_format="float",
+                extra_body={"truncate": "NONE"},
+            ),
+            self.latency,
+            _retryable,
         )
-        return response.data[0].embedding
+        return [data.embedding for data in response.data]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._create(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._create([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._acreate(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._acreate([text]))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Several queries in one request, embedded exactly as ``aembed_query`` would."""
+        return await self.aembed_documents(texts)
+
+    def stats(self):
+        return {"http2": http2_available(), **self.latency.stats()}
@@ -0,0 +1,156 @@
+"""
+Where the time of a chat request goes, as Prometheus histograms and,
+optionally, OpenTelemetry spans.
+
+    with stage("tool_call", tool_name):
+        ...
+
+records the block's duration in ``livestock_stage_seconds{stage, target}``
+and, with OTEL_ENABLED, makes it a span of the current trace. The stages:
+
+    agent_init       agent build at startup and on /reload (target start/reload)
+    mcp_list_tools   tool listing of an MCP server, by server
+    tool_call        one MCP tool call, by tool
+    embedding        query embedding of a knowledgebase lookup (cache hits included)
+    vector_search    nearest-neighbour query, by backend (pgvector/local)
+    keyword_search   BM25 side of the hybrid search
+    llm_ttft         model call start to its first token, by graph node
+    stream_total     one /stream run, by outcome
+
+The API serves the histograms at ``/metrics``. gunicorn runs several
+workers and the knowledgebase server runs as MCP subprocesses, so with
+PROMETHEUS_MULTIPROC_DIR set every process writes its samples there and
+/metrics adds them up; without it /metrics only shows the worker that
+answers, and no embedding or vector search stages.
+
+Histograms are always recorded (TELEMETRY_ENABLED=false turns them off).
+Spans are sampled per trace at OTEL_SAMPLE_RATE and exported over OTLP/HTTP
+to OTEL_EXPORTER_OTLP_ENDPOINT, which needs opentelemetry-sdk and
+opentelemetry-exporter-otlp-proto-http. Traces do not cross the MCP stdio
+transport: the knowledgebase server's spans are traces of their own.
+"""
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from dotenv import load_dotenv
+
+# prometheus_client chooses between one process and many from the environment when it is imported
+load_dotenv()
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+# directory shared by the API workers and their MCP servers for /metrics over all of them;
+# gunicorn empties it on start (gunicorn.conf.py)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+# share of traces (a /stream run, a knowledgebase call) whose spans are exported
+OTEL_SAMPLE_RATE = float(os.getenv("OTEL_SAMPLE_RATE", "0.1"))
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "livestock-agent")
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+
+from utils.logger import get_logger
+
+logger = get_logger("telemetry")
+
+# from a cached embedding to a run hitting STREAM_DEADLINE
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+# settings passed on to MCP stdio servers, which start with a minimal environment
+CHILD_ENV = ("TELEMETRY_ENABLED", "PROMETHEUS_MULTIPROC_DIR", "OTEL_ENABLED", "OTEL_SAMPLE_RATE", "OTEL_EXPORTER_OTLP_ENDPOINT")
+
+STAGE_SECONDS = Histogram(
+    "livestock_stage_seconds",
+    "Duration of one stage of a chat request",
+    ["stage", "target"],
+    buckets=STAGE_BUCKETS,
+)
+
+_tracer = None
+
+
+def setup_tracing(exporter=None, sample_rate: float = OTEL_SAMPLE_RATE):
+    """
+    Install the OpenTelemetry SDK with a ratio sampler (children follow
+    their root's decision) and return the tracer, or None when the SDK is
+    not installed. ``exporter`` defaults to OTLP over HTTP.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        if exporter is None:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            exporter = OTLPSpanExporter()
+    except ImportError as e:
+        logger.warning(f"OTEL_ENABLED is set but {e.name} is not installed - spans are off")
+        _tracer = False
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": OTEL_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("livestock")
+    return _tracer
+
+
+def tracer():
+    """The tracer, set up on first use; None when spans are off."""
+    if _tracer is None:
+        if not OTEL_ENABLED:
+            return None
+        setup_tracing()
+    return _tracer or None
+
+
+def span(name: str, **attributes):
+    """A span of the current trace (a new trace at the top), or a no-op context when spans are off."""
+    current = tracer()
+    if current is None:
+        return nullcontext()
+    return current.start_as_current_span(name, attributes=attributes or None)
+
+
+def observe(name: str, seconds: float, target: str = ""):
+    if TELEMETRY_ENABLED:
+        STAGE_SECONDS.labels(name, target).observe(seconds)
+
+
+@contextmanager
+def stage(name: str, target: str = ""):
+    """Time the block as stage ``name`` (see the module docstring), as a span too when spans are on."""
+    if not TELEMETRY_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        with span(name, target=target) if target else span(name):
+            yield
+    finally:
+        STAGE_SECONDS.labels(name, target).observe(time.perf_counter() - started)
+
+
+def child_env():
+    return {key: os.environ[key] for key in CHILD_ENV if key in os.environ}
+
+
+def render():
+    """The /metrics body and its content type, summed over every process in multi-process mode."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
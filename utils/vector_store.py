@@ -0,0 +1,254 @@
+import os
+import json
+import asyncio
+import functools
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_postgres import PGVector
+
+from utils.telemetry import stage
+
+PG_POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "5"))
+PG_MAX_OVERFLOW = int(os.getenv("PG_MAX_OVERFLOW", "5"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+PG_POOL_RECYCLE = int(os.getenv("PG_POOL_RECYCLE", "1800"))
+# psycopg prepares a statement after this many executions on a connection. Unset (the default)
+# never prepares, which a transaction-mode pooler (pgbouncer/Supavisor, as on Supabase) requires;
+# set it only on direct connections
+PG_PREPARE_THRESHOLD = os.getenv("PG_PREPARE_THRESHOLD")
+
+COLLECTION_QUERY = text("SELECT uuid FROM langchain_pg_collection WHERE name = :name")
+
+# changes whenever the collection is re-created or rows are added/removed
+COLLECTION_VERSION_QUERY = text(
+    """
+    SELECT c.uuid, count(e.id) AS rows
+    FROM langchain_pg_collection c
+    LEFT JOIN langchain_pg_embedding e ON e.collection_id = c.uuid
+    WHERE c.name = :name
+    GROUP BY c.uuid
+    """
+)
+
+SIMILARITY_QUERY = text(
+    """
+    SELECT id, document, cmetadata, embedding <=> CAST(:embedding AS vector) AS distance
+    FROM langchain_pg_embedding
+    WHERE collection_id = :collection_id
+    ORDER BY distance
+    LIMIT :k
+    """
+)
+
+# filterable metadata keys (utils/metadata_tags.py) and the indexed expressions they are matched on
+FILTER_EXPRESSIONS = {
+    "species": "(cmetadata -> 'species')",
+    "topics": "(cmetadata -> 'topics')",
+}
+
+# run by Database/ingest.py; GIN jsonb_path_ops on the tag arrays serves the ``@>`` filters,
+# smaller than langchain_postgres' index over the whole cmetadata (headings and image paths included)
+METADATA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_embedding_collection_id ON langchain_pg_embedding (collection_id)",
+    *(
+        f"CREATE INDEX IF NOT EXISTS ix_cmetadata_{key} ON langchain_pg_embedding USING gin ({expression} jsonb_path_ops)"
+        for key, expression in FILTER_EXPRESSIONS.items()
+    ),
+]
+
+
+@functools.lru_cache(maxsize=None)
+def filtered_similarity_query(keys: Tuple[str, ...]):
+    """SIMILARITY_QUERY restricted by jsonb containment on ``keys``; one fixed statement per key set."""
+    conditions = "".join(f"\n      AND {FILTER_EXPRESSIONS[key]} @> CAST(:{key} AS jsonb)" for key in keys)
+    return text(
+        f"""
+    SELECT id, document, cmetadata, embedding <=> CAST(:embedding AS vector) AS distance
+    FROM langchain_pg_embedding
+    WHERE collection_id = :collection_id{conditions}
+    ORDER BY distance
+    LIMIT :k
+    """
+    )
+
+
+def psycopg_url(url: str) -> str:
+    """Point a plain postgres:// URL at SQLAlchemy's psycopg 3 driver."""
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def to_vector_literal(embedding: List[float]) -> str:
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def create_pg_engine(connection: str, async_mode: bool = False, **engine_args):
+    prepare_threshold = int(PG_PREPARE_THRESHOLD) if PG_PREPARE_THRESHOLD else None
+    options = dict(
+        pool_size=PG_POOL_SIZE,
+        max_overflow=PG_MAX_OVERFLOW,
+        pool_timeout=PG_POOL_TIMEOUT,
+        pool_recycle=PG_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={"prepare_threshold": prepare_threshold},
+    )
+    options.update(engine_args)
+    if async_mode:
+        return create_async_engine(psycopg_url(connection), **options)
+    return create_engine(psycopg_url(connection), **options)
+
+
+class KnowledgebaseStore:
+    """
+    Process-wide handle on a PGVector collection for similarity lookups.
+
+    Owns one bounded SQLAlchemy pool (plus an async one for the ``a*``
+    methods), resolves the collection uuid once and runs a single fixed
+    similarity statement, which psycopg can keep prepared per connection
+    when PG_PREPARE_THRESHOLD is set.
+    """
+
+    def __init__(self, embeddings: Embeddings, connection: str, collection_name: str, **engine_args):
+        self.embeddings = embeddings
+        self.connection = connection
+        self.collection_name = collection_name
+        self.engine_args = engine_args
+        self._engine = None
+        self._async_engine = None
+        self._collection_id = None
+        self._vector_store = None
+
+    @property
+    def engine(self):
+        # created on first use so the MCP handshake never waits on Postgres
+        if self._engine is None:
+            self._engine = create_pg_engine(self.connection, **self.engine_args)
+        return self._engine
+
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            self._async_engine = create_pg_engine(self.connection, async_mode=True, **self.engine_args)
+        return self._async_engine
+
+    def _set_collection(self, row):
+        if row is None:
+            raise ValueError(f"Collection not found: {self.collection_name}")
+        self._collection_id = row.uuid
+        return self._collection_id
+
+    @property
+    def collection_id(self):
+        if self._collection_id is None:
+            with self.engine.connect() as conn:
+                self._set_collection(conn.execute(COLLECTION_QUERY, {"name": self.collection_name}).first())
+        return self._collection_id
+
+    async def acollection_id(self):
+        if self._collection_id is None:
+            async with self.async_engine.connect() as conn:
+                result = await conn.execute(COLLECTION_QUERY, {"name": self.collection_name})
+                self._set_collection(result.first())
+        return self._collection_id
+
+    async def acollection_version(self):
+        async with self.async_engine.connect() as conn:
+            row = (await conn.execute(COLLECTION_VERSION_QUERY, {"name": self.collection_name})).first()
+        return None if row is None else f"{row.uuid}:{row.rows}"
+
+    def invalidate(self):
+        """Forget the cached collection uuid, e.g. after the collection was re-created."""
+        self._collection_id = None
+
+    @property
+    def vector_store(self):
+        """A langchain PGVector on the shared engine, for anything beyond search."""
+        if self._vector_store is None:
+            self._vector_store = PGVector(
+                embeddings=self.embeddings,
+                collection_name=self.collection_name,
+                connection=self.engine,
+                use_jsonb=True,
+                create_extension=False,
+            )
+        return self._vector_store
+
+    @staticmethod
+    def _query(params, flt):
+        if not flt:
+            return SIMILARITY_QUERY, params
+        keys = tuple(sorted(flt))
+        return filtered_similarity_query(keys), {**params, **{key: json.dumps([flt[key]]) for key in keys}}
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 5, filter: Optional[Dict[str, str]] = None
+    ):
+        query, params = self._query(
+            {"embedding": to_vector_literal(embedding), "collection_id": self.collection_id, "k": k}, filter
+        )
+        with stage("vector_search", "pgvector"), self.engine.connect() as conn:
+            rows = conn.execute(query, params).all()
+        return self._to_scored_documents(rows)
+
+    async def asimilarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 5, filter: Optional[Dict[str, str]] = None
+    ):
+        query, params = self._query(
+            {"embedding": to_vector_literal(embedding), "collection_id": await self.acollection_id(), "k": k}, filter
+        )
+        with stage("vector_search", "pgvector"):
+            async with self.async_engine.connect() as conn:
+                rows = (await conn.execute(query, params)).all()
+        return self._to_scored_documents(rows)
+
+    @staticmethod
+    def _to_scored_documents(rows):
+        return [
+            (Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {}), row.distance)
+            for row in rows
+        ]
+
+    def similarity_search_with_relevance_scores(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """(document, cosine similarity) pairs, best first; ``filter`` as in utils/metadata_tags.py."""
+        with stage("embedding"):
+            embedding = self.embeddings.embed_query(query)
+        return [(doc, 1 - distance) for doc, distance in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    async def asimilarity_search_with_relevance_scores(
+        self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        # the collection lookup (first call only) overlaps the embedding request
+        embedding, _ = await asyncio.gather(self._aembed_query(query), self.acollection_id())
+        return [
+            (doc, 1 - distance)
+            for doc, distance in await self.asimilarity_search_with_score_by_vector(embedding, k, filter)
+        ]
+
+    async def _aembed_query(self, query):
+        with stage("embedding"):
+            return await self.embeddings.aembed_query(query)
+
+    def similarity_search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k, filter)]
+
+    async def asimilarity_search(self, query: str, k: int = 5, filter: Optional[Dict[str, str]] = None) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_relevance_scores(query, k, filter)]
+
+    def close(self):
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+            self._async_engine = None
+